@@ -2,13 +2,14 @@ import copy
 import re
 import time
 from concurrent.futures import ThreadPoolExecutor
-from typing import Iterable, List, Optional, Set
+from typing import Iterable, Iterator, List, Optional, Set
 import logging
 
 import pandas as pd
 import sqlalchemy
 from sqlalchemy.pool import NullPool
 
+from snowshu.core import concurrency, tracing
 from snowshu.core.models import Relation
 from snowshu.core.models.credentials import (DATABASE, HOST, PASSWORD, USER,
                                              Credentials)
@@ -18,9 +19,14 @@ from snowshu.logger import duration
 
 logger = logging.getLogger(__name__)
 
+# the start of the query kept in trace spans
+TRACED_SQL_LENGTH = 200
+
 
 class BaseSQLAdapter:
     DEFAULT_CASE = 'lower'
+    # the side of the replica build the queries of the adapter are gated on
+    CONCURRENCY_SIDE: Optional[str] = None
 
     class _DatabaseObject:
         """ An internal class to allow for preserving name casing when needed
@@ -93,31 +99,47 @@ class BaseSQLAdapter:
         """runs the query and closes the connection."""
         logger.debug('Beginning query execution...')
         start = time.time()
-        conn = None
-        cursor = None
+        with concurrency.slot(self.CONCURRENCY_SIDE), \
+                tracing.span('query', 'query', sql=query_sql[:TRACED_SQL_LENGTH]):
+            conn = None
+            cursor = None
+            try:
+                database = database if not database else self._correct_case(database)
+                # database_override is needed for databases like postgre
+                conn = self.get_connection() if not database else self.get_connection(database_override=database)
+                cursor = conn.connect()
+                # we make the STRONG assumption that all responses will be small enough
+                # to live in-memory (because sampling engine).
+                # further safety added by the constraints in snowshu.configs
+                # this allows the connection to return to the pool
+                logger.debug(f'Executed query in {time.time() - start} seconds.')
+                frame = pd.read_sql_query(query_sql, conn)
+                logger.debug("Dataframe datatypes: %s", str(frame.dtypes).replace('\n', ' | '))
+                if len(frame) > 0:
+                    for col in frame.columns:
+                        logger.debug("Pandas loaded element 0 of column %s as %s", col, type(frame[col][0]))
+                else:
+                    logger.debug("Dataframe is empty")
+            finally:
+                if cursor:
+                    cursor.close()
+                if conn:
+                    conn.dispose()
+            return frame
+
+    def stream_query(self, query_sql: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        """runs the query and yields the results in dataframes of at most chunksize rows.
+
+        The connection stays open until the results are exhausted (or the generator is closed),
+        so only one chunk at a time is held in memory.
+        """
+        logger.debug('Beginning streamed query execution...')
+        engine = self.get_connection()
         try:
-            database = database if not database else self._correct_case(database)
-            # database_override is needed for databases like postgre
-            conn = self.get_connection() if not database else self.get_connection(database_override=database)
-            cursor = conn.connect()
-            # we make the STRONG assumption that all responses will be small enough
-            # to live in-memory (because sampling engine).
-            # further safety added by the constraints in snowshu.configs
-            # this allows the connection to return to the pool
-            logger.debug(f'Executed query in {time.time() - start} seconds.')
-            frame = pd.read_sql_query(query_sql, conn)
-            logger.debug("Dataframe datatypes: %s", str(frame.dtypes).replace('\n', ' | '))
-            if len(frame) > 0:
-                for col in frame.columns:
-                    logger.debug("Pandas loaded element 0 of column %s as %s", col, type(frame[col][0]))
-            else:
-                logger.debug("Dataframe is empty")
+            with concurrency.slot(self.CONCURRENCY_SIDE, 'stream'), engine.connect() as conn:
+                yield from pd.read_sql_query(query_sql, conn, chunksize=chunksize)
         finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.dispose()
-        return frame
+            engine.dispose()
 
     def _build_conn_string(self, overrides: dict = None) -> str:
         """This is the most basic implementation of a connection string
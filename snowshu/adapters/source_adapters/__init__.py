@@ -1,2 +1,3 @@
 from .base_source_adapter import BaseSourceAdapter
 from .snowflake_adapter import SnowflakeAdapter
+from .duckdb_adapter import DuckdbAdapter
@@ -1,11 +1,12 @@
-from typing import Any
+from typing import Any, Dict, Iterable, List
 import logging
 
 import pandas as pd
 
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.configs import MAX_ALLOWED_DATABASES, MAX_ALLOWED_ROWS
-from snowshu.core.models import DataType
+from snowshu.core import concurrency
+from snowshu.core.models import DataType, Relation
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +17,9 @@ class BaseSourceAdapter(BaseSQLAdapter):
     MAX_ALLOWED_ROWS = MAX_ALLOWED_ROWS
     SUPPORTS_CROSS_DATABASE = False
     SUPPORTED_FUNCTIONS = set()
+    CONCURRENCY_SIDE = concurrency.SOURCE
+    SUPPORTS_ASYNC_QUERIES = False
+    SUPPORTS_MULTI_STATEMENT = False
 
     def __init__(self, preserve_case: bool = False):
         self.preserve_case = preserve_case
@@ -48,6 +52,49 @@ class BaseSourceAdapter(BaseSQLAdapter):
         """
         return self.check_count_and_query(query, 1, False).iloc[0][0]
 
+    def get_population_counts(self, relations: List[Relation]) -> List[int]:
+        """Counts the rows of each relation.
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to count.
+        Returns:
+            the population size of each relation, in order
+        """
+        return [int(self.scalar_query(self.population_count_statement(relation))) for relation in relations]
+
+    def query_many(self, queries: List[str]) -> List[pd.DataFrame]:
+        """Runs queries with small results, returning the results in order.
+
+        Adapters that set SUPPORTS_MULTI_STATEMENT send them together in a single request,
+        others run them one at a time. No count check is made.
+        """
+        return [self._safe_query(query) for query in queries]
+
+    @staticmethod
+    def partition_statement(query: str, partitions: int, partition: int) -> str:
+        """Builds the statement selecting one of the disjoint hash partitions of the rows of a query."""
+        raise NotImplementedError()
+
+    def submit_create_table(self, query: str, name: str, schema: str, database: str) -> str:
+        """Submits the creation of a table from a query without waiting for it to complete.
+
+        Only implemented by adapters that set SUPPORTS_ASYNC_QUERIES.
+
+        Returns:
+            the id of the submitted query, to pass to :meth:`wait_for_queries`.
+        """
+        raise NotImplementedError()
+
+    def wait_for_queries(self, query_ids: Iterable[str]) -> Dict[str, float]:
+        """Waits for submitted queries to complete, raising on the first that failed.
+
+        Only implemented by adapters that set SUPPORTS_ASYNC_QUERIES.
+
+        Returns:
+            the ``time.perf_counter()`` each query was seen complete at, by query id.
+        """
+        raise NotImplementedError()
+
     def _get_data_type(self, source_type: str) -> DataType:
         try:
             return self.DATA_TYPE_MAPPINGS[source_type.lower()]
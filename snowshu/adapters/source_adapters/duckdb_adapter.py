@@ -0,0 +1,546 @@
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Union
+
+import duckdb
+import pandas as pd
+import sqlalchemy
+from overrides import overrides
+from sqlalchemy.pool import NullPool
+
+import snowshu.core.models.data_types as dtypes
+from snowshu.adapters.source_adapters import BaseSourceAdapter
+from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.configs import DEFAULT_TEMPORARY_DATABASE
+from snowshu.core.models.attribute import Attribute
+from snowshu.core.models.credentials import DATABASE, HOST, SCHEMA
+from snowshu.core.models.data_types import DataType
+from snowshu.core.models.relation import Relation
+
+if TYPE_CHECKING:
+    from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+    from snowshu.samplings.sample_methods import HashSampleMethod
+    from snowshu.samplings.samplings.recent_window_sampling import TimeWindow
+
+logger = logging.getLogger(__name__)
+
+# connections to the same database file share one duckdb instance, attach databases once
+_ATTACH_LOCK = threading.Lock()
+
+
+class DuckdbAdapter(SnowflakeAdapter):
+    """A local DuckDB source adapter standing in for Snowflake.
+
+    Every ``*.duckdb`` file of a directory is a database, named after the file. The adapter speaks
+    the Snowflake dialect the rest of SnowShu compiles to, translating what DuckDB spells
+    differently (sample clauses, DDL, metadata), so replicas can be sampled without a warehouse.
+    Temp schemas are created in a ``snowshu.duckdb`` file next to the source databases.
+
+    Credentials are the ``database`` the connection opens and the directory of the database files
+    as ``host`` (default the working directory).
+
+    Args:
+        preserve_case: If preserve_case is True, SnowShu will __not__ fold names to lowercase.
+        latency: seconds to wait before every query, to stand in for the round trips of a remote
+            warehouse in offline performance tests.
+    """
+
+    name = 'duckdb'
+    REQUIRED_CREDENTIALS = (DATABASE,)
+    ALLOWED_CREDENTIALS = (HOST, SCHEMA,)
+    DEFAULT_CASE = 'lower'
+    # statements run in process, there is nothing to submit to
+    SUPPORTS_ASYNC_QUERIES = False
+    SUPPORTS_MULTI_STATEMENT = False
+    FILE_SUFFIX = '.duckdb'
+    # duckdb keeps no storage size per table, rows and columns are estimated at 8 bytes a value
+    VALUE_BYTES = 8
+
+    DATA_TYPE_MAPPINGS = {
+        "bigint": dtypes.BIGINT,
+        "binary": dtypes.BINARY,
+        "blob": dtypes.BINARY,
+        "bool": dtypes.BOOLEAN,
+        "boolean": dtypes.BOOLEAN,
+        "bpchar": dtypes.CHAR,
+        "bytea": dtypes.BINARY,
+        "char": dtypes.CHAR,
+        "date": dtypes.DATE,
+        "datetime": dtypes.TIMESTAMP_NTZ,
+        "decimal": dtypes.DECIMAL,
+        "double": dtypes.FLOAT,
+        "float": dtypes.FLOAT,
+        "float4": dtypes.FLOAT,
+        "float8": dtypes.FLOAT,
+        "hugeint": dtypes.BIGINT,
+        "int": dtypes.BIGINT,
+        "int1": dtypes.BIGINT,
+        "int2": dtypes.BIGINT,
+        "int4": dtypes.BIGINT,
+        "int8": dtypes.BIGINT,
+        "integer": dtypes.BIGINT,
+        "json": dtypes.JSON,
+        "numeric": dtypes.NUMERIC,
+        "real": dtypes.FLOAT,
+        "smallint": dtypes.BIGINT,
+        "string": dtypes.VARCHAR,
+        "text": dtypes.VARCHAR,
+        "time": dtypes.TIME,
+        "timestamp": dtypes.TIMESTAMP_NTZ,
+        "timestamp with time zone": dtypes.TIMESTAMP_TZ,
+        "timestamptz": dtypes.TIMESTAMP_TZ,
+        "tinyint": dtypes.BIGINT,
+        "ubigint": dtypes.BIGINT,
+        "uinteger": dtypes.BIGINT,
+        "usmallint": dtypes.BIGINT,
+        "utinyint": dtypes.BIGINT,
+        "uuid": dtypes.VARCHAR,
+        "varbinary": dtypes.BINARY,
+        "varchar": dtypes.VARCHAR}
+
+    def __init__(self, preserve_case: bool = False, latency: float = 0.0):
+        super().__init__(preserve_case)
+        self.latency = latency
+
+    @property
+    def directory(self) -> Path:
+        """The directory holding the database files."""
+        return Path(self.credentials.host or '.').expanduser()
+
+    def _database_file(self, database: str) -> Path:
+        return self.directory / f"{database}{self.FILE_SUFFIX}"
+
+    @overrides
+    def get_connection(
+            self,
+            database_override: Optional[str] = None,
+            schema_override: Optional[str] = None) -> sqlalchemy.engine.base.Engine:
+        """Creates a connection engine on the database file, with the other databases attached.
+
+        The temp database is created on first connection.
+        """
+        if not self._credentials:
+            raise KeyError(
+                'Adapter.get_connection called before setting Adapter.credentials')
+
+        logger.debug(f'Acquiring {self.CLASSNAME} connection...')
+        database = database_override or self.credentials.database
+        engine = sqlalchemy.create_engine(f"duckdb:///{self._database_file(database)}", poolclass=NullPool)
+        sqlalchemy.event.listen(engine, 'connect', self._attach_databases)
+        schema = schema_override or self.credentials.schema
+        if schema is not None:
+            sqlalchemy.event.listen(engine, 'connect',
+                                    lambda dbapi_connection, _: dbapi_connection.execute(f"SET schema='{schema}'"))
+        logger.debug(f'Engine acquired. Conn string: {repr(engine.url)}')
+        return engine
+
+    def _attach_databases(self, dbapi_connection, _) -> None:
+        database_files = {path.stem: path for path in self.directory.glob(f"*{self.FILE_SUFFIX}")}
+        database_files.setdefault(self._correct_case(DEFAULT_TEMPORARY_DATABASE),
+                                  self._database_file(self._correct_case(DEFAULT_TEMPORARY_DATABASE)))
+        with _ATTACH_LOCK:
+            dbapi_connection.execute("SELECT database_name FROM duckdb_databases()")
+            attached = {row[0] for row in dbapi_connection.fetchall()}
+            for database, path in database_files.items():
+                if database not in attached:
+                    dbapi_connection.execute(f"ATTACH '{path}' AS {self.quoted(database)}")
+
+    @overrides
+    def _safe_query(self, query_sql: str, database: str = None) -> pd.DataFrame:
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._safe_query(query_sql, database)
+
+    @overrides
+    def stream_query(self, query_sql: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        if self.latency:
+            time.sleep(self.latency)
+        yield from super().stream_query(query_sql, chunksize)
+
+    def _execute(self, query: str) -> None:
+        """runs a statement without a result set (DDL) and closes the connection."""
+        if self.latency:
+            time.sleep(self.latency)
+        engine = self.get_connection()
+        try:
+            with engine.connect() as conn:
+                conn.execute(query)
+        finally:
+            engine.dispose()
+
+    @overrides
+    def _get_all_databases(self) -> List[str]:
+        logger.debug('Collecting databases from duckdb...')
+        databases = self._safe_query(f"""
+SELECT
+    database_name AS name
+FROM
+    duckdb_databases()
+WHERE
+    NOT internal
+    AND database_name <> '{self._correct_case(DEFAULT_TEMPORARY_DATABASE)}'
+""")['name'].tolist()
+        logger.debug(f'Done. Found {len(databases)} databases.')
+        return databases
+
+    @overrides
+    def _get_all_schemas(self, database: str, exclude_defaults: Optional[bool] = False) -> List[str]:
+        logger.debug(f'Collecting schemas from {database} in duckdb...')
+        schemas = set(self._safe_query(f"""
+SELECT
+    schema_name AS name
+FROM
+    duckdb_schemas()
+WHERE
+    database_name = '{database}'
+    AND schema_name NOT IN ('information_schema', 'pg_catalog')
+""")['name'].tolist())
+        logger.debug(f'Done. Found {len(schemas)} schemas in {database} database.')
+        return schemas
+
+    @overrides
+    def _get_all_tables(self, database: str, schema: str) -> List[str]:
+        logger.debug(f'Collecting tables from {schema} schema in {database} database in duckdb...')
+        tables = self._safe_query(f"""
+SELECT
+    table_name AS name
+FROM
+    information_schema.tables
+WHERE
+    table_catalog = '{database}'
+    AND table_schema = '{schema}'
+""")['name'].tolist()
+        logger.debug(f'Done. Found {len(tables)} tables in {schema} schema of {database} database.')
+        return tables
+
+    @overrides
+    def _get_relations_from_database(
+            self, schema_obj: BaseSourceAdapter._DatabaseObject) -> List[Relation]:
+        database = schema_obj.full_relation.database
+        relations_frame = self._safe_query(f"""
+SELECT
+    m.table_schema AS schema,
+    m.table_name AS relation,
+    m.table_type AS materialization,
+    c.column_name AS attribute,
+    c.ordinal_position AS ordinal,
+    c.data_type AS data_type
+FROM
+    information_schema.tables m
+INNER JOIN
+    information_schema.columns c
+ON
+    c.table_catalog = m.table_catalog
+    AND c.table_schema = m.table_schema
+    AND c.table_name = m.table_name
+WHERE
+    m.table_catalog = '{database}'
+    AND m.table_schema = '{schema_obj.case_sensitive_name}'
+ORDER BY
+    m.table_name,
+    c.ordinal_position
+""")
+        relations = list()
+        for (schema, name, materialization), attributes in relations_frame.groupby(
+                ['schema', 'relation', 'materialization'], sort=False):
+            relation = Relation(database,
+                                self._correct_case(schema),
+                                self._correct_case(name),
+                                self.MATERIALIZATION_MAPPINGS[materialization],
+                                [Attribute(self._correct_case(attribute.attribute),
+                                           self._get_data_type(attribute.data_type))
+                                 for attribute in attributes.itertuples()])
+            logger.debug(f'Added relation {relation.dot_notation} to pool.')
+            relations.append(relation)
+        self._add_view_definitions(schema_obj, relations)
+        logger.debug(f'Acquired {len(relations)} total relations from database {database}.')
+        return relations
+
+    @overrides
+    def _get_data_type(self, source_type: str) -> DataType:
+        """nested types (lists, structs, maps) are JSON, type parameters are dropped."""
+        if source_type.endswith(']') or source_type.upper().startswith(('STRUCT', 'MAP', 'UNION')):
+            return dtypes.JSON
+        return super()._get_data_type(source_type.split('(')[0].strip())
+
+    @overrides
+    def generate_schema(self, name: str, database: str = 'SNOWSHU'):
+        corrected_database, corrected_name = (
+            self._correct_case(x) for x in (database, name))
+        logger.debug("Creating a schema %s in %s database...", corrected_name, corrected_database)
+        self._execute(f"CREATE SCHEMA IF NOT EXISTS {corrected_database}.{corrected_name}")
+
+    @overrides
+    def drop_schema(self, name: str, database: str = 'SNOWSHU'):
+        corrected_database, corrected_name = (
+            self._correct_case(x) for x in (database, name))
+        logger.debug("Dropping schema %s in %s database...", corrected_name, corrected_database)
+        self._execute(f"DROP SCHEMA IF EXISTS {corrected_database}.{corrected_name} CASCADE")
+
+    @overrides
+    def create_table(self, query: str, name: str, schema: str, database: str = 'SNOWSHU'):
+        corrected_name, corrected_schema, corrected_database = (
+            self._correct_case(x) for x in (name, schema, database))
+        logger.debug("Creating table %s in %s.%s...", corrected_name, corrected_database, corrected_schema)
+        self._execute(f"""CREATE TABLE IF NOT EXISTS
+            {corrected_database}.{corrected_schema}.{corrected_name}
+            AS {query}""")
+
+    @overrides
+    def clone_table(self, relation: Relation) -> None:
+        """Creates the temp table of the relation as a full copy of the source table (duckdb has no clones)."""
+        self.create_table(query=f"SELECT * FROM {self.quoted_dot_notation(relation)}",
+                          name=relation.name,
+                          schema=relation.temp_schema,
+                          database=relation.temp_database)
+
+    @overrides
+    def drop_table(self, name: str, schema: str, database: str = 'SNOWSHU'):
+        corrected_name, corrected_schema, corrected_database = (
+            self._correct_case(x) for x in (name, schema, database))
+        logger.debug("Dropping table %s in %s.%s...", corrected_name, corrected_database, corrected_schema)
+        self._execute(f"DROP TABLE IF EXISTS {corrected_database}.{corrected_schema}.{corrected_name}")
+
+    @classmethod
+    def relation_bytes_statement(cls, relation: Relation) -> str:
+        return cls._table_metadata_statement(relation, f'estimated_size * column_count * {cls.VALUE_BYTES}')
+
+    @classmethod
+    def average_row_bytes_statement(cls, relation: Relation) -> str:
+        return cls._table_metadata_statement(
+            relation, f'CASE WHEN estimated_size > 0 THEN column_count * {cls.VALUE_BYTES} END')
+
+    @classmethod
+    def _table_metadata_statement(cls, relation: Relation, expression: str) -> str:
+        adapter = cls()
+        database, schema, name = (adapter._correct_case(val)  # noqa pylint: disable=protected-access
+                                  for val in (relation.database, relation.schema, relation.name))
+        return f"""
+SELECT
+    MAX({expression})
+FROM
+    duckdb_tables()
+WHERE
+    database_name = '{database}'
+    AND schema_name = '{schema}'
+    AND table_name = '{name}'
+"""
+
+    @classmethod
+    def change_fingerprint_statement(cls, relation: Relation) -> str:
+        """creates the statement fingerprinting the content of a relation
+
+        duckdb keeps no modification time, so the fingerprint is the row count and an
+        order independent hash of all rows (a full scan of the relation).
+        """
+        adapter = cls()
+        return f"""
+SELECT
+    COUNT(*)::VARCHAR || ':' || COALESCE(BIT_XOR(HASH(snowshu_row))::VARCHAR, '')
+FROM
+    {adapter.quoted_dot_notation(relation)} AS snowshu_row
+"""
+
+    @classmethod
+    def change_fingerprints_statement(cls, database: str, relations: List[Relation]) -> str:
+        adapter = cls()
+        selects = list()
+        for relation in relations:
+            schema, name = (adapter._correct_case(val)  # noqa pylint: disable=protected-access
+                            for val in (relation.schema, relation.name))
+            selects.append(f"""
+SELECT
+    '{schema}' AS TABLE_SCHEMA,
+    '{name}' AS TABLE_NAME,
+    ({cls.change_fingerprint_statement(relation)}) AS FINGERPRINT
+""")
+        return 'UNION ALL'.join(selects)
+
+    @overrides
+    def get_change_fingerprints(self, relations: Iterable[Relation]) -> Dict[str, str]:
+        """Fingerprints the relations still in the source, relations missing from the source are left out."""
+        existing = {tuple(row) for row in self._safe_query("""
+SELECT
+    database_name,
+    schema_name,
+    table_name
+FROM
+    duckdb_tables()
+""").itertuples(index=False)}
+        return super().get_change_fingerprints(
+            [relation for relation in relations
+             if tuple(self._correct_case(val) for val in
+                      (relation.database, relation.schema, relation.name)) in existing])
+
+    @classmethod
+    def view_creation_statement(cls, relation: Relation) -> str:
+        adapter = cls()
+        database, schema, name = (adapter._correct_case(val)  # noqa pylint: disable=protected-access
+                                  for val in (relation.database, relation.schema, relation.name))
+        return f"""
+SELECT
+    RTRIM(SUBSTRING(sql, POSITION(' AS ' IN UPPER(sql)) + 4), ';' || CHR(10))
+FROM
+    duckdb_views()
+WHERE
+    database_name = '{database}'
+    AND schema_name = '{schema}'
+    AND view_name = '{name}'
+"""
+
+    @classmethod
+    def view_definitions_statement(cls, database: str, schema: str) -> str:
+        return f"""
+SELECT
+    view_name,
+    RTRIM(SUBSTRING(sql, POSITION(' AS ' IN UPPER(sql)) + 4), ';' || CHR(10))
+FROM
+    duckdb_views()
+WHERE
+    database_name = '{database}'
+    AND schema_name = '{schema}'
+"""
+
+    @overrides
+    def sample_statement_from_relation(
+            self, relation: Relation, sample_type: Union['BaseSampleMethod', None]) -> str:
+        """builds the base sample statment for a given relation, rows can be hashed as ``snowshu_row``."""
+        query = f"""
+SELECT
+    *
+FROM
+    {self.quoted_dot_notation(relation)} AS snowshu_row
+"""
+        if sample_type is not None:
+            query += f"{self._sample_type_to_query_sql(sample_type)}"
+        return query
+
+    @staticmethod
+    def partition_statement(query: str, partitions: int, partition: int) -> str:
+        """duckdb hashes the rows through the subquery alias, as it has no ``HASH(*)``."""
+        return f"""
+SELECT
+    snowshu_partition.*
+FROM
+    ({query}) AS snowshu_partition
+WHERE
+    MOD(HASH(snowshu_partition), {partitions}::UBIGINT) = {partition}
+"""
+
+    @staticmethod
+    def hash_constraint_statement(key: Optional[str], sample_type: 'HashSampleMethod') -> str:
+        """duckdb hashes are unsigned, the modulus stays unsigned so the hash is not rounded to a double."""
+        hashed = 'HASH(snowshu_row)' if key is None else f"HASH({key}::VARCHAR)"
+        return f"MOD({hashed}, {sample_type.buckets}::UBIGINT) < {sample_type.threshold}"
+
+    @staticmethod
+    def window_constraint_statement(window: 'TimeWindow') -> str:
+        if window.days is not None:
+            return f"{window.timestamp_attribute} >= CURRENT_TIMESTAMP - INTERVAL {window.days} DAY"
+        return SnowflakeAdapter.window_constraint_statement(window)
+
+    @staticmethod
+    def _sample_type_to_query_sql(sample_type: 'BaseSampleMethod') -> str:
+        """translates the Snowflake SAMPLE clauses to duckdb TABLESAMPLE clauses"""
+        if sample_type.name == 'BERNOULLI':
+            if sample_type.probability:
+                return f"TABLESAMPLE BERNOULLI({sample_type.probability}%)"
+            return f"TABLESAMPLE RESERVOIR({sample_type.rows} ROWS)"
+        if sample_type.name == 'SYSTEM':
+            return f"TABLESAMPLE SYSTEM({sample_type.probability}%)"
+        if sample_type.name == 'STRATIFIED':
+            return SnowflakeAdapter._sample_type_to_query_sql(sample_type)  # noqa pylint: disable=protected-access
+
+        message = f"{sample_type.name} is not supported for DuckdbAdapter"
+        logger.error(message)
+        raise NotImplementedError(message)
+
+
+def synthetic_parent(index: int, fan_out: int = 1, depth: Optional[int] = None) -> Optional[int]:
+    """The index of the relation a synthetic relation references, None for roots.
+
+    Relations fill trees breadth first, every relation referenced by up to ``fan_out`` children.
+    A tree holding ``depth`` levels is full, the next relation starts a new tree.
+    """
+    if depth is None:
+        tree_size = index + 1
+    else:
+        tree_size = depth if fan_out == 1 else (fan_out ** depth - 1) // (fan_out - 1)
+    tree, position = divmod(index, tree_size)
+    return None if position == 0 else tree * tree_size + (position - 1) // fan_out
+
+
+def generate_synthetic_catalog(directory: Union[Path, str],  # noqa pylint: disable=too-many-arguments,too-many-locals
+                               databases: int = 2,
+                               schemas: int = 2,
+                               relations: int = 4,
+                               rows: int = 10000,
+                               fan_out: int = 1,
+                               depth: Optional[int] = None,
+                               columns: int = 0,
+                               column_width: int = 32,
+                               json_columns: int = 0) -> Dict[str, Optional[str]]:
+    """Creates duckdb database files of synthetic relations for offline runs of the :class:`DuckdbAdapter`.
+
+    Every relation has an ``id`` key, a ``parent_id`` referencing the ``id`` of its parent
+    relation in the same schema (see :func:`synthetic_parent`) and a few columns of common types.
+    Values derive from a hash of the row id, so the same arguments always build the same catalog.
+
+    Args:
+        directory: where the ``db_<n>.duckdb`` files are written, existing files are replaced.
+        databases: the number of databases.
+        schemas: the number of schemas per database.
+        relations: the number of relations per schema.
+        rows: the number of rows per relation.
+        fan_out: the number of relations referencing each relation, default a chain.
+        depth: the number of levels of relations referencing each other, default unlimited.
+        columns: the number of additional text columns.
+        column_width: the length of the additional text columns.
+        json_columns: the number of additional JSON columns.
+    Returns:
+        the parent relation of every relation created, in dot notation.
+    """
+    directory = Path(directory).expanduser()
+    directory.mkdir(parents=True, exist_ok=True)
+    created = dict()
+    for database_index in range(databases):
+        database = f"db_{database_index}"
+        path = directory / f"{database}{DuckdbAdapter.FILE_SUFFIX}"
+        if path.exists():
+            path.unlink()
+        conn = duckdb.connect(str(path))
+        try:
+            for schema_index in range(schemas):
+                schema = f"schema_{schema_index}"
+                conn.execute(f"CREATE SCHEMA {schema}")
+                for relation_index in range(relations):
+                    name = f"relation_{relation_index}"
+                    parent = synthetic_parent(relation_index, fan_out, depth)
+                    extra_columns = ''.join(
+                        f",\n    LEFT(REPEAT(MD5(range::VARCHAR || '{name}.text_{column}'), "
+                        f"{column_width // 32 + 1}), {column_width}) AS text_{column}"
+                        for column in range(columns))
+                    extra_columns += ''.join(
+                        f",\n    JSON_OBJECT('id', range, 'tags', [MD5(range::VARCHAR || '{name}.json_{column}')], "
+                        f"'score', HASH(range, '{name}.json_{column}') % 1000::UBIGINT) AS json_{column}"
+                        for column in range(json_columns))
+                    conn.execute(f"""
+CREATE TABLE {schema}.{name} AS
+SELECT
+    range AS id,
+    {'NULL' if parent is None else f"(HASH(range, '{name}') % {rows}::UBIGINT)"}::BIGINT AS parent_id,
+    'name_' || (HASH(range, '{name}.name') % 1000::UBIGINT)::VARCHAR AS name,
+    ((HASH(range, '{name}.amount') % 100000::UBIGINT) / 100)::DECIMAL(18, 2) AS amount,
+    TIMESTAMP '2020-01-01' + TO_SECONDS((HASH(range, '{name}.created_at') % 94608000::UBIGINT)::BIGINT) AS created_at,
+    HASH(range, '{name}.is_active') % 2::UBIGINT = 0 AS is_active{extra_columns}
+FROM
+    range({rows})
+""")
+                    created['.'.join((database, schema, name,))] = (
+                        None if parent is None else '.'.join((database, schema, f"relation_{parent}",)))
+        finally:
+            conn.close()
+    logger.info('Generated %s synthetic relations in %s.', len(created), directory)
+    return created
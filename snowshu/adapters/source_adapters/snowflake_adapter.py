@@ -1,6 +1,6 @@
 import logging
 import time
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Union
 from urllib.parse import quote
 
 import pandas as pd
@@ -13,22 +13,28 @@ from tenacity.wait import wait_exponential
 
 import snowshu.core.models.data_types as dtypes
 import snowshu.core.models.materializations as mz
+from snowshu.adapters.base_sql_adapter import TRACED_SQL_LENGTH
 from snowshu.adapters.source_adapters import BaseSourceAdapter
+from snowshu.adapters.source_adapters.snowflake_metadata import SnowflakeMetadataMixin
+from snowshu.configs import ASYNC_QUERY_POLL_SECONDS
+from snowshu.core import concurrency, run_report, tracing
 from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.credentials import (ACCOUNT, DATABASE, PASSWORD, ROLE,
                                              SCHEMA, USER, WAREHOUSE)
 from snowshu.core.models.relation import Relation
 from snowshu.exceptions import TooManyRecords
 from snowshu.logger import Logger
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod, HashSampleMethod,
+                                              StratifiedSampleMethod, SystemSampleMethod)
 
 if TYPE_CHECKING:
     from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+    from snowshu.samplings.samplings.recent_window_sampling import TimeWindow
 
 logger = logging.getLogger(__name__)
 
 
-class SnowflakeAdapter(BaseSourceAdapter):
+class SnowflakeAdapter(SnowflakeMetadataMixin, BaseSourceAdapter):
     """The Snowflake Data Warehouse source adapter.
 
     Args:
@@ -38,8 +44,10 @@ class SnowflakeAdapter(BaseSourceAdapter):
 
     name = 'snowflake'
     SUPPORTS_CROSS_DATABASE = True
+    SUPPORTS_ASYNC_QUERIES = True
+    SUPPORTS_MULTI_STATEMENT = True
     SUPPORTED_FUNCTIONS = set(['ANY_VALUE', 'RLIKE', 'UUID_STRING'])
-    SUPPORTED_SAMPLE_METHODS = (BernoulliSampleMethod,)
+    SUPPORTED_SAMPLE_METHODS = (BernoulliSampleMethod, HashSampleMethod, StratifiedSampleMethod, SystemSampleMethod,)
     REQUIRED_CREDENTIALS = (USER, PASSWORD, ACCOUNT, DATABASE,)
     ALLOWED_CREDENTIALS = (SCHEMA, WAREHOUSE, ROLE,)
     # snowflake in-db is UPPER, but connector is actually lower :(
@@ -164,13 +172,19 @@ class SnowflakeAdapter(BaseSourceAdapter):
             logger.error(error_message)
             raise
 
-    def create_table(self, query: str, name: str, schema: str, database: str = 'SNOWSHU'):
+    def _create_table_statement(self, query: str, name: str, schema: str, database: str) -> str:
         corrected_name, corrected_schema, corrected_database = (
             self._correct_case(x) for x in (name, schema, database)
         )
-        full_query = f'''CREATE TRANSIENT TABLE IF NOT EXISTS
+        return f'''CREATE TRANSIENT TABLE IF NOT EXISTS
             {corrected_database}.{corrected_schema}.{corrected_name}
             AS {query}'''
+
+    def create_table(self, query: str, name: str, schema: str, database: str = 'SNOWSHU'):
+        corrected_name, corrected_schema, corrected_database = (
+            self._correct_case(x) for x in (name, schema, database)
+        )
+        full_query = self._create_table_statement(query, name, schema, database)
         try:
             logger.debug(
                 "Creating table %s in %s.%s...",
@@ -196,6 +210,98 @@ class SnowflakeAdapter(BaseSourceAdapter):
             logger.error(error_message)
             raise
 
+    @overrides
+    def submit_create_table(self, query: str, name: str, schema: str, database: str = 'SNOWSHU') -> str:
+        """Submits the creation of a transient table from a query as an asynchronous Snowflake query.
+
+        The query keeps running on the warehouse after the connection that submitted it is closed.
+        """
+        full_query = self._create_table_statement(query, name, schema, database)
+        engine = self.get_connection()
+        connection = engine.raw_connection()
+        try:
+            with concurrency.slot(self.CONCURRENCY_SIDE, 'submit'):
+                cursor = connection.cursor()
+                cursor.execute_async(full_query)
+                query_id = cursor.sfqid
+        finally:
+            connection.close()
+            engine.dispose()
+        logger.debug(f"Submitted query {query_id} creating table {database}.{schema}.{name}.")
+        return query_id
+
+    @overrides
+    def wait_for_queries(self, query_ids: Iterable[str]) -> Dict[str, float]:
+        """Polls the status of submitted queries every ASYNC_QUERY_POLL_SECONDS until all of them completed."""
+        running = list(query_ids)
+        completed = dict()
+        engine = self.get_connection()
+        connection = engine.raw_connection()
+        try:
+            with tracing.span('wait for queries', 'query', queries=len(running)):
+                while running:
+                    for query_id in list(running):
+                        # raises the error of failed queries
+                        status = connection.dbapi_connection.get_query_status_throw_if_error(query_id)
+                        if not connection.dbapi_connection.is_still_running(status):
+                            completed[query_id] = time.perf_counter()
+                            running.remove(query_id)
+                    if running:
+                        time.sleep(ASYNC_QUERY_POLL_SECONDS)
+        finally:
+            connection.close()
+            engine.dispose()
+        logger.debug(f"{len(completed)} submitted queries completed.")
+        return completed
+
+    def clone_table(self, relation: Relation) -> None:
+        """Creates the temp table of the relation as a zero-copy clone of the source table.
+
+        Args:
+            relation: the unsampled :class:`Relation <snowshu.core.models.relation.Relation>` to clone.
+        """
+        corrected_name, corrected_schema, corrected_database = (
+            self._correct_case(x) for x in (relation.name, relation.temp_schema, relation.temp_database)
+        )
+        full_query = f'''CREATE TRANSIENT TABLE IF NOT EXISTS
+            {corrected_database}.{corrected_schema}.{corrected_name}
+            CLONE {self.quoted_dot_notation(relation)}'''
+        try:
+            logger.debug("Cloning %s into %s.%s...",
+                         relation.dot_notation, corrected_database, corrected_schema)
+            result = self._safe_query(full_query)
+            logger.info("Table clone result: %s", result['status'][0])
+        except ValueError as err:
+            logger.error("An error occurred while cloning the table %s into %s.%s: %s",
+                         relation.dot_notation, corrected_database, corrected_schema, err)
+            raise
+
+    @staticmethod
+    def key_table_name(relation: Relation, key: str) -> str:
+        """the name of the table holding the distinct values of a key of the relation sample"""
+        return f"{relation.name}__{key}__KEYS"
+
+    def key_table_dot_notation(self, relation: Relation, key: str) -> str:
+        return f"{relation.temp_database}.{relation.temp_schema}.{self.key_table_name(relation, key)}"
+
+    def create_key_table(self, relation: Relation, key: str) -> int:
+        """Materializes the distinct values of a key of the relation sample next to its temp table.
+
+        The key keeps its source type, so the table holds one narrow column instead of the full sampled rows.
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` whose temp table exists.
+            key: the attribute downstream relations are constrained on.
+        Returns:
+            the number of distinct keys
+        """
+        self.create_table(query=f"SELECT DISTINCT {key} FROM {relation.temp_dot_notation}",
+                          name=self.key_table_name(relation, key),
+                          schema=relation.temp_schema,
+                          database=relation.temp_database)
+        # answered from the table metadata, the key table is not scanned
+        return int(self.scalar_query(f"SELECT COUNT(*) FROM {self.key_table_dot_notation(relation, key)}"))
+
     def drop_table(self, name: str, schema: str, database: str = 'SNOWSHU'):
         corrected_name, corrected_schema, corrected_database = (
             self._correct_case(x) for x in (name, schema, database)
@@ -214,8 +320,8 @@ class SnowflakeAdapter(BaseSourceAdapter):
             logger.error(error_message)
             raise
 
-    @staticmethod
-    def population_count_statement(relation: Relation) -> str:
+    @classmethod
+    def population_count_statement(cls, relation: Relation) -> str:
         """creates the count * statement for a relation
 
         Args:
@@ -223,21 +329,91 @@ class SnowflakeAdapter(BaseSourceAdapter):
         Returns:
             a query that results in a single row, single column, integer value of the unsampled relation population size
         """
-        adapter = SnowflakeAdapter()
+        adapter = cls()
         return f"SELECT COUNT(*) FROM {adapter.quoted_dot_notation(relation)}"
 
-    @staticmethod
-    def view_creation_statement(relation: Relation) -> str:
-        adapter = SnowflakeAdapter()
+    @classmethod
+    def population_counts_statement(cls, relations: List[Relation]) -> str:
+        """creates a single statement counting the rows of several relations
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to create the statement for.
+        Returns:
+            a query that results in one row of ``RELATION_INDEX`` (the position of the relation) and
+            ``POPULATION_SIZE`` per relation
+        """
+        return '\nUNION ALL\n'.join(
+            f"SELECT {index} AS RELATION_INDEX, ({cls.population_count_statement(relation)}) AS POPULATION_SIZE"
+            for index, relation in enumerate(relations))
+
+    @overrides
+    def get_population_counts(self, relations: List[Relation]) -> List[int]:
+        """Counts the rows of the relations with a single query, rather than a count check and a fetch per relation."""
+        if not relations:
+            return list()
+        counts = dict(self._safe_query(self.population_counts_statement(relations)).itertuples(index=False))
+        return [int(counts[index]) for index in range(len(relations))]
+
+    @overrides
+    def query_many(self, queries: List[str]) -> List[pd.DataFrame]:
+        """Runs the queries as a single multi-statement request, reading their result sets in turn."""
+        if not self.SUPPORTS_MULTI_STATEMENT or len(queries) < 2:
+            return super().query_many(queries)
+        statements = ';\n'.join(query.strip().rstrip(';') for query in queries)
+        frames = list()
+        engine = self.get_connection()
+        connection = engine.raw_connection()
+        try:
+            with concurrency.slot(self.CONCURRENCY_SIDE), \
+                    tracing.span('query', 'query', sql=statements[:TRACED_SQL_LENGTH], statements=len(queries)):
+                cursor = connection.cursor()
+                cursor.execute(statements, num_statements=len(queries))
+                while True:
+                    columns = [engine.dialect.normalize_name(column[0]) for column in cursor.description]
+                    frames.append(pd.DataFrame(cursor.fetchall(), columns=columns))
+                    if not cursor.nextset():
+                        break
+        finally:
+            connection.close()
+            engine.dispose()
+        logger.debug(f"Fetched the results of {len(frames)} statements in one request.")
+        return frames
+
+    @classmethod
+    def stratum_count_statement(cls, relation: Relation, strata: List[str], limit: Optional[int] = None) -> str:
+        """creates the statement collecting the size of every stratum of a relation
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to create the statement for.
+            strata: the attributes partitioning the relation.
+            limit: the maximum number of strata to return, all of them if ``None``.
+        Returns:
+            a query that results in a single column of integer stratum sizes, one row per stratum
+        """
+        adapter = cls()
+        limit_clause = '' if limit is None else f"LIMIT {limit}"
+        return f"""
+SELECT
+    COUNT(*) AS stratum_size
+FROM
+    {adapter.quoted_dot_notation(relation)}
+GROUP BY
+    {', '.join(strata)}
+{limit_clause}
+"""
+
+    @classmethod
+    def view_creation_statement(cls, relation: Relation) -> str:
+        adapter = cls()
         return f"""
 SELECT
 SUBSTRING(GET_DDL('view','{adapter.quoted_dot_notation(relation)}'),
 POSITION(' AS ' IN UPPER(GET_DDL('view','{adapter.quoted_dot_notation(relation)}')))+3)
 """
 
-    @staticmethod
-    def unsampled_statement(relation: Relation) -> str:
-        adapter = SnowflakeAdapter()
+    @classmethod
+    def unsampled_statement(cls, relation: Relation) -> str:
+        adapter = cls()
         return f"""
 SELECT
     *
@@ -270,9 +446,9 @@ FROM
 {relation.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
 """
 
-    @staticmethod
-    def analyze_wrap_statement(sql: str, relation: Relation) -> str:
-        adapter = SnowflakeAdapter()
+    @classmethod
+    def analyze_wrap_statement(cls, sql: str, relation: Relation) -> str:
+        adapter = cls()
         return f"""
 WITH
     {relation.scoped_cte('SNOWSHU_COUNT_POPULATION')} AS (
@@ -315,37 +491,128 @@ FROM
             query += f"{self._sample_type_to_query_sql(sample_type)}"
         return query
 
-    @staticmethod
-    def union_constraint_statement(subject: Relation,
-                                   constraint: Relation,
-                                   subject_key: str,
-                                   constraint_key: str,
-                                   max_number_of_outliers: int) -> str:
-        """ Union statements to select outliers. This does not pull in NULL values. """
-        adapter = SnowflakeAdapter()
+    def outliers_union_statement(self,
+                                 sql: str,
+                                 relation: Relation,
+                                 constraints: List[Tuple[Relation, str, str, bool]]) -> str:
+        """ Adds the outliers of all edges of the relation to its sample
+
+            Outliers are rows whose key has no match in a related relation, found in a single scan of the
+            relation with one NOT EXISTS anti-join per edge. NULL keys are not outliers. Outliers keep one
+            row per key and rows with keys already in the sample are dropped, so the sample is appended
+            with UNION ALL instead of a full row deduplicating UNION.
+
+            Args:
+                sql: the sample query of the relation
+                relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to select outliers of
+                constraints: (related relation, relation key, related key, from sample) for every edge,
+                    from sample matches against the sampled temp (or key) table of the related relation
+                    instead of its full population.
+        """
+        conditions = list()
+        for constraint, subject_key, constraint_key, from_sample in constraints:
+            if from_sample:
+                key_table_size = (constraint.key_table_sizes or {}).get(constraint_key)
+                table = (constraint.temp_dot_notation if key_table_size is None
+                         else self.key_table_dot_notation(constraint, constraint_key))
+            else:
+                table = self.quoted_dot_notation(constraint)
+            conditions.append(f"(snowshu_subject.{subject_key} IS NOT NULL AND NOT EXISTS "
+                              f"(SELECT 1 FROM {table} AS snowshu_constraint "
+                              f"WHERE snowshu_constraint.{constraint_key} = snowshu_subject.{subject_key}))")
+
+        keys = list()
+        for _, subject_key, _, _ in constraints:
+            if subject_key.lower() not in [key.lower() for key in keys]:
+                keys.append(subject_key)
+        same_keys = ' AND '.join(f"snowshu_sampled.{key} IS NOT DISTINCT FROM snowshu_outlier.{key}" for key in keys)
+        newline_or = '\n    OR '
+        partition = ', '.join('snowshu_subject.' + key for key in keys)
         return f"""
-(SELECT
+WITH
+{relation.scoped_cte('SNOWSHU_SAMPLE')} AS (
+{sql}
+)
+,{relation.scoped_cte('SNOWSHU_OUTLIERS')} AS (
+SELECT
     *
 FROM
-{adapter.quoted_dot_notation(subject)}
+{self.quoted_dot_notation(relation)} AS snowshu_subject
 WHERE
-    {subject_key}
-NOT IN
-(SELECT
-    {constraint_key}
+    {newline_or.join(conditions)}
+QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY snowshu_subject.{keys[0]}) = 1
+LIMIT {relation.max_number_of_outliers}
+)
+SELECT
+    *
 FROM
-{adapter.quoted_dot_notation(constraint)})
-LIMIT {max_number_of_outliers})
+{relation.scoped_cte('SNOWSHU_SAMPLE')}
+UNION ALL
+SELECT
+    *
+FROM
+{relation.scoped_cte('SNOWSHU_OUTLIERS')} AS snowshu_outlier
+WHERE NOT EXISTS (SELECT 1 FROM {relation.scoped_cte('SNOWSHU_SAMPLE')} AS snowshu_sampled WHERE {same_keys})
 """
 
-    @staticmethod
-    def upstream_constraint_statement(relation: Relation,
+    @classmethod
+    def upstream_constraint_statement(cls,
+                                      relation: Relation,
                                       local_key: str,
-                                      remote_key: str) -> str:
-        """ builds upstream where constraints against downstream full population"""
-        adapter = SnowflakeAdapter()
+                                      remote_key: str,
+                                      window: Optional['TimeWindow'] = None) -> str:
+        """ builds upstream where constraints against downstream full population,
+            or only the rows of its time window when the downstream relation is windowed"""
+        adapter = cls()
+        window_filter = '' if window is None else f" WHERE {adapter.window_constraint_statement(window)}"
         return f" {local_key} in (SELECT {remote_key} FROM \
-                {adapter.quoted_dot_notation(relation)})"
+                {adapter.quoted_dot_notation(relation)}{window_filter})"
+
+    @staticmethod
+    def partition_statement(query: str, partitions: int, partition: int) -> str:
+        """Builds the statement selecting one of the disjoint hash partitions of the rows of a query.
+
+        Args:
+            query: the query to partition.
+            partitions: the number of partitions.
+            partition: the partition to select, from 0 to partitions - 1.
+        Returns:
+            a query returning the rows of the partition.
+        """
+        return f"""
+SELECT
+    *
+FROM
+    ({query}) AS snowshu_partition
+WHERE
+    MOD(ABS(HASH(*)), {partitions}) = {partition}
+"""
+
+    @staticmethod
+    def hash_constraint_statement(key: Optional[str], sample_type: 'HashSampleMethod') -> str:
+        """Builds the 'where' string keeping the rows whose hashed key lands in the sampled buckets.
+
+        Keys are hashed as VARCHAR so that related keys of different numeric and text types
+        hash to the same bucket.
+        """
+        hashed = 'HASH(*)' if key is None else f"HASH({key}::VARCHAR)"
+        return f"MOD(ABS({hashed}), {sample_type.buckets}) < {sample_type.threshold}"
+
+    @staticmethod
+    def window_constraint_statement(window: 'TimeWindow') -> str:
+        """Builds the 'where' string keeping the rows of a time window.
+
+        The bounds are constants (CURRENT_TIMESTAMP is folded at compile time) compared directly
+        to the attribute, so micro-partitions outside the window are pruned.
+        """
+        if window.days is not None:
+            return f"{window.timestamp_attribute} >= DATEADD(DAY, -{window.days}, CURRENT_TIMESTAMP())"
+        bounds = list()
+        if window.start is not None:
+            bounds.append(f"{window.timestamp_attribute} >= '{window.start}'")
+        if window.end is not None:
+            bounds.append(f"{window.timestamp_attribute} < '{window.end}'")
+        return ' AND '.join(bounds)
 
     def _validate_key_index_error(self,
                                   relation: Relation,
@@ -379,6 +646,24 @@ LIMIT {max_number_of_outliers})
                 f"Remote key {remote_key} not found in {relation.temp_dot_notation} table."
             ) from err
 
+    def _key_table_constraint(self, relation: Relation, remote_key: str, key_table_size: int) -> str:
+        """
+        Selects the keys from the key table of the relation, its row count
+        standing in for the exists probe against the temp table.
+        """
+        key_table = self.key_table_dot_notation(relation, remote_key)
+        if key_table_size == 0:
+            logger.critical(
+                "Failed to build predicates for %s: the constraint set "
+                "is empty, please validate the relation.",
+                key_table,
+            )
+            raise IndexError("Failed to build predicates, the constraint set is empty.")
+        return (
+            f"    SELECT {self.format_remote_key(relation, remote_key)} "
+            f"    FROM {key_table} "
+        )
+
     def format_remote_key(self, relation: Relation, remote_key: str) -> str:
         """Formats the remote key based on whether it needs to be quoted or not."""
         attribute = relation.lookup_attribute(remote_key)
@@ -402,6 +687,10 @@ LIMIT {max_number_of_outliers})
                     f"FROM ({relation.core_query}))"
                 )
 
+            key_table_size = (relation.key_table_sizes or {}).get(remote_key)
+            if key_table_size is not None:
+                return f"{local_key} IN ({self._key_table_constraint(relation, remote_key, key_table_size)})"
+
             constraint_query = (
                 f"    SELECT DISTINCT {formatted_remote_key} "
                 f"    FROM {relation.temp_dot_notation} "
@@ -439,6 +728,11 @@ LIMIT {max_number_of_outliers})
             return f"SAMPLE BERNOULLI ({qualifier})"
         if sample_type.name == 'SYSTEM':
             return f"SAMPLE SYSTEM ({sample_type.probability})"
+        if sample_type.name == 'STRATIFIED':
+            partition = ', '.join(sample_type.strata)
+            return (f"QUALIFY ROW_NUMBER() OVER (PARTITION BY {partition} ORDER BY RANDOM()) "
+                    f"<= GREATEST({sample_type.min_per_stratum}, "
+                    f"CEIL(COUNT(*) OVER (PARTITION BY {partition}) * {sample_type.fraction}))")
 
         message = f"{sample_type.name} is not supported for SnowflakeAdapter"
         logger.error(message)
@@ -522,6 +816,7 @@ LIMIT {max_number_of_outliers})
             logger.debug(f'Added relation {relation.dot_notation} to pool.')
             relations.append(relation)
 
+        self._add_view_definitions(schema_obj, relations)
         logger.debug(
             f'Acquired {len(relations)} total relations from database {quoted_database}.')
         return relations
@@ -545,7 +840,8 @@ LIMIT {max_number_of_outliers})
         try:
             logger.debug('Checking count for query...')
             start_time = time.time()
-            count = self._count_query(query)
+            with run_report.phase('count_check'):
+                count = self._count_query(query)
             if unsampled and count > max_count:
                 warn_msg = (f'Unsampled relation has {count} rows which is over '
                             f'the max allowed rows for this type of query ({max_count}). '
@@ -561,7 +857,8 @@ LIMIT {max_number_of_outliers})
             logger.error(message)
             logger.debug(f'failed sql: {query}')
             raise TooManyRecords(message) from exc
-        response = self._safe_query(query)
+        with run_report.phase('fetch'):
+            response = self._safe_query(query)
         return response
 
     @overrides
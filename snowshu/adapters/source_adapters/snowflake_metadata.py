@@ -0,0 +1,158 @@
+import logging
+from typing import Dict, Iterable, List
+
+from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+from snowshu.core.models.relation import Relation
+
+logger = logging.getLogger(__name__)
+
+
+class SnowflakeMetadataMixin:
+    """The statements reading storage metadata, change fingerprints and view definitions from the
+    Snowflake ``INFORMATION_SCHEMA``, for the :class:`SnowflakeAdapter
+    <snowshu.adapters.source_adapters.snowflake_adapter.SnowflakeAdapter>`.
+    """
+
+    # changes whenever the data of a table changes, from INFORMATION_SCHEMA.TABLES
+    CHANGE_FINGERPRINT = ("TO_VARCHAR(LAST_ALTERED) || ':' || COALESCE(TO_VARCHAR(ROW_COUNT), '') "
+                          "|| ':' || COALESCE(TO_VARCHAR(BYTES), '')")
+
+    @classmethod
+    def relation_bytes_statement(cls, relation: Relation) -> str:
+        """creates the statement looking up the storage size of a relation
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to create the statement for.
+        Returns:
+            a query that results in a single row, single column, integer value of the relation size in bytes
+            (NULL for views)
+        """
+        return cls._table_metadata_statement(relation, 'BYTES')
+
+    @classmethod
+    def average_row_bytes_statement(cls, relation: Relation) -> str:
+        """creates the statement estimating the row width of a relation from its storage metadata
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to create the statement for.
+        Returns:
+            a query that results in a single row, single column, numeric value of the average bytes per row
+            (NULL for views and empty tables)
+        """
+        return cls._table_metadata_statement(relation, 'BYTES / NULLIF(ROW_COUNT, 0)')
+
+    @classmethod
+    def change_fingerprint_statement(cls, relation: Relation) -> str:
+        """creates the statement reading the change fingerprint of a relation from its storage metadata
+
+        Args:
+            relation: the :class:`Relation <snowshu.core.models.relation.Relation>` to create the statement for.
+        Returns:
+            a query that results in a single row, single column, string value of the last altered time,
+            row count and bytes of the relation (empty row count and bytes for views)
+        """
+        return cls._table_metadata_statement(relation, cls.CHANGE_FINGERPRINT)
+
+    @classmethod
+    def change_fingerprints_statement(cls, database: str, relations: List[Relation]) -> str:
+        """creates the statement reading the change fingerprints of several relations of a database at once
+
+        Args:
+            database: the database of the relations.
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to create the statement for.
+        Returns:
+            a query that results in one row of ``TABLE_SCHEMA``, ``TABLE_NAME`` and ``FINGERPRINT`` per relation found
+        """
+        adapter = cls()
+        tables = ',\n    '.join(
+            f"('{adapter._correct_case(relation.schema)}', '{adapter._correct_case(relation.name)}')"  # noqa pylint: disable=protected-access
+            for relation in relations)
+        return f"""
+SELECT
+    TABLE_SCHEMA,
+    TABLE_NAME,
+    {cls.CHANGE_FINGERPRINT} AS FINGERPRINT
+FROM
+    {adapter.quoted(adapter._correct_case(database))}.INFORMATION_SCHEMA.TABLES
+WHERE
+    (TABLE_SCHEMA, TABLE_NAME) IN (
+    {tables})
+"""
+
+    def get_change_fingerprints(self, relations: Iterable[Relation]) -> Dict[str, str]:
+        """Reads the change fingerprints of relations, with one metadata query per database.
+
+        Args:
+            relations: the :class:`Relations <snowshu.core.models.relation.Relation>` to fingerprint.
+        Returns:
+            the fingerprint per relation dot notation, relations missing from the source are left out
+        """
+        by_database: Dict[str, List[Relation]] = dict()
+        for relation in relations:
+            by_database.setdefault(relation.database, []).append(relation)
+
+        fingerprints = dict()
+        for database, database_relations in by_database.items():
+            lookup = {(self._correct_case(relation.schema), self._correct_case(relation.name)): relation
+                      for relation in database_relations}
+            result = self._safe_query(self.change_fingerprints_statement(database, database_relations))
+            for row in result.itertuples(index=False):
+                relation = lookup.get((row[0], row[1]))
+                if relation is not None:
+                    fingerprints[relation.dot_notation] = row[2]
+        return fingerprints
+
+    @classmethod
+    def _table_metadata_statement(cls, relation: Relation, expression: str) -> str:
+        adapter = cls()
+        database, schema, name = (adapter._correct_case(val)  # noqa pylint: disable=protected-access
+                                  for val in (relation.database, relation.schema, relation.name))
+        return f"""
+SELECT
+    {expression}
+FROM
+    {adapter.quoted(database)}.INFORMATION_SCHEMA.TABLES
+WHERE
+    TABLE_SCHEMA = '{schema}'
+    AND TABLE_NAME = '{name}'
+"""
+
+    @classmethod
+    def view_definitions_statement(cls, database: str, schema: str) -> str:
+        """creates the statement reading the definitions of all views of a schema
+
+        Definitions are only visible to the owner of a view, others read NULL.
+
+        Args:
+            database: the database of the schema.
+            schema: the case sensitive name of the schema.
+        Returns:
+            a query that results in one row of view name and the SELECT it is defined by per view
+        """
+        adapter = cls()
+        return f"""
+SELECT
+    TABLE_NAME,
+    IFF(UPPER(LTRIM(VIEW_DEFINITION)) LIKE 'CREATE%',
+        SUBSTRING(VIEW_DEFINITION, POSITION(' AS ' IN UPPER(VIEW_DEFINITION))+3),
+        VIEW_DEFINITION)
+FROM
+    {adapter.quoted(database)}.INFORMATION_SCHEMA.VIEWS
+WHERE
+    TABLE_SCHEMA = '{schema}'
+"""
+
+    def _add_view_definitions(self,
+                              schema_obj: BaseSourceAdapter._DatabaseObject,
+                              relations: List[Relation]) -> None:
+        """Reads the definitions of all views of the schema with one query, sparing a DDL lookup per view."""
+        views = {relation.name: relation for relation in relations if relation.is_view}
+        if not views:
+            return
+        definitions = self._safe_query(self.view_definitions_statement(schema_obj.full_relation.database,
+                                                                       schema_obj.case_sensitive_name))
+        for name, definition in definitions.itertuples(index=False):
+            view = views.get(self._correct_case(name))
+            if view is not None and definition:
+                view.view_definition = definition
+        logger.debug(f'Read the definitions of {len(definitions)} views of schema {schema_obj.case_sensitive_name}.')
@@ -1,10 +1,11 @@
 import os
 from datetime import datetime
 from time import sleep
-from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
 import logging
 
 import pandas as pd
+from sqlalchemy.exc import ProgrammingError
 
 from snowshu.adapters import BaseSQLAdapter
 from snowshu.configs import (DEFAULT_INSERT_CHUNK_SIZE,
@@ -16,6 +17,7 @@ from snowshu.core.models import DataType, data_types as dt
 from snowshu.core.models import materializations as mz
 from snowshu.core.models.credentials import (DATABASE, HOST, PASSWORD, PORT,
                                              USER)
+from snowshu.core import concurrency, run_report, tracing, transform
 from snowshu.core.utils import case_insensitive_dict_value
 
 if TYPE_CHECKING:
@@ -29,6 +31,7 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
     REQUIRED_CREDENTIALS = [USER, PASSWORD, HOST, PORT, DATABASE]
     ALLOWED_CREDENTIALS = []
     DOCKER_TARGET_PORT = DOCKER_TARGET_PORT
+    CONCURRENCY_SIDE = concurrency.TARGET
 
     def __init__(self, replica_metadata: dict):
         super().__init__()
@@ -90,7 +93,8 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
                                  relation: "Relation",
                                  data: Optional[pd.DataFrame]) -> None:
         if relation.is_view:
-            self.create_or_replace_view(relation)
+            with run_report.phase('load'):
+                self.create_or_replace_view(relation)
         else:
             self.load_data_into_relation(relation, data)
 
@@ -105,12 +109,17 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
         """
         raise NotImplementedError()
 
-    def load_data_into_relation(self, relation: Relation, data: pd.DataFrame) -> None:
+    @tracing.traced('target')
+    def load_data_into_relation(self,
+                                relation: Relation,
+                                data: pd.DataFrame,
+                                if_exists: str = 'replace') -> None:
         """Loads data into a target.
 
         Args:
             relation: The relation containing info about dataset to load.
             data: The data to load into the relation.
+            if_exists: ``replace`` (re)creates the relation, ``append`` adds the data to it.
         """
         database = self.quoted(self._correct_case(relation.database))
         schema = self.quoted(self._correct_case(relation.schema))
@@ -136,9 +145,20 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
         data = data if data is not None else relation.data
         original_columns = data.columns.copy()
         data.columns = [self._correct_case(col) for col in original_columns]
+        transformer = transform.current()
+        renderer = self._get_renderer(relation) \
+            if transformer is not None and transformer.offloads(data) else None
+        rendered = None
+        with run_report.phase('sanitize'):
+            if renderer is None:
+                data = self.sanitize_data(relation, data)
+            else:
+                rendered = transformer.apply(renderer, data)
+        if run_report.recording():
+            run_report.record_bytes(int(data.memory_usage(deep=True).sum()))
 
         attribute_type_map = {
-            attr.name: attr.data_type.sqlalchemy_type
+            attr.name: self._get_load_type(attr.data_type)
             for attr in relation.attributes
         }
 
@@ -148,16 +168,36 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
         }
 
         try:
-            data.to_sql(
-                self._correct_case(relation.name),
-                engine,
-                schema=self._correct_case(schema),
-                if_exists='replace',
-                index=False,
-                dtype=data_type_map,
-                chunksize=DEFAULT_INSERT_CHUNK_SIZE,
-                method='multi'
-            )
+            with run_report.phase('load'), concurrency.slot(self.CONCURRENCY_SIDE):
+                if rendered is not None:
+                    # creates the relation, the rendered rows are then loaded into it
+                    data.iloc[:0].to_sql(
+                        self._correct_case(relation.name),
+                        engine,
+                        schema=self._correct_case(schema),
+                        if_exists=if_exists,
+                        index=False,
+                        dtype=data_type_map
+                    )
+                    if not self._load_rendered(relation,
+                                               engine,
+                                               self._correct_case(schema),
+                                               data.columns.to_list(),
+                                               rendered):
+                        data = self.sanitize_data(relation, data)
+                        rendered = None
+                        if_exists = 'append'
+                if rendered is None:
+                    data.to_sql(
+                        self._correct_case(relation.name),
+                        engine,
+                        schema=self._correct_case(schema),
+                        if_exists=if_exists,
+                        index=False,
+                        dtype=data_type_map,
+                        chunksize=DEFAULT_INSERT_CHUNK_SIZE,
+                        method=self._get_insert_method(relation)
+                    )
             data.columns = original_columns
         except Exception as exc:
             logger.error("Exception encountered loading data into %s: %s",
@@ -166,6 +206,75 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
 
         logger.info(final_message)
 
+    def stream_data_into_relation(self, relation: Relation, chunks: Iterable[pd.DataFrame]) -> int:
+        """Loads data into a target one chunk at a time.
+
+        The first chunk (re)creates the relation, the following ones are appended to it.
+
+        Args:
+            relation: The relation containing info about dataset to load.
+            chunks: The dataframes to load, in order.
+
+        Returns:
+            The number of rows loaded.
+        """
+        rows = 0
+        if_exists = 'replace'
+        for chunk in chunks:
+            self.load_data_into_relation(relation, chunk, if_exists=if_exists)
+            if_exists = 'append'
+            rows += len(chunk)
+        return rows
+
+    def sanitize_data(self, relation: Relation, data: pd.DataFrame) -> pd.DataFrame:  # noqa pylint: disable=unused-argument
+        """Prepares a frame for loading before anything is sent to the target.
+
+        Called exactly once per load, after column case correction. Target adapters
+        override this to clean values (driven by ``relation.attributes``) that the
+        target engine would otherwise reject.
+
+        Args:
+            relation: The relation the data belongs to.
+            data: The data to sanitize.
+
+        Returns:
+            The sanitized frame, ready to load.
+        """
+        return data
+
+    def _get_load_type(self, data_type: DataType):
+        """Returns the sqlalchemy type used to write a column of the given data type."""
+        return data_type.sqlalchemy_type
+
+    def _get_insert_method(self, relation: Relation):  # noqa pylint: disable=unused-argument
+        """Returns the ``method`` passed to ``DataFrame.to_sql`` when loading the relation.
+
+        Defaults to multi-value inserts, target adapters with a bulk load path
+        (ie ``COPY``) return a callable with the pandas insert method signature.
+        """
+        return 'multi'
+
+    def _get_renderer(self, relation: Relation) -> Optional[Callable[[pd.DataFrame], Any]]:  # noqa pylint: disable=unused-argument
+        """Returns a picklable callable sanitizing a frame of the relation and rendering it for
+        :meth:`_load_rendered`, run in a worker process when a frame transformer is bound.
+
+        Defaults to None, frames are then sanitized and loaded in the loading thread.
+        """
+        return None
+
+    def _load_rendered(self,  # noqa pylint: disable=too-many-arguments
+                       relation: Relation,
+                       engine,
+                       schema: str,
+                       columns: List[str],
+                       rendered: Any) -> bool:
+        """Loads the output of the renderer into the relation, already created.
+
+        Returns:
+            False if the target rejected the rendered rows, which are then loaded the regular way.
+        """
+        raise NotImplementedError()
+
     def initialize_replica(self,
                            source_adapter_name: str,
                            incremental_image: str = None) -> None:
@@ -278,6 +387,43 @@ class BaseTargetAdapter(BaseSQLAdapter):  # noqa pylint: disable=too-many-instan
         )
         self.create_and_load_relation(relation, meta_data)
 
+    @staticmethod
+    def _relation_fingerprints_relation() -> Relation:
+        return Relation("snowshu",
+                        "snowshu",
+                        "relation_fingerprints",
+                        mz.TABLE,
+                        [Attribute('relation', dt.VARCHAR),
+                         Attribute('fingerprint', dt.VARCHAR),
+                         Attribute('refreshed_at', dt.TIMESTAMP_TZ)])
+
+    def get_relation_fingerprints(self) -> Dict[str, str]:
+        """Reads the source change fingerprints of the relations in the replica.
+
+        Returns:
+            the fingerprint per source relation dot notation, empty for replicas built without fingerprints.
+        """
+        relation = self._relation_fingerprints_relation()
+        try:
+            frame = self._safe_query(f"SELECT relation, fingerprint FROM {relation.schema}.{relation.name}",
+                                     relation.database)
+        except ProgrammingError as exc:
+            logger.info(f"No relation fingerprints found in replica ({exc.__class__.__name__}).")
+            return dict()
+        return dict(zip(frame['relation'], frame['fingerprint']))
+
+    def store_relation_fingerprints(self, fingerprints: Dict[str, str]) -> None:
+        """Replaces the source change fingerprints stored in the replica meta database.
+
+        Args:
+            fingerprints: the fingerprint per source relation dot notation.
+        """
+        refreshed_at = datetime.now()
+        data = pd.DataFrame([dict(relation=relation, fingerprint=fingerprint, refreshed_at=refreshed_at)
+                             for relation, fingerprint in sorted(fingerprints.items())],
+                            columns=['relation', 'fingerprint', 'refreshed_at'])
+        self.create_and_load_relation(self._relation_fingerprints_relation(), data)
+
     def create_function_if_available(self,
                                      function: str,
                                      relations: Iterable['Relation']) -> None:
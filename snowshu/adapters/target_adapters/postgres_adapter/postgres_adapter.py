@@ -1,10 +1,17 @@
-from typing import List, Optional, Tuple
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import io
+import json
 import logging
 import time
-from pandas import DataFrame
+from pandas import DataFrame, Series, isna
+from pandas.api.types import infer_dtype, is_datetime64_any_dtype, is_float_dtype
 
+import psycopg2
 import sqlalchemy
 from overrides import overrides
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import TypeDecorator
 
 import snowshu.core.models.data_types as dtypes
 from snowshu.adapters.target_adapters import BaseTargetAdapter
@@ -17,6 +24,188 @@ from snowshu.exceptions import UnableToStartPostgres
 
 logger = logging.getLogger(__name__)
 
+TEXT_TYPE_NAMES = (dtypes.CHAR.name, dtypes.VARCHAR.name, dtypes.TEXT.name,)
+INTEGER_TYPE_NAMES = (dtypes.INTEGER.name, dtypes.BIGINT.name,)
+# NUL chars and lone surrogates cannot be encoded into a postgres text value
+SURROGATE_PATTERN = '[\ud800-\udfff]'
+# jsonb also rejects the escaped form of NUL; an even run of backslashes before it is not an escape
+JSON_NUL_ESCAPE_PATTERN = r'(?<!\\)((?:\\\\)*)\\u0000'
+# COPY text format escapes, NULL is sent as \N
+COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'})
+COPY_NULL = '\\N'
+
+
+class PassthroughJSONB(TypeDecorator):  # noqa pylint: disable=abstract-method, too-many-ancestors
+    """A jsonb column type that binds already serialized JSON text as-is.
+
+    The stock JSON types serialize every bound value, which double encodes the
+    raw VARIANT text coming from the source. Postgres parses the text once on insert.
+    """
+    impl = JSONB
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        return None
+
+
+def sanitize_frame(data: DataFrame, attribute_types: Dict[str, str], x00_replacement: str) -> DataFrame:
+    """Sanitizes the text, JSON and integer columns of the frame, see :meth:`PostgresAdapter.sanitize_data`.
+
+    Args:
+        data: the frame to sanitize, in place.
+        attribute_types: the data type names of the relation, by lower cased attribute name.
+        x00_replacement: what NUL chars are replaced with.
+    """
+    for col in data.columns:
+        type_name = attribute_types.get(str(col).lower())
+        if type_name == dtypes.JSON.name:
+            data[col] = sanitize_json_column(data[col], x00_replacement)
+        elif type_name in INTEGER_TYPE_NAMES:
+            data[col] = integer_column(data[col])
+        elif type_name in TEXT_TYPE_NAMES or (type_name is None and data[col].dtype == 'object'):
+            data[col] = sanitize_text_column(data[col], x00_replacement)
+    return data
+
+
+def integer_column(column: Series) -> Series:
+    """Casts a float column holding integers to the nullable integer dtype.
+
+    pandas stores integer columns with missing values as floats, which would be
+    rendered as ``1.0`` and rejected by postgres integer columns.
+    """
+    if not is_float_dtype(column):
+        return column
+    try:
+        return column.astype('Int64')
+    except (TypeError, ValueError):
+        # holds actual fractions, postgres reports those
+        return column
+
+
+def sanitize_text_column(column: Series, x00_replacement: str) -> Series:
+    if column.dtype != 'object':
+        return column
+    try:
+        invalid = _invalid_rows(column, ('\x00',))
+    except AttributeError:
+        # not a string-like column (ie all decimals), nothing to clean
+        return column
+    if not invalid.any():
+        return column
+
+    logger.warning("Invalid %s found in column %s. Replacing 0x00 chars with '%s' "
+                   "(excluding bounding single quotes) and lone surrogates with U+FFFD",
+                   _invalid_reason(column[invalid], ('\x00',)), column.name, x00_replacement)
+    column = column.copy()
+    column[invalid] = (column[invalid]
+                       .str.replace('\x00', x00_replacement, regex=False)
+                       .str.replace(SURROGATE_PATTERN, '\ufffd', regex=True))
+    return column
+
+
+def sanitize_json_column(column: Series, x00_replacement: str) -> Series:
+    if infer_dtype(column, skipna=True) not in ('string', 'empty',):
+        # values already parsed to python objects still have to be serialized once
+        parsed = column.map(lambda val: val is not None and not isinstance(val, str)) & column.notna()
+        column = column.astype(object)
+        column[parsed] = column[parsed].map(json.dumps)
+    if column.dtype != 'object':
+        return column
+
+    invalid = _invalid_rows(column, ('\x00', '\\u0000',))
+    if not invalid.any():
+        return column
+
+    logger.warning("Invalid %s found in JSON column %s. Replacing 0x00 chars with '%s' "
+                   "(excluding bounding single quotes) and lone surrogates with U+FFFD",
+                   _invalid_reason(column[invalid], ('\x00', '\\u0000',)), column.name, x00_replacement)
+    escaped_replacement = json.dumps(x00_replacement)[1:-1].replace('\\', '\\\\')
+    column = column.copy()
+    column[invalid] = (column[invalid]
+                       .str.replace('\x00', x00_replacement, regex=False)
+                       .str.replace(JSON_NUL_ESCAPE_PATTERN, f'\\g<1>{escaped_replacement}', regex=True)
+                       .str.replace(SURROGATE_PATTERN, '\ufffd', regex=True))
+    return column
+
+
+def _invalid_rows(column: Series, substrings: tuple) -> Series:
+    """Flags the rows holding any of the substrings or a lone surrogate.
+
+    The common case is a clean column, so the whole column is screened once
+    as a single string and the per value checks only run for what was found.
+    """
+    try:
+        text = ''.join(column.dropna())
+    except TypeError:
+        # not all values are strings, skip the screen
+        text = None
+
+    invalid = Series(False, index=column.index)
+    for substring in substrings:
+        if text is None or substring in text:
+            invalid |= column.str.contains(substring, regex=False, na=False)
+    has_surrogates = text is None
+    if text is not None:
+        try:
+            text.encode('utf-8')
+        except UnicodeEncodeError:
+            has_surrogates = True
+    if has_surrogates:
+        invalid |= column.str.contains(SURROGATE_PATTERN, regex=True, na=False)
+    return invalid
+
+
+def _invalid_reason(invalid: Series, substrings: tuple) -> str:
+    """Names what the flagged rows hold, for reporting."""
+    reasons = list()
+    if any(invalid.str.contains(substring, regex=False, na=False).any() for substring in substrings):
+        reasons.append('0x00 chars')
+    if invalid.str.contains(SURROGATE_PATTERN, regex=True, na=False).any():
+        reasons.append('lone surrogates')
+    return ' and '.join(reasons)
+
+
+def copy_value(value) -> str:
+    """Formats a single value for the COPY text format."""
+    if value is None:
+        return COPY_NULL
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\\\x' + bytes(value).hex()
+    return str(value).translate(COPY_TEXT_ESCAPES)
+
+
+def render_copy_rows(rows: Iterable[tuple]) -> str:
+    """Renders the rows in the COPY text format, a line per row."""
+    return ''.join('\t'.join(copy_value(value) for value in row) + '\n' for row in rows)
+
+
+def frame_rows(data: DataFrame) -> Iterator[tuple]:
+    """The rows of the frame as tuples, with missing values as None, the way pandas passes them to insert methods."""
+    columns = list()
+    for _, column in data.items():
+        if is_datetime64_any_dtype(column):
+            values = column.dt.to_pydatetime().astype(object)
+        else:
+            values = column.to_numpy(dtype=object, copy=True)
+        values[isna(column).to_numpy()] = None
+        columns.append(values)
+    return zip(*columns)
+
+
+@dataclass(frozen=True)
+class CopyRenderer:
+    """Sanitizes a frame and renders it in the COPY text format, picklable so it can run in a worker process.
+
+    Args:
+        attribute_types: the data type names of the relation, by lower cased attribute name.
+        x00_replacement: what NUL chars are replaced with.
+    """
+    attribute_types: Dict[str, str]
+    x00_replacement: str
+
+    def __call__(self, data: DataFrame) -> str:
+        return render_copy_rows(frame_rows(sanitize_frame(data, self.attribute_types, self.x00_replacement)))
+
 
 class PostgresAdapter(BaseTargetAdapter):
     name = 'postgres'
@@ -247,31 +436,171 @@ class PostgresAdapter(BaseTargetAdapter):
         return relations
 
     @overrides
-    def load_data_into_relation(self, relation: "Relation", data: Optional[DataFrame]) -> None:
+    def sanitize_data(self, relation: Relation, data: DataFrame) -> DataFrame:
+        """Cleans a frame in a single pass, driven by the relation attribute types.
+
+        - text columns get NUL chars replaced with ``pg_0x00_replacement`` and lone
+          surrogates replaced with U+FFFD.
+        - JSON columns keep raw JSON text untouched (no parsing), serialize values that
+          were already parsed to python objects, and get NULs (raw and escaped) replaced.
+        - integer columns that pandas holds as floats (because of missing values) are
+          cast back to integers.
+
+        Only rows that actually contain invalid characters are rewritten.
+        """
+        return sanitize_frame(data, self._attribute_types(relation), self.x00_replacement)
+
+    @staticmethod
+    def _attribute_types(relation: Relation) -> Dict[str, str]:
+        return {attr.name.lower(): attr.data_type.name for attr in relation.attributes}
+
+    @overrides
+    def _get_renderer(self, relation: Relation) -> Callable[[DataFrame], str]:
+        return CopyRenderer(self._attribute_types(relation), self.x00_replacement)
+
+    @overrides
+    def _load_rendered(self,  # noqa pylint: disable=too-many-arguments
+                       relation: Relation,
+                       engine,
+                       schema: str,
+                       columns: List[str],
+                       rendered: Any) -> bool:
+        """Copies the rendered rows in with a single ``COPY ... FROM STDIN``.
+
+        A rejected copy (ie malformed JSON) is rolled back, the regular load then cleans up the values.
+        """
+        preparer = engine.dialect.identifier_preparer
+        table = sqlalchemy.Table(self._correct_case(relation.name), sqlalchemy.MetaData(), schema=schema)
+        statement = (f'COPY {preparer.format_table(table)} '
+                     f'({", ".join(preparer.quote(column) for column in columns)}) FROM STDIN')
+        connection = engine.raw_connection()
         try:
-            return super().load_data_into_relation(relation, data)
-        except ValueError as exc:
-            if 'cannot contain NUL' in str(exc):
-                logger.warning("Invalid 0x00 char found in %s. "
-                               "Removing from affected columns and trying again",
-                               self.quoted_dot_notation(relation))
-                fixed_data = self.replace_x00_values(data)
-                logger.info("Retrying data load for %s",
-                            self.quoted_dot_notation(relation))
-                return super().load_data_into_relation(relation, fixed_data)
+            with connection.cursor() as cursor:
+                cursor.copy_expert(statement, io.StringIO(rendered))
+            connection.commit()
+        except psycopg2.DataError as exc:
+            connection.rollback()
+            logger.warning("Rendered rows rejected by %s, loading them in chunks instead: %s",
+                           self.quoted_dot_notation(relation), exc)
+            return False
+        finally:
+            connection.close()
+        return True
 
-            raise exc
+    @overrides
+    def _get_load_type(self, data_type: dtypes.DataType):
+        if data_type.name == dtypes.JSON.name:
+            return PassthroughJSONB()
+        return data_type.sqlalchemy_type
+
+    @overrides
+    def _get_insert_method(self, relation: Relation):
+        """Streams each chunk into the target with ``COPY ... FROM STDIN``.
+
+        JSON values travel as the raw text fetched from the source and are parsed once,
+        by postgres, into jsonb.
+        """
+        rows_copied = 0
+
+        def copy_rows(table, conn, keys, data_iter):
+            nonlocal rows_copied
+            rows = list(data_iter)
+            self._copy_rows(relation, table, conn, keys, rows, rows_copied)
+            rows_copied += len(rows)
+
+        return copy_rows
+
+    def _copy_rows(self,  # noqa pylint: disable=too-many-arguments
+                   relation: Relation,
+                   table,
+                   conn,
+                   keys: List[str],
+                   rows: List[tuple],
+                   offset: int) -> None:
+        """Copies a chunk of rows, retrying once without malformed JSON values.
+
+        Malformed JSON is only looked for after postgres rejects the chunk, so the
+        common case never parses JSON in python.
+        """
+        preparer = conn.dialect.identifier_preparer
+        statement = (f'COPY {preparer.format_table(table.table)} '
+                     f'({", ".join(preparer.quote(key) for key in keys)}) FROM STDIN')
+        json_columns = [idx for idx, key in enumerate(keys)
+                        if isinstance(table.table.c[key].type, PassthroughJSONB)]
+        dbapi_conn = conn.connection
+        in_transaction = not getattr(dbapi_conn, 'autocommit', True)
+
+        with dbapi_conn.cursor() as cursor:
+            try:
+                self._copy_expert(cursor, statement, rows, in_transaction)
+            except psycopg2.DataError:
+                cleaned_rows = self._null_malformed_json(relation, keys, rows, json_columns, offset)
+                if cleaned_rows is None:
+                    raise
+                self._copy_expert(cursor, statement, cleaned_rows, in_transaction)
+
+    @staticmethod
+    def _copy_expert(cursor, statement: str, rows: List[tuple], in_transaction: bool) -> None:
+        buffer = io.StringIO(render_copy_rows(rows))
+        # a failed COPY aborts the surrounding transaction, the savepoint keeps it usable for the retry
+        if in_transaction:
+            cursor.execute('SAVEPOINT snowshu_copy')
+        try:
+            cursor.copy_expert(statement, buffer)
+        except psycopg2.DataError:
+            if in_transaction:
+                cursor.execute('ROLLBACK TO SAVEPOINT snowshu_copy')
+            raise
+        if in_transaction:
+            cursor.execute('RELEASE SAVEPOINT snowshu_copy')
+
+    def _null_malformed_json(self,  # noqa pylint: disable=too-many-arguments
+                             relation: Relation,
+                             keys: List[str],
+                             rows: List[tuple],
+                             json_columns: List[int],
+                             offset: int) -> Optional[List[list]]:
+        """Replaces the JSON values postgres cannot parse with NULL, reporting each one.
+
+        Returns:
+            The cleaned rows, or None if no malformed value was found.
+        """
+        def reject_constant(constant):
+            # python accepts NaN and Infinity, jsonb does not
+            raise ValueError(f'invalid JSON constant {constant}')
+
+        malformed = 0
+        cleaned_rows = []
+        for position, row in enumerate(rows):
+            row = list(row)
+            for idx in json_columns:
+                if row[idx] is None:
+                    continue
+                try:
+                    json.loads(row[idx], parse_constant=reject_constant)
+                except (TypeError, ValueError) as exc:
+                    logger.warning("Malformed JSON in %s column %s at row %s, loading NULL instead: %s",
+                                   self.quoted_dot_notation(relation), keys[idx], offset + position, exc)
+                    row[idx] = None
+                    malformed += 1
+            cleaned_rows.append(row)
+
+        if not malformed:
+            return None
+        logger.warning("Replaced %s malformed JSON value(s) with NULL in %s.",
+                       malformed, self.quoted_dot_notation(relation))
+        return cleaned_rows
+
+    def _sanitize_text_column(self, column: Series) -> Series:
+        return sanitize_text_column(column, self.x00_replacement)
+
+    def _sanitize_json_column(self, column: Series) -> Series:
+        return sanitize_json_column(column, self.x00_replacement)
 
     def replace_x00_values(self, data: DataFrame) -> DataFrame:
-        for col, col_type in data.dtypes.items():
-            # str types are put into object type columns
-            if col_type == 'object' and isinstance(data[col][0], str):
-                matched_nul_char = (data[col].str.find('\x00') > -1)
-                if any(matched_nul_char):
-                    logger.warning("Invalid 0x00 char found in column %s. Replacing with '%s' "
-                                   "(excluding bounding single quotes)", col, self.x00_replacement)
-                    data[col] = data[col].str.replace(
-                        '\x00', self.x00_replacement)
+        """Replaces NUL chars in every string column of the frame."""
+        for col in data.columns:
+            data[col] = self._sanitize_text_column(data[col])
         return data
 
     @staticmethod
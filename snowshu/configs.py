@@ -12,6 +12,26 @@ DEFAULT_PRESERVE_CASE = False
 DEFAULT_INSERT_CHUNK_SIZE = 50000
 DEFAULT_THREAD_COUNT = 4
 DEFAULT_RETRY_COUNT = 1
+DEFAULT_BLOCK_SAMPLING_MIN_POPULATION = 100000000
+# stratified sampling reads the size of every stratum into memory while preparing
+DEFAULT_MAX_STRATA = 10000
+DEFAULT_SAMPLE_CACHE_MAX_BYTES = 10 * 1024 ** 3
+# adaptive concurrency: the share of the limit kept on congestion, how many times its usual latency
+# a query may take before it counts as congested (and a floor for very short queries), and the weight
+# of every new latency in the usual latency of its kind of query
+CONCURRENCY_DECREASE_FACTOR = 0.5
+CONCURRENCY_LATENCY_TOLERANCE = 3
+CONCURRENCY_CONGESTED_MIN_SECONDS = 1
+CONCURRENCY_LATENCY_SMOOTHING = 0.1
+DEFAULT_FETCH_PARTITIONS = 4
+# isolated relations with at most this many rows are fetched together with the rest of their batch
+DEFAULT_BATCH_FETCH_MAX_ROWS = 1000
+# how often the status of asynchronous source queries is checked
+ASYNC_QUERY_POLL_SECONDS = 1
+# samples take more bytes in memory than in the compressed, columnar storage of the source
+SAMPLE_MEMORY_EXPANSION = 4
+# frames with fewer rows are transformed in the loading thread, shipping them to a worker process costs more
+TRANSFORM_MIN_ROWS = 50000
 DOCKER_NETWORK = 'snowshu'
 DOCKER_TARGET_CONTAINER = 'snowshu_target'
 DOCKER_REMOUNT_DIRECTORY = 'snowshu_replica_data'
@@ -0,0 +1,138 @@
+import itertools
+import time
+from typing import TYPE_CHECKING, List, Tuple
+import logging
+
+import networkx as nx
+
+from snowshu.core import tracing
+
+if TYPE_CHECKING:
+    from snowshu.core.graph_set_runner import GraphExecutable
+
+logger = logging.getLogger(__name__)
+
+
+class BatchExecutionMixin:
+    """Executes the relations of a graph together instead of one at a time, for the
+    :class:`GraphSetRunner <snowshu.core.graph_set_runner.GraphSetRunner>`.
+
+    The temp tables of a topological generation are submitted to the source at once, and graphs of
+    a single isolated relation are gathered into batches that are counted and fetched together.
+    """
+
+    def _batch_isolated_graphs(self, graphs: List[nx.Graph]) -> Tuple[List[nx.Graph], List[nx.Graph]]:
+        """ Groups the graphs made of a single relation, with no relationships, into batches of isolated_batch_size
+
+            Returns:
+                the graphs left as they are, and the batches as graphs of unconnected relations
+        """
+        if not self.isolated_batch_size or self.sample_store is not None:
+            return graphs, list()
+        isolated = [graph for graph in graphs if len(graph) == 1 and graph.number_of_edges() == 0]
+        if len(isolated) < 2:
+            return graphs, list()
+        # a stable order keeps the batches, and the statements sent for them, the same from run to run
+        isolated.sort(key=lambda graph: next(iter(graph.nodes)).dot_notation)
+        batches = [nx.union_all(isolated[start:start + self.isolated_batch_size])
+                   for start in range(0, len(isolated), self.isolated_batch_size)]
+        logger.info(f"Processing {len(isolated)} isolated relations in {len(batches)} batches.")
+        isolated_ids = {id(graph) for graph in isolated}
+        return [graph for graph in graphs if id(graph) not in isolated_ids], batches
+
+    def _submits_async(self, executable: 'GraphExecutable') -> bool:
+        return self.async_queries and not executable.analyze and executable.source_adapter.SUPPORTS_ASYNC_QUERIES
+
+    def _execute_generations(self, executable: 'GraphExecutable') -> None:
+        """ Processes the graph a topological generation at a time, creating the temp tables of a generation at once
+
+            Relations of a generation do not depend on each other: the temp tables of all of its sampled relations
+            are submitted to the source together and run on the warehouse while this thread polls for them, then
+            they are fetched and loaded in turn. Views and unsampled relations are processed one at a time.
+        """
+        index = itertools.count(1)
+        for generation in nx.algorithms.dag.topological_generations(executable.graph):
+            submitted = dict()
+            for relation in generation:
+                i = next(index)
+                with tracing.span(relation.dot_notation, 'relation'), \
+                        self.run_report.relation(relation) as metrics:
+                    if relation.is_view or relation.unsampled:
+                        self._process_relation(i, relation, executable)
+                        continue
+                    start_time = time.time()
+                    relation = self._prepare_relation(i, relation, executable)
+                    self._create_target_schema(relation, executable)
+                    submitted[relation] = (start_time,
+                                           time.perf_counter(),
+                                           executable.source_adapter.submit_create_table(
+                                               query=relation.compiled_query,
+                                               name=relation.name,
+                                               schema=relation.temp_schema,
+                                               database=relation.temp_database))
+                    metrics.status = 'submitted'
+            if not submitted:
+                continue
+
+            logger.info(f"Waiting for the temp tables of {len(submitted)} relations...")
+            completed = executable.source_adapter.wait_for_queries(
+                [query_id for _, _, query_id in submitted.values()])
+            for relation, (start_time, submitted_at, query_id) in submitted.items():
+                with tracing.span(relation.dot_notation, 'relation'), \
+                        self.run_report.relation(relation, resume=True) as metrics:
+                    metrics.add_phase('temp_table', completed[query_id] - submitted_at)
+                    self._extract_sampled_relation(relation, executable, temp_table_created=True)
+                    self._mark_loaded(relation, executable, start_time)
+                    self._complete_relation(relation)
+
+    def _execute_isolated_batch(self, executable: 'GraphExecutable') -> None:
+        """ Processes a batch of isolated relations, counting their populations with a single query
+
+            Relations of at most batch_fetch_max_rows rows have no downstream relations to keep a temp table for:
+            their sample queries are sent together in one request, then the samples are loaded in turn.
+            Larger relations are processed one at a time, as in a graph of their own.
+        """
+        relations = sorted(executable.graph.nodes, key=lambda relation: relation.dot_notation)
+        source_adapter = executable.source_adapter
+        start = time.perf_counter()
+        populations = source_adapter.get_population_counts(relations)
+        count_seconds = (time.perf_counter() - start) / len(relations)
+
+        fetched = list()
+        for i, (relation, population) in enumerate(zip(relations, populations), start=1):
+            with tracing.span(relation.dot_notation, 'relation'), \
+                    self.run_report.relation(relation) as metrics:
+                metrics.add_phase('population_count', count_seconds)
+                relation.population_size = population
+                if (executable.analyze or self.byte_budget is not None
+                        or population > min(self.batch_fetch_max_rows, relation.sampling.max_allowed_rows)):
+                    self._process_relation(i, relation, executable, counted=True)
+                    continue
+                start_time = time.time()
+                relation = self._prepare_relation(i, relation, executable, counted=True)
+                self._create_target_schema(relation, executable)
+                fetched.append((relation, start_time))
+                metrics.status = 'submitted'
+        if not fetched:
+            return
+
+        logger.info(f"Retrieving records of {len(fetched)} small relations from source together...")
+        start = time.perf_counter()
+        try:
+            samples = source_adapter.query_many([relation.compiled_query for relation, _ in fetched])
+        except Exception as exc:
+            raise SystemError(
+                f"Failed to retrieve records of {len(fetched)} relations from source: {exc}"
+            ) from exc
+        fetch_seconds = (time.perf_counter() - start) / len(fetched)
+        for (relation, start_time), data in zip(fetched, samples):
+            with tracing.span(relation.dot_notation, 'relation'), \
+                    self.run_report.relation(relation, resume=True) as metrics:
+                metrics.add_phase('fetch', fetch_seconds)
+                relation.sample_size = len(data)
+                logger.info(
+                    f"{relation.sample_size} records retrieved for relation {relation.dot_notation}."
+                )
+                self._load_relation(relation, data, executable)
+                self._mark_loaded(relation, executable, start_time)
+                self._complete_relation(relation)
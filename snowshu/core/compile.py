@@ -1,4 +1,4 @@
-from typing import Type
+from typing import TYPE_CHECKING, Optional, Type
 import logging
 
 import networkx
@@ -7,6 +7,10 @@ from snowshu.adapters.source_adapters.base_source_adapter import \
     BaseSourceAdapter
 from snowshu.core.models import Relation
 
+if TYPE_CHECKING:
+    from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+    from snowshu.samplings.samplings.recent_window_sampling import TimeWindow
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,7 +42,7 @@ class RuntimeSourceCompiler:
         else:
             do_not_sample = False
             predicates = list()
-            unions = list()
+            outlier_constraints = list()
             polymorphic_predicates = list()
             for child in dag.successors(relation):
                 # parallel edges are supported
@@ -46,19 +50,21 @@ class RuntimeSourceCompiler:
                 for key in range(0, edges_num):
                     edge = dag.edges[relation, child, key]
                     if edge['direction'] == 'bidirectional':
-                        predicates.append(source_adapter.upstream_constraint_statement(child,
-                                                                                       edge['remote_attribute'],
-                                                                                       edge['local_attribute']))
+                        predicates.append(source_adapter.upstream_constraint_statement(
+                            child,
+                            edge['remote_attribute'],
+                            edge['local_attribute'],
+                            RuntimeSourceCompiler._window_of(child)))
                     if relation.include_outliers and edge['direction'] == 'polymorphic':
                         logger.warning("Polymorphic relationships currently do not support including outliers. "
                                        "Ignoring include_outliers flag for edge "
                                        f"from {relation.dot_notation} to {child.dot_notation}. ")
                     elif relation.include_outliers:
-                        unions.append(source_adapter.union_constraint_statement(relation,
-                                                                                child,
-                                                                                edge['remote_attribute'],
-                                                                                edge['local_attribute'],
-                                                                                relation.max_number_of_outliers))
+                        # the child is sampled after the relation, only its population can be matched
+                        outlier_constraints.append((child,
+                                                    edge['remote_attribute'],
+                                                    edge['local_attribute'],
+                                                    False,))
 
             for parent in dag.predecessors(relation):
                 edges_num = dag.number_of_edges(parent, relation)
@@ -85,6 +91,11 @@ class RuntimeSourceCompiler:
                                                                               analyze,
                                                                               edge['local_attribute'],
                                                                               edge['remote_attribute']))
+                    elif RuntimeSourceCompiler._is_hash_sampled_on(parent, dag, edge['remote_attribute']):
+                        # the parent holds exactly the rows whose key hashes into the sampled buckets,
+                        # so the same hash selects the matching rows without reading the parent sample
+                        predicates.append(source_adapter.hash_constraint_statement(edge['local_attribute'],
+                                                                                   parent.sampling.sample_method))
                     else:
                         predicates.append(source_adapter.predicate_constraint_statement(parent,
                                                                                         analyze,
@@ -95,25 +106,40 @@ class RuntimeSourceCompiler:
                                        "Ignoring include_outliers flag for edge "
                                        f"from {parent.dot_notation} to {relation.dot_notation}. ")
                     elif relation.include_outliers:
-                        unions.append(source_adapter.union_constraint_statement(relation,
-                                                                                parent,
-                                                                                edge['local_attribute'],
-                                                                                edge['remote_attribute'],
-                                                                                relation.max_number_of_outliers))
+                        # analyze runs create no temp tables, so outliers are matched against the population
+                        from_sample = relation.outliers_from_samples and not parent.is_view and not analyze
+                        outlier_constraints.append((parent,
+                                                    edge['local_attribute'],
+                                                    edge['remote_attribute'],
+                                                    from_sample,))
 
             # if polymorphic predicates are set up, then generate the or predicate
             if polymorphic_predicates:
                 full_polymorphic_predicate = " OR ".join(polymorphic_predicates)
                 predicates.append(f"( {full_polymorphic_predicate} )")
 
+            # the time window is applied next to the relationship predicates so the source can prune
+            # on it, and the sample clause moves to the wrapping statement to sample the filtered rows
+            window = RuntimeSourceCompiler._window_of(relation)
+            if window is not None:
+                predicates.insert(0, source_adapter.window_constraint_statement(window))
+
+            # hash sampling is a predicate rather than a sample clause
+            if RuntimeSourceCompiler._is_hash_sampled(relation):
+                own_predicate = source_adapter.hash_constraint_statement(relation.sampling.sample_method.key,
+                                                                         relation.sampling.sample_method)
+                if own_predicate not in predicates:
+                    predicates.append(own_predicate)
+                do_not_sample = True
+
             query = source_adapter.sample_statement_from_relation(
                 relation, (None if predicates else relation.sampling.sample_method))
             if predicates:
                 query += " WHERE " + ' AND '.join(predicates)
-                query = source_adapter.directionally_wrap_statement(
-                    query, relation, (None if do_not_sample else relation.sampling.sample_method))
-            if unions:
-                query += " UNION ".join([''] + unions)
+                sample_method = None if do_not_sample else RuntimeSourceCompiler._filtered_sample_method(relation)
+                query = source_adapter.directionally_wrap_statement(query, relation, sample_method)
+            if outlier_constraints:
+                query = source_adapter.outliers_union_statement(query, relation, outlier_constraints)
 
         relation.core_query = query
 
@@ -121,3 +147,43 @@ class RuntimeSourceCompiler:
             query = source_adapter.analyze_wrap_statement(query, relation)
         relation.compiled_query = query
         return relation
+
+    @staticmethod
+    def _window_of(relation: Relation) -> Optional['TimeWindow']:
+        """ The time window a sampled relation is restricted to, if any """
+        if relation.unsampled or relation.is_view:
+            return None
+        return getattr(getattr(relation, 'sampling', None), 'window', None)
+
+    @staticmethod
+    def _filtered_sample_method(relation: Relation) -> 'BaseSampleMethod':
+        """ The sample method of the relation once its rows are filtered by constraints
+
+            Samplings that pick storage blocks cannot sample the filtered rows, they provide a
+            ``filtered_sample_method`` to use instead.
+        """
+        return getattr(relation.sampling, 'filtered_sample_method', relation.sampling.sample_method)
+
+    @staticmethod
+    def _is_hash_sampled(relation: Relation) -> bool:
+        sample_method = getattr(relation.sampling, 'sample_method', None)
+        return getattr(sample_method, 'name', None) == 'HASH'
+
+    @staticmethod
+    def _is_hash_sampled_on(relation: Relation,
+                            dag: networkx.Graph,
+                            key: str) -> bool:
+        """ Checks if the sample of the relation is exactly its rows with the key hashed into the sampled buckets
+
+            This only holds when the relation is hash sampled on that key and nothing else restricts it:
+            no incoming edges and no bidirectional edges constraining it to a downstream relation.
+        """
+        if relation.unsampled or relation.is_view or not RuntimeSourceCompiler._is_hash_sampled(relation):
+            return False
+        hash_key = relation.sampling.sample_method.key
+        if hash_key is None or hash_key.lower() != key.lower():
+            return False
+        if dag.in_degree(relation) > 0:
+            return False
+        return all(edge['direction'] != 'bidirectional'
+                   for _, _, edge in dag.out_edges(relation, data=True))
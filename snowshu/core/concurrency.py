@@ -0,0 +1,138 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, FrozenSet, Iterator, Optional
+import logging
+
+from snowshu.configs import (CONCURRENCY_CONGESTED_MIN_SECONDS,
+                             CONCURRENCY_DECREASE_FACTOR,
+                             CONCURRENCY_LATENCY_SMOOTHING,
+                             CONCURRENCY_LATENCY_TOLERANCE)
+from snowshu.core import run_report
+
+logger = logging.getLogger(__name__)
+
+SOURCE = 'source'
+TARGET = 'target'
+
+# the controllers of the run, by side, and the controllers the current thread holds a slot of
+_controllers: ContextVar[Dict[str, 'AIMDController']] = ContextVar('snowshu_concurrency', default=dict())
+_held: ContextVar[FrozenSet[int]] = ContextVar('snowshu_concurrency_held', default=frozenset())
+
+
+class AIMDController:
+    """Limits the queries running at once against one side of a replica build, adjusting the limit as they run.
+
+    The limit grows by one for every limit's worth of queries completing without congestion (additive
+    increase), and is cut by CONCURRENCY_DECREASE_FACTOR on congestion (multiplicative decrease), always
+    within minimum and maximum. A query is congested when it fails, is retried, or takes over
+    CONCURRENCY_LATENCY_TOLERANCE times the usual latency of its kind of query; queued warehouses show
+    up as inflated latencies. Slow queries that started before a decrease do not decrease the limit again.
+
+    Args:
+        name: the side of the build, for logging.
+        minimum: the lowest the limit may go.
+        maximum: the highest the limit may go.
+        initial: the limit to start with, defaults to the minimum.
+    """
+
+    def __init__(self, name: str, minimum: int, maximum: int, initial: Optional[int] = None):
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Invalid {name} concurrency range {minimum} to {maximum}.")
+        self.name = name
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial or minimum, minimum), maximum))
+        self.in_use = 0
+        self.latencies: Dict[str, float] = dict()
+        self.condition = threading.Condition()
+        self._generation = 0
+
+    @property
+    def current(self) -> int:
+        return int(self.limit)
+
+    @contextmanager
+    def slot(self, kind: str) -> Iterator[None]:
+        """Runs the block as one query of the given kind once a slot is free, observing how it went."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_use < self.current)
+            self.in_use += 1
+            generation = self._generation
+        start = time.perf_counter()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            with self.condition:
+                self.in_use -= 1
+                self._observe(kind, seconds, failed, generation)
+                self.condition.notify_all()
+
+    def congestion(self) -> None:
+        """Decreases the limit on a congestion signal from outside of a slot, such as a retried query."""
+        with self.condition:
+            self._decrease('retry')
+
+    def _observe(self, kind: str, seconds: float, failed: bool, generation: int) -> None:
+        usual = self.latencies.get(kind)
+        slow = usual is not None and \
+            seconds > max(usual * CONCURRENCY_LATENCY_TOLERANCE, CONCURRENCY_CONGESTED_MIN_SECONDS)
+        if failed or slow:
+            if generation == self._generation:
+                self._decrease(f"{kind} query failed" if failed else
+                               f"{kind} query took {seconds:.1f}s, usually {usual:.1f}s")
+            return
+        self.latencies[kind] = seconds if usual is None else \
+            usual + (seconds - usual) * CONCURRENCY_LATENCY_SMOOTHING
+        if self.limit < self.maximum:
+            self.limit = min(self.limit + 1 / self.limit, float(self.maximum))
+
+    def _decrease(self, reason: str) -> None:
+        previous = self.current
+        self.limit = max(self.limit * CONCURRENCY_DECREASE_FACTOR, float(self.minimum))
+        self._generation += 1
+        if self.current != previous:
+            logger.info(f"Lowered {self.name} concurrency from {previous} to {self.current} ({reason}).")
+
+
+@contextmanager
+def bind(**controllers: Optional[AIMDController]) -> Iterator[None]:
+    """Gates the queries of each side on its controller, for the current thread and the threads it propagates to."""
+    token = _controllers.set({**_controllers.get(),
+                              **{side: controller for side, controller in controllers.items() if controller}})
+    try:
+        yield
+    finally:
+        _controllers.reset(token)
+
+
+@contextmanager
+def slot(side: Optional[str], kind: Optional[str] = None) -> Iterator[None]:
+    """Runs the block as a query against the side, gated on its controller if one is bound.
+
+    The kind of query defaults to the run report phase the thread is in. A thread already holding
+    a slot of the controller does not take a second one.
+    """
+    controller = _controllers.get().get(side)
+    if controller is None or id(controller) in _held.get():
+        yield
+        return
+    with controller.slot(kind or run_report.current_phase() or 'query'):
+        token = _held.set(_held.get() | {id(controller)})
+        try:
+            yield
+        finally:
+            _held.reset(token)
+
+
+def record_congestion(side: str = SOURCE) -> None:
+    """Signals congestion to the controller of the side, if one is bound."""
+    controller = _controllers.get().get(side)
+    if controller is not None:
+        controller.congestion()
@@ -2,7 +2,7 @@ import json
 import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, List, TextIO, Type, Union
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, TextIO, Type, Union
 import logging
 
 
@@ -10,11 +10,15 @@ import jsonschema
 import yaml
 from jsonschema.exceptions import ValidationError
 
-from snowshu.configs import (DEFAULT_MAX_NUMBER_OF_OUTLIERS,
+from snowshu.configs import (DEFAULT_BATCH_FETCH_MAX_ROWS,
+                             DEFAULT_FETCH_PARTITIONS,
+                             DEFAULT_MAX_NUMBER_OF_OUTLIERS,
                              DEFAULT_PRESERVE_CASE, DEFAULT_THREAD_COUNT)
+from snowshu.core.concurrency import AIMDController
 from snowshu.core.models import Credentials, materializations
 from snowshu.core.samplings.utils import get_sampling_from_partial
 from snowshu.core.utils import correct_case, fetch_adapter
+from snowshu.storages import SampleStore
 
 if TYPE_CHECKING:
     from io import StringIO
@@ -102,6 +106,19 @@ class Configuration:  # noqa pylint: disable=too-many-instance-attributes
     max_number_of_outliers: int
     general_relations: List[MatchPattern]
     specified_relations: List[SpecifiedMatchPattern]
+    max_allowed_bytes: Optional[int] = None
+    key_tables: bool = False
+    max_memory_bytes: Optional[int] = None
+    async_queries: bool = False
+    partition_min_rows: Optional[int] = None
+    partitions: int = DEFAULT_FETCH_PARTITIONS
+    isolated_batch_size: Optional[int] = None
+    batch_fetch_max_rows: int = DEFAULT_BATCH_FETCH_MAX_ROWS
+    source_concurrency: Optional[AIMDController] = None
+    target_concurrency: Optional[AIMDController] = None
+    processes: Optional[int] = None
+    outliers_from_samples: bool = False
+    sample_store: Optional[SampleStore] = None
 
 
 class ConfigurationParser:
@@ -257,12 +274,51 @@ class ConfigurationParser:
 
             return Configuration(*replica_base,
                                  general_relations,
-                                 specified_relations)
+                                 specified_relations,
+                                 max_allowed_bytes=loaded['source'].get('max_allowed_bytes'),
+                                 key_tables=loaded['source'].get('key_tables', False),
+                                 max_memory_bytes=loaded['source'].get('max_memory_bytes'),
+                                 async_queries=loaded['source'].get('async_queries', False),
+                                 **self._build_partitioned_fetch(loaded['source']),
+                                 **self._build_isolated_batches(loaded['source']),
+                                 outliers_from_samples=loaded['source'].get('outliers_from_samples', False),
+                                 sample_store=self._build_sample_store(loaded['source']),
+                                 **self._build_concurrency(loaded),
+                                 processes=loaded.get('processes'))
         except KeyError as err:
             message = f"Configuration missing required section: {err}."
             logger.critical(message)
             raise AttributeError(message) from err
 
+    @staticmethod
+    def _build_partitioned_fetch(source: dict) -> dict:
+        partitioned_fetch = source.get('partitioned_fetch')
+        if partitioned_fetch is None:
+            return dict()
+        return dict(partition_min_rows=partitioned_fetch['min_rows'],
+                    partitions=partitioned_fetch.get('partitions', DEFAULT_FETCH_PARTITIONS))
+
+    @staticmethod
+    def _build_isolated_batches(source: dict) -> dict:
+        isolated_batches = source.get('isolated_batches')
+        if isolated_batches is None:
+            return dict()
+        return dict(isolated_batch_size=isolated_batches['size'],
+                    batch_fetch_max_rows=isolated_batches.get('max_fetch_rows', DEFAULT_BATCH_FETCH_MAX_ROWS))
+
+    @staticmethod
+    def _build_concurrency(loaded: dict) -> Dict[str, AIMDController]:
+        """ Builds the adaptive concurrency controllers of the configured sides, starting at the thread count """
+        return {f"{side}_concurrency": AIMDController(side, limits['min'], limits['max'], initial=loaded['threads'])
+                for side, limits in loaded.get('concurrency', dict()).items()}
+
+    @staticmethod
+    def _build_sample_store(source: dict) -> Optional[SampleStore]:
+        sample_cache = source.get('sample_cache')
+        if sample_cache is None:
+            return None
+        return SampleStore(**sample_cache)
+
     def _build_relationships(
             self,
             specified_pattern: dict) -> SpecifiedMatchPattern.Relationships:
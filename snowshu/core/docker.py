@@ -8,6 +8,7 @@ import docker
 
 from snowshu.configs import (DOCKER_NETWORK, DOCKER_REPLICA_MOUNT_FOLDER,
                              DOCKER_WORKING_DIR, DOCKER_REPLICA_VOLUME, DOCKER_API_TIMEOUT, LOCAL_ARCHITECTURE)
+from snowshu.core import tracing
 from snowshu.core.utils import get_multiarch_list
 
 if TYPE_CHECKING:
@@ -34,6 +35,7 @@ class SnowShuDocker:
                 name=volume_name, driver='local',)
         return volume
 
+    @tracing.traced('docker')
     def convert_container_to_replica(
             self,
             replica_name: str,
@@ -83,6 +85,7 @@ class SnowShuDocker:
 
         return actual_replica_list
 
+    @tracing.traced('docker')
     def startup(self,  # noqa pylint: disable=too-many-locals, too-many-branches, too-many-statements
                 target_adapter: Type['BaseTargetAdapter'],
                 source_adapter: str,
@@ -220,6 +223,7 @@ class SnowShuDocker:
 
         return active_container, passive_container
 
+    @tracing.traced('docker')
     def create_and_init_container(  # noqa pylint: disable=too-many-arguments
                                     self,
                                     image: docker.models.images.Image,
@@ -283,6 +287,7 @@ class SnowShuDocker:
 
         return container
 
+    @tracing.traced('docker')
     def remove_container(self, container: str) -> None:
         logger.info(f'Removing existing target container {container}...')
         try:
@@ -1,12 +1,13 @@
 import os.path
 from datetime import datetime
-from typing import List, Set, Tuple, Optional, Union
+from typing import Iterable, List, Set, Tuple, Optional, Union
 import logging
 
 import matplotlib.pyplot as plt
 import networkx
 
 from snowshu.core.configuration_parser import Configuration
+from snowshu.core import tracing
 from snowshu.core.graph_set_runner import GraphSetRunner
 from snowshu.core.models.relation import (Relation,
                                           single_full_pattern_match)
@@ -61,6 +62,49 @@ class SnowShuGraph:
 
         return source_graph
 
+    @staticmethod
+    def refresh_difference(source_graph: Union["SnowShuGraph", networkx.Graph],
+                           changed_relations: Iterable[Relation]) -> networkx.Graph:
+        """ Reduces source_graph to the relations that need to be sampled again when changed_relations changed.
+
+            These are the changed relations and their descendants, and the upstream relations of bidirectional
+            edges into them (which are sampled against the downstream population). When a relation to sample
+            again depends on a relation that is not, the upstream sample it is constrained on is not available
+            and the whole connected component is sampled again.
+
+            Args:
+                source_graph (Union[SnowShuGraph, networkx.Graph]): source Graph or SnowShuGraph object
+                    which is built in current run from replica.yml file.
+                changed_relations (Iterable[Relation]): relations with changed source data or missing from
+                    the target replica.
+
+            Returns:
+                The :class:`Graph <networkx.Graph>` which is source graph with the relations that do not need
+                    to be sampled again removed.
+        """
+        if isinstance(source_graph, SnowShuGraph):
+            source_graph = source_graph.graph
+
+        refresh = set(changed_relations).intersection(source_graph.nodes)
+        pending = set(refresh)
+        while pending:
+            relation = pending.pop()
+            dependents = set(networkx.descendants(source_graph, relation))
+            dependents.update(upstream for upstream, _, edge in source_graph.in_edges(relation, data=True)
+                              if edge['direction'] == 'bidirectional')
+            pending.update(dependents - refresh)
+            refresh.update(dependents)
+
+        for component in [comp for comp in networkx.weakly_connected_components(source_graph)]:  # noqa pylint: disable=unnecessary-comprehension
+            component_refresh = refresh.intersection(component)
+            if any(upstream not in component_refresh
+                   for relation in component_refresh
+                   for upstream in source_graph.predecessors(relation)):
+                refresh.update(component)
+
+        source_graph.remove_nodes_from(set(source_graph.nodes) - refresh)
+        return source_graph
+
     @staticmethod
     def _build_graph_cycles_output(graph_cycles: list) -> Tuple[str, str]:
         """ Builds simple cycles output according to the list of graph_cycles.
@@ -117,6 +161,7 @@ class SnowShuGraph:
 
         return message, filename
 
+    @tracing.traced('graph')
     def build_graph(self, configs: Configuration) -> None:
         """ Builds a directed graph per replica config.
 
@@ -463,4 +508,5 @@ class SnowShuGraph:
         relation.sampling = configs.sampling
         relation.include_outliers = configs.include_outliers
         relation.max_number_of_outliers = configs.max_number_of_outliers
+        relation.outliers_from_samples = configs.outliers_from_samples
         return relation
@@ -1,27 +1,44 @@
 import gc
+import itertools
 import os
+import re
 import shutil
 import time
-import json
 import threading
 import concurrent.futures
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Tuple, Set, List
+from typing import Dict, Optional, Tuple, Set, List
 import logging
 
 import networkx as nx
+import pandas as pd
 
+from snowshu.configs import (DEFAULT_BATCH_FETCH_MAX_ROWS, DEFAULT_FETCH_PARTITIONS, DEFAULT_INSERT_CHUNK_SIZE,
+                             SAMPLE_MEMORY_EXPANSION)
 from snowshu.core.models import Relation
+from snowshu.core.models import materializations as mz
 from snowshu.adapters.base_sql_adapter import BaseSQLAdapter
 from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
 from snowshu.adapters.target_adapters.base_target_adapter import BaseTargetAdapter
-from snowshu.core import utils
+from snowshu.core import concurrency, tracing, transform, utils
+from snowshu.core.batch_execution import BatchExecutionMixin
 from snowshu.core.compile import RuntimeSourceCompiler
+from snowshu.core.concurrency import AIMDController
+from snowshu.core.transform import FrameTransformer
+from snowshu.core.run_report import RunReport, phase, timed_iter
+from snowshu.core.sample_transfer import SampleTransferMixin
 from snowshu.logger import duration
+from snowshu.storages import SampleStore
 
 logger = logging.getLogger(__name__)
 
+# set by BaseSampling.prepare, not part of the sampling configuration
+PREPARED_SAMPLING_ATTRIBUTES = ('size', 'sample_method',)
+# a name with the qualifiers before it, ie db.schema."view", selected from after FROM or JOIN
+SELECTED_RELATION_PATTERN = re.compile(
+    r'\b(?:FROM|JOIN)\s+((?:"[^"]*"|[\w$]+)(?:\s*\.\s*(?:"[^"]*"|[\w$]+))*)', re.IGNORECASE)
+
 
 @dataclass
 class GraphExecutable:
@@ -29,17 +46,128 @@ class GraphExecutable:
     source_adapter: BaseSourceAdapter
     target_adapter: BaseTargetAdapter
     analyze: bool
+    # the graph is a batch of isolated relations rather than a connected component
+    batched: bool = False
+
+
+class ByteBudget:
+    """Tracks the bytes a replica may still move across all of its relations.
+
+    Sample sizes are reserved against the budget when they are computed and settled
+    with the bytes actually extracted once the sample exists.
+
+    Args:
+        max_allowed_bytes: the total number of bytes the replica may move.
+    """
+
+    def __init__(self, max_allowed_bytes: int):
+        self.max_allowed_bytes = max_allowed_bytes
+        self.used_bytes = 0
+        self.lock = threading.RLock()
+
+    @property
+    def remaining(self) -> int:
+        with self.lock:
+            return max(self.max_allowed_bytes - self.used_bytes, 0)
+
+    def reserve(self, nbytes: int) -> None:
+        with self.lock:
+            self.used_bytes += nbytes
+
+    def settle(self, reserved_bytes: int, actual_bytes: int) -> None:
+        with self.lock:
+            self.used_bytes += actual_bytes - reserved_bytes
+
+
+class MemoryGovernor:
+    """Limits the bytes of the samples held in memory at once across all threads.
 
+    Samples are acquired with their estimated bytes before they are fetched, waiting while
+    they would take the samples in flight over the limit, and settled with the bytes of the
+    fetched frame. A sample is always admitted when nothing else is in flight, so a single
+    estimate over the limit cannot wait forever.
 
-class GraphSetRunner:
+    Args:
+        max_bytes: the number of bytes the samples in flight may hold.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.in_flight_bytes = 0
+        self.peak_bytes = 0
+        self.condition = threading.Condition()
+
+    def fits(self, nbytes: int) -> bool:
+        return nbytes <= self.max_bytes
+
+    def acquire(self, nbytes: int) -> None:
+        with phase('memory_wait'), self.condition:
+            self.condition.wait_for(
+                lambda: self.in_flight_bytes == 0 or self.in_flight_bytes + nbytes <= self.max_bytes)
+            self._add(nbytes)
+
+    def settle(self, acquired_bytes: int, actual_bytes: int) -> None:
+        with self.condition:
+            self._add(actual_bytes - acquired_bytes)
+            self.condition.notify_all()
+
+    def release(self, nbytes: int) -> None:
+        with self.condition:
+            self.in_flight_bytes -= nbytes
+            self.condition.notify_all()
+
+    def _add(self, nbytes: int) -> None:
+        self.in_flight_bytes += nbytes
+        self.peak_bytes = max(self.peak_bytes, self.in_flight_bytes)
+
+
+def _config_spec(value) -> str:
+    """ A stable description of a configuration object, leaving out what it computes when prepared """
+    if isinstance(value, (list, tuple)):
+        return f"[{', '.join(_config_spec(item) for item in value)}]"
+    if not hasattr(value, '__dict__'):
+        return repr(value)
+    fields = (f"{name}={_config_spec(field)}" for name, field in sorted(vars(value).items())
+              if name not in PREPARED_SAMPLING_ATTRIBUTES)
+    return f"{type(value).__name__}({', '.join(fields)})"
+
+
+class GraphSetRunner(BatchExecutionMixin, SampleTransferMixin):
     barf_output = "snowshu_barf_output"
     schemas_lock: threading.Lock = threading.Lock()
     schemas: Set[str] = set()
     uuid: str = utils.generate_unique_uuid()
 
-    def __init__(self):
+    def __init__(self,
+                 max_allowed_bytes: Optional[int] = None,
+                 key_tables: bool = False,
+                 sample_store: Optional[SampleStore] = None,
+                 max_memory_bytes: Optional[int] = None,
+                 source_concurrency: Optional[AIMDController] = None,
+                 target_concurrency: Optional[AIMDController] = None,
+                 transform_processes: Optional[int] = None,
+                 async_queries: bool = False,
+                 partition_min_rows: Optional[int] = None,
+                 partitions: int = DEFAULT_FETCH_PARTITIONS,
+                 isolated_batch_size: Optional[int] = None,
+                 batch_fetch_max_rows: int = DEFAULT_BATCH_FETCH_MAX_ROWS,
+                 collect_report: bool = True):
         self.barf = None
+        self.byte_budget = ByteBudget(max_allowed_bytes) if max_allowed_bytes is not None else None
+        self.memory_governor = MemoryGovernor(max_memory_bytes) if max_memory_bytes is not None else None
+        self.source_concurrency = source_concurrency
+        self.target_concurrency = target_concurrency
+        self.transform_processes = transform_processes
+        self.async_queries = async_queries
+        self.partition_min_rows = partition_min_rows
+        self.partitions = partitions
+        self.isolated_batch_size = isolated_batch_size
+        self.batch_fetch_max_rows = batch_fetch_max_rows
+        self.key_tables = key_tables
+        self.sample_store = sample_store
+        self.run_report = RunReport(collected=collect_report)
 
+    @tracing.traced('runner')
     def execute_graph_set(  # noqa pylint: disable=too-many-arguments
         self,
         graph_set: Tuple[nx.Graph],
@@ -56,7 +184,8 @@ class GraphSetRunner:
             graph_set (list): list of graphs to process
             source_adapter (BaseSourceAdapter): source adapter for the relations
             target_adapter (BaseTargetAdapter): target adapter for the relations
-            threads (int): number of threads to use for parallelization
+            threads (int): number of threads to use for parallelization, raised to the maximum
+                concurrency of the source and target when those are adaptive
             retry_count (int): number of times to retry failed query
             analyze (bool): whether to run analyze or actually transfer the sampled data
             barf (bool): whether to dump diagnostic files to disk
@@ -67,17 +196,30 @@ class GraphSetRunner:
             shutil.rmtree(self.barf_output, ignore_errors=True)
             os.makedirs(self.barf_output)
 
+        if self.async_queries and not analyze and not source_adapter.SUPPORTS_ASYNC_QUERIES:
+            logger.warning(f"Source adapter {source_adapter.CLASSNAME} cannot submit asynchronous queries, "
+                           "running them one at a time.")
+
         view_graph_set = [graph for graph in graph_set if graph.contains_views]
         table_graph_set = list(set(graph_set) - set(view_graph_set))
+        table_graph_set, isolated_batches = self._batch_isolated_graphs(table_graph_set)
+        # the controllers limit the queries in flight, the pool only needs enough threads to reach their maximum
+        threads = max([threads] + [controller.maximum for controller in (self.source_concurrency,
+                                                                         self.target_concurrency)
+                                   if controller is not None])
+        transformer = FrameTransformer(self.transform_processes) if self.transform_processes else None
 
         # Tables need to come first to prevent deps deadlocks with views
         try:
-            for graphs in [table_graph_set, view_graph_set]:
-                with ThreadPoolExecutor(max_workers=threads) as executor:
+            for graphs in [table_graph_set + isolated_batches, *self._view_generations(view_graph_set)]:
+                with ThreadPoolExecutor(max_workers=threads) as executor, \
+                        concurrency.bind(source=self.source_concurrency, target=self.target_concurrency), \
+                        transform.bind(transformer):
                     if graphs:
                         executables = [
                             GraphExecutable(
-                                graph, source_adapter, target_adapter, analyze
+                                graph, source_adapter, target_adapter, analyze,
+                                batched=any(graph is batch for batch in isolated_batches)
                             )
                             for graph in graphs
                         ]
@@ -87,6 +229,8 @@ class GraphSetRunner:
                 "Execution interrupted by user, wait for schemas to be dropped..."
             )
         finally:
+            if transformer is not None:
+                transformer.shutdown()
             # Drop schemas after all threads completed work
             for schema in self.schemas:
                 source_adapter.drop_schema(schema)
@@ -113,7 +257,7 @@ class GraphSetRunner:
         """
         while retries >= 0:
             futures = {
-                executor.submit(self._traverse_and_execute, executable): executable
+                executor.submit(tracing.propagate(self._traverse_and_execute), executable): executable
                 for executable in executables
             }
             completed, _ = concurrent.futures.wait(
@@ -143,6 +287,46 @@ class GraphSetRunner:
             retries -= 1
         logging.error("Max retries reached. Some executables failed.")
 
+    @staticmethod
+    def _view_generations(graphs: List[nx.Graph]) -> List[List[nx.Graph]]:
+        """ Orders the graphs with views so the views other views select from are created first
+
+            A view depends on another when the definition read with the catalog selects from it after FROM
+            or JOIN, by name within its own schema or qualified by schema otherwise. The graphs of a generation are
+            processed in parallel, once all graphs of the previous generations are done.
+        """
+        if len(graphs) < 2:
+            return [graphs]
+        views = [(index, view) for index, graph in enumerate(graphs) for view in graph.nodes if view.is_view]
+        order = nx.DiGraph()
+        order.add_nodes_from(range(len(graphs)))
+        for index, view in views:
+            if view.view_definition is None:
+                continue
+            references = GraphSetRunner._referenced_names(view.view_definition)
+            for other_index, other in views:
+                names = {(other.database.lower(), other.schema.lower(), other.name.lower()),
+                         (other.schema.lower(), other.name.lower())}
+                if (other.database, other.schema) == (view.database, view.schema):
+                    names.add((other.name.lower(),))
+                if other_index != index and names & references:
+                    order.add_edge(other_index, index)
+        try:
+            return [[graphs[index] for index in generation] for generation in nx.topological_generations(order)]
+        except nx.NetworkXUnfeasible:
+            logger.warning("Views reference each other in a cycle, creating them in no particular order.")
+            return [graphs]
+
+    @staticmethod
+    def _referenced_names(sql: str) -> Set[Tuple[str, ...]]:
+        """ The lower cased names selected from in the sql, with the one and two qualifiers before them """
+        references = set()
+        for chain in SELECTED_RELATION_PATTERN.finditer(sql):
+            parts = [part.strip().strip('"').lower() for part in chain.group(1).split('.')]
+            for length in range(1, min(len(parts), 3) + 1):
+                references.add(tuple(parts[-length:]))
+        return references
+
     def _generate_schemas_if_necessary(
         self, adapter: BaseSQLAdapter, name: str, database: str
     ) -> None:
@@ -162,6 +346,296 @@ class GraphSetRunner:
                 adapter.generate_schema(name, database)
                 self.schemas.add(name)
 
+    def _prepare_sampling(self, relation: Relation, source_adapter: BaseSourceAdapter) -> None:
+        """ Prepares the relation sampling, capping sampled relations to what is left of the replica byte budget
+
+            The budget is held while preparing so concurrent relations cannot reserve the same bytes.
+        """
+        if self.byte_budget is None:
+            relation.sampling.prepare(relation, source_adapter)
+            return
+
+        with self.byte_budget.lock:
+            if not relation.unsampled:
+                relation.max_allowed_bytes = self.byte_budget.remaining
+                if relation.max_allowed_bytes == 0:
+                    logger.warning(f"Replica byte budget exhausted before sampling {relation.dot_notation}.")
+            relation.sampling.prepare(relation, source_adapter)
+            self.byte_budget.reserve(relation.projected_bytes or 0)
+
+    def _measure_actual_bytes(self, relation: Relation, source_adapter: BaseSourceAdapter) -> None:
+        """ Reads the size of the extracted sample when a byte budget applies to the relation """
+        if self.byte_budget is None and relation.projected_bytes is None:
+            return
+        # unsampled relations move the whole source table, which may not have a temp copy
+        measured = relation if relation.unsampled else self._temp_relation(relation)
+        actual_bytes = source_adapter.scalar_query(source_adapter.relation_bytes_statement(measured))
+        relation.actual_bytes = int(actual_bytes) if actual_bytes is not None else None
+        logger.info(f"Relation {relation.dot_notation} moved {relation.actual_bytes} bytes "
+                    f"(projected {relation.projected_bytes}).")
+        if self.byte_budget is not None:
+            self.byte_budget.settle(relation.projected_bytes or 0, relation.actual_bytes or 0)
+
+    @staticmethod
+    def _temp_relation(relation: Relation) -> Relation:
+        """ The temp table holding the sample of a relation in the source """
+        return Relation(relation.temp_database, relation.temp_schema, relation.name, mz.TABLE, [])
+
+    @staticmethod
+    def _estimate_sample_memory(relation: Relation, source_adapter: BaseSourceAdapter) -> int:
+        """ Estimates the in memory bytes of a sample from the storage bytes of its temp table in the source """
+        stored_bytes = relation.actual_bytes
+        if stored_bytes is None:
+            stored_bytes = source_adapter.scalar_query(
+                source_adapter.relation_bytes_statement(GraphSetRunner._temp_relation(relation)))
+        return int(stored_bytes or 0) * SAMPLE_MEMORY_EXPANSION
+
+    def _create_key_tables(self, relation: Relation, executable: GraphExecutable) -> None:
+        """ Materializes the distinct keys downstream relations are constrained on, one table per key
+
+            Downstream predicates read the narrow key tables instead of the full sampled rows.
+        """
+        keys = {edge['remote_attribute']
+                for _, _, edge in executable.graph.out_edges(relation, data=True)}
+        relation.key_table_sizes = dict()
+        for key in sorted(keys):
+            relation.key_table_sizes[key] = executable.source_adapter.create_key_table(relation, key)
+            logger.debug(f"Key table for {relation.dot_notation}.{key} holds "
+                         f"{relation.key_table_sizes[key]} distinct keys.")
+
+    def _stream_unsampled_relation(self, relation: Relation, executable: GraphExecutable) -> None:
+        """ Streams an unsampled relation from the source table straight into the target in chunks
+
+            No copy of the relation is made in the source. When downstream relations are constrained
+            on it, its temp table is a zero-copy clone of the source table.
+        """
+        with phase('temp_table'):
+            if executable.graph.out_degree(relation) > 0:
+                executable.source_adapter.clone_table(relation)
+                if self.key_tables:
+                    self._create_key_tables(relation, executable)
+            self._measure_actual_bytes(relation, executable.source_adapter)
+
+        if relation.population_size > relation.sampling.max_allowed_rows:
+            logger.warning(f"Unsampled relation has {relation.population_size} rows which is over "
+                           f"the max allowed rows for this type of query ({relation.sampling.max_allowed_rows}). "
+                           "All records will be loaded into replica.")
+        if self.partition_min_rows is not None and relation.population_size >= self.partition_min_rows:
+            relation.sample_size = self._transfer_partitioned(relation, relation.compiled_query, executable)
+            return
+        logger.info(
+            f"Streaming relation {relation.dot_notation} into "
+            f"{executable.target_adapter.quoted_dot_notation(relation)}..."
+        )
+        try:
+            relation.sample_size = executable.target_adapter.stream_data_into_relation(
+                relation,
+                timed_iter('fetch', executable.source_adapter.stream_query(relation.compiled_query,
+                                                                           DEFAULT_INSERT_CHUNK_SIZE)))
+        except Exception as exc:
+            raise SystemError(
+                f"Failed to stream relation {relation.dot_notation} into target "
+                f"{executable.target_adapter.quoted_dot_notation(relation)}: {exc}"
+            ) from exc
+        logger.info(
+            f"{relation.sample_size} records streamed for relation {relation.dot_notation}."
+        )
+
+    def _extract_sampled_relation(self,
+                                  relation: Relation,
+                                  executable: GraphExecutable,
+                                  temp_table_created: bool = False) -> None:
+        """ Samples a relation into a temp table in the source, then fetches it and loads it into the target
+
+            With a memory governor, the fetch waits for the estimated bytes of the sample to be available.
+            Samples estimated over the whole limit are spilled to local disk instead of memory.
+        """
+        with phase('temp_table'):
+            if not temp_table_created:
+                executable.source_adapter.create_table(
+                    query=relation.compiled_query,
+                    name=relation.name,
+                    schema=relation.temp_schema,
+                    database=relation.temp_database,
+                )
+            self._measure_actual_bytes(relation, executable.source_adapter)
+            if self.key_tables:
+                self._create_key_tables(relation, executable)
+
+        if self.partition_min_rows is not None:
+            try:
+                count = self._count_sample(relation, executable)
+            except Exception as exc:
+                raise SystemError(
+                    f"Failed to count records of source {relation.temp_dot_notation}: {exc}"
+                ) from exc
+            if count >= self.partition_min_rows:
+                relation.sample_size = self._transfer_partitioned(
+                    relation, f"SELECT * FROM {relation.temp_dot_notation}", executable)
+                return
+
+        if self.memory_governor is None:
+            data = self._fetch_sample(relation, executable)
+            self._store_sample(relation, data)
+            self._load_relation(relation, data, executable)
+            return
+
+        estimated_bytes = self._estimate_sample_memory(relation, executable.source_adapter)
+        if not self.memory_governor.fits(estimated_bytes):
+            logger.info(f"Sample of relation {relation.dot_notation} is estimated at {estimated_bytes} bytes, "
+                        f"over the memory limit of {self.memory_governor.max_bytes}. Spilling it to disk...")
+            self._spill_sample(relation, executable)
+            return
+
+        self.memory_governor.acquire(estimated_bytes)
+        held_bytes = estimated_bytes
+        try:
+            data = self._fetch_sample(relation, executable)
+            actual_bytes = int(data.memory_usage(deep=True).sum())
+            self.memory_governor.settle(held_bytes, actual_bytes)
+            held_bytes = actual_bytes
+            self._store_sample(relation, data)
+            self._load_relation(relation, data, executable)
+        finally:
+            self.memory_governor.release(held_bytes)
+
+    @staticmethod
+    def _fetch_sample(relation: Relation, executable: GraphExecutable) -> pd.DataFrame:
+        fetch_query = f"SELECT * FROM {relation.temp_dot_notation}"
+        try:
+            logger.info(
+                f"Retrieving records from source {relation.temp_dot_notation}..."
+            )
+            data = executable.source_adapter.check_count_and_query(
+                fetch_query,
+                relation.sampling.max_allowed_rows,
+                relation.unsampled,
+            )
+            relation.sample_size = len(data)
+            logger.info(
+                f"{relation.sample_size} records retrieved for relation {relation.dot_notation}."
+            )
+        except Exception as exc:
+            raise SystemError(
+                f"Failed to retrieve records from source {relation.temp_dot_notation} "
+                f"with query: {fetch_query} "
+                f"issue details: {exc}"
+            ) from exc
+        return data
+
+    @staticmethod
+    def _load_relation(relation: Relation, data: Optional[pd.DataFrame], executable: GraphExecutable) -> None:
+        logger.info(
+            f"Inserting relation {executable.target_adapter.quoted_dot_notation(relation)}"
+            " into target..."
+        )
+        try:
+            executable.target_adapter.create_and_load_relation(relation, data)
+        except Exception as exc:
+            raise SystemError(
+                "Failed to load relation "
+                f"{executable.target_adapter.quoted_dot_notation(relation)} "
+                f" into target: {exc}"
+            ) from exc
+
+    def _sample_keys(self, relations: List[Relation], executable: GraphExecutable) -> Optional[Dict[Relation, str]]:
+        """ Builds the sample store keys of the relations of a graph, or None if the graph cannot be stored
+
+            Keys are built from cheap metadata only, so a stored graph loads without counting, preparing
+            or compiling anything in the source: the sampling spec of every relation and its relationships,
+            and the catalog fingerprint (last altered time, row count and bytes) of every source table.
+            Every key covers the whole graph, since downstream samples are only consistent with the upstream
+            samples they were drawn with. Graphs with views or unsampled relations are always extracted.
+        """
+        if any(relation.is_view or relation.unsampled for relation in relations):
+            return None
+        fingerprints = executable.source_adapter.get_change_fingerprints(relations)
+        relation_keys = [self.sample_store.key(self._sample_spec(relation, executable.graph),
+                                               fingerprints.get(relation.dot_notation))
+                         for relation in relations]
+        graph_key = SampleStore.combined_key(*relation_keys)
+        return {relation: SampleStore.combined_key(graph_key, relation.dot_notation) for relation in relations}
+
+    def _sample_spec(self, relation: Relation, graph: nx.Graph) -> str:
+        """ Describes what the sample of a relation is drawn with, apart from the source data """
+        edges = sorted(f"{parent.dot_notation} -> {child.dot_notation} {sorted(edge.items())}"
+                       for parent, child, edge in itertools.chain(graph.in_edges(relation, data=True),
+                                                                  graph.out_edges(relation, data=True)))
+        budget = self.byte_budget.max_allowed_bytes if self.byte_budget is not None else None
+        return '\n'.join([relation.dot_notation,
+                          _config_spec(relation.sampling),
+                          f"outliers {relation.include_outliers} {relation.outliers_from_samples} "
+                          f"{relation.max_number_of_outliers}",
+                          f"byte budget {budget}",
+                          *edges])
+
+    def _load_graph_from_store(self, relations: List[Relation], executable: GraphExecutable) -> bool:
+        """ Loads all relations of a graph from the sample store into the target, skipping the source
+
+            Returns:
+                True if the graph was loaded, False if it needs to be extracted from the source. In that
+                case the relations carry the keys to store their samples under once extracted.
+        """
+        keys = self._sample_keys(relations, executable)
+        if keys is None:
+            return False
+        if not all(self.sample_store.contains(key) for key in keys.values()):
+            for relation, key in keys.items():
+                relation.sample_key = key
+            return False
+
+        logger.info(f"Loading graph with {len(relations)} relations from sample store {self.sample_store.path}...")
+        for relation in relations:
+            with tracing.span(relation.dot_notation, 'relation'), self.run_report.relation(relation):
+                self._load_relation_from_store(relation, keys[relation], executable)
+        return True
+
+    def _load_relation_from_store(self, relation: Relation, key: str, executable: GraphExecutable) -> None:
+        """ Reads a stored sample and loads it into the target, holding it within the memory limit """
+        start_time = time.time()
+        with phase('schema_generation'):
+            executable.target_adapter.create_database_if_not_exists(relation.database)
+            executable.target_adapter.create_schema_if_not_exists(relation.database, relation.schema)
+        held_bytes = 0
+        if self.memory_governor is not None:
+            held_bytes = (self.sample_store.stored_bytes(key) or 0) * SAMPLE_MEMORY_EXPANSION
+            self.memory_governor.acquire(held_bytes)
+        try:
+            sample = self.sample_store.get(key)
+            if sample is None:
+                raise SystemError(f"Sample of relation {relation.dot_notation} was evicted from the sample store.")
+            if self.memory_governor is not None:
+                actual_bytes = int(sample.memory_usage(deep=True).sum())
+                self.memory_governor.settle(held_bytes, actual_bytes)
+                held_bytes = actual_bytes
+            relation.sample_size = len(sample)
+            try:
+                executable.target_adapter.create_and_load_relation(relation, sample)
+            except Exception as exc:
+                raise SystemError(
+                    "Failed to load relation "
+                    f"{executable.target_adapter.quoted_dot_notation(relation)} "
+                    f" into target: {exc}"
+                ) from exc
+        finally:
+            if self.memory_governor is not None:
+                self.memory_governor.release(held_bytes)
+        logger.info(
+            f"Done replication of relation {executable.target_adapter.quoted_dot_notation(relation)} "
+            f"from sample store in {duration(start_time)}."
+        )
+        relation.target_loaded = True
+        relation.source_extracted = True
+
+    def _store_sample(self, relation: Relation, data: pd.DataFrame) -> None:
+        """ Stores an extracted sample when its graph is covered by the sample store """
+        if self.sample_store is None or relation.sample_key is None:
+            return
+        try:
+            self.sample_store.put(relation.sample_key, data)
+        except Exception as exc:  # noqa pylint: disable=broad-except
+            logger.warning(f"Failed to store sample of relation {relation.dot_notation}: {exc}")
+
     def _write_adjlist_if_necessary(self, executable: GraphExecutable) -> None:
         """ Writes the graph to disk in adjlist format if the barf flag is set"""
         if self.barf:
@@ -175,8 +649,56 @@ class GraphSetRunner:
             ) as cmp_file:
                 nx.write_multiline_adjlist(executable.graph, cmp_file)
 
+    def _prepare_relation(self,
+                          i: int,
+                          relation: Relation,
+                          executable: GraphExecutable,
+                          counted: bool = False) -> Relation:
+        """ Counts the population of a relation, unless already counted, and compiles its sample query
+
+            Views are created from their definition, so they are neither counted nor prepared for sampling.
+        """
+        relation.temp_schema = "_".join([relation.database, relation.schema, self.uuid])
+
+        if not relation.is_view:
+            with phase('schema_generation'):
+                self._generate_schemas_if_necessary(
+                    executable.source_adapter,
+                    relation.temp_schema,
+                    relation.temp_database,
+                )
+
+            if not counted:
+                with phase('population_count'):
+                    relation.population_size = executable.source_adapter.scalar_query(
+                        executable.source_adapter.population_count_statement(relation)
+                    )
+        logger.info(
+            f"Executing source query for relation {relation.dot_notation} "
+            f"({i} of {len(executable.graph)} in graph)..."
+        )
+
+        if not relation.is_view:
+            with phase('prepare'):
+                self._prepare_sampling(relation, executable.source_adapter)
+        with phase('compile'):
+            return RuntimeSourceCompiler.compile_queries_for_relation(
+                relation,
+                executable.graph,
+                executable.source_adapter,
+                executable.analyze,
+            )
+
+    @staticmethod
+    def _create_target_schema(relation: Relation, executable: GraphExecutable) -> None:
+        with phase('schema_generation'):
+            executable.target_adapter.create_database_if_not_exists(relation.database)
+            executable.target_adapter.create_schema_if_not_exists(
+                relation.database, relation.schema
+            )
+
     def _process_relation(
-        self, i: int, relation: Relation, executable: GraphExecutable
+        self, i: int, relation: Relation, executable: GraphExecutable, counted: bool = False
     ) -> None:
         """Processes a single relation in the graph, extracting and loading it into the target
 
@@ -185,31 +707,10 @@ class GraphSetRunner:
             relation (Relation): relation to process
             executable (GraphExecutable): object that contains all of the necessary info for
                 executing a sample and loading it into the target
+            counted (bool): whether the population of the relation was already counted
         """
-        relation.temp_schema = "_".join([relation.database, relation.schema, self.uuid])
-
         start_time = time.time()
-        self._generate_schemas_if_necessary(
-            executable.source_adapter,
-            relation.temp_schema,
-            relation.temp_database,
-        )
-
-        relation.population_size = executable.source_adapter.scalar_query(
-            executable.source_adapter.population_count_statement(relation)
-        )
-        logger.info(
-            f"Executing source query for relation {relation.dot_notation} "
-            f"({i} of {len(executable.graph)} in graph)..."
-        )
-
-        relation.sampling.prepare(relation, executable.source_adapter)
-        relation = RuntimeSourceCompiler.compile_queries_for_relation(
-            relation,
-            executable.graph,
-            executable.source_adapter,
-            executable.analyze,
-        )
+        relation = self._prepare_relation(i, relation, executable, counted)
         if executable.analyze:
             if relation.is_view:
                 relation.population_size = "N/A"
@@ -227,88 +728,47 @@ class GraphSetRunner:
                     f"Analysis of relation {relation.dot_notation} completed in {duration(start_time)}."
                 )
         else:
-            executable.target_adapter.create_database_if_not_exists(relation.database)
-            executable.target_adapter.create_schema_if_not_exists(
-                relation.database, relation.schema
-            )
+            self._create_target_schema(relation, executable)
             if relation.is_view:
-                logger.info(
-                    f"Retrieving DDL statement for view {relation.dot_notation} in source..."
-                )
                 relation.population_size = "N/A"
                 relation.sample_size = "N/A"
-                try:
-                    relation.view_ddl = executable.source_adapter.scalar_query(
-                        relation.compiled_query
-                    )
-                except Exception as exc:
-                    raise SystemError(
-                        f"Failed to extract DDL statement: {relation.compiled_query}"
-                    ) from exc
-                logger.info(
-                    "Successfully extracted DDL statement for view "
-                    f"{executable.target_adapter.quoted_dot_notation(relation)}"
-                )
-            else:
-                executable.source_adapter.create_table(
-                    query=relation.compiled_query,
-                    name=relation.name,
-                    schema=relation.temp_schema,
-                    database=relation.temp_database,
-                )
-
-                try:
+                if relation.view_definition is not None:
+                    relation.view_ddl = relation.view_definition
+                else:
                     logger.info(
-                        f"Retrieving records from source {relation.temp_dot_notation}..."
-                    )
-                    fetch_query = f"SELECT * FROM {relation.temp_dot_notation}"
-                    query_data = executable.source_adapter.check_count_and_query(
-                        fetch_query,
-                        relation.sampling.max_allowed_rows,
-                        relation.unsampled,
+                        f"Retrieving DDL statement for view {relation.dot_notation} in source..."
                     )
-                    relation.sample_size = len(query_data)
+                    try:
+                        with phase('fetch'):
+                            relation.view_ddl = executable.source_adapter.scalar_query(
+                                relation.compiled_query
+                            )
+                    except Exception as exc:
+                        raise SystemError(
+                            f"Failed to extract DDL statement: {relation.compiled_query}"
+                        ) from exc
                     logger.info(
-                        f"{relation.sample_size} records retrieved for relation {relation.dot_notation}."
-                    )
-                # This except block is necessary due to VARIANT data type issues
-                # in Snowflake. In the future, we should remove this and find a
-                # better solution.
-                except json.decoder.JSONDecodeError as exc:
-                    logger.error(
-                        f"Failed to retrieve records from source {relation.temp_dot_notation} "
-                        f"with query: {fetch_query}"
+                        "Successfully extracted DDL statement for view "
+                        f"{executable.target_adapter.quoted_dot_notation(relation)}"
                     )
-                    logger.error(f"Issue details: {exc}")
-                    logger.error(f"Skipping relation insert {relation.dot_notation}")
-                    return  # Return early to avoid inserting empty relation
-
-                except Exception as exc:
-                    raise SystemError(
-                        f"Failed to retrieve records from source {relation.temp_dot_notation} "
-                        f"with query: {fetch_query} "
-                        f"issue details: {exc}"
-                    ) from exc
+                self._load_relation(relation, None, executable)
+            elif relation.unsampled:
+                self._stream_unsampled_relation(relation, executable)
+            else:
+                self._extract_sampled_relation(relation, executable)
+            self._mark_loaded(relation, executable, start_time)
+        self._complete_relation(relation)
 
-            logger.info(
-                f"Inserting relation {executable.target_adapter.quoted_dot_notation(relation)}"
-                " into target..."
-            )
-            try:
-                executable.target_adapter.create_and_load_relation(relation, query_data)
-            except Exception as exc:
-                raise SystemError(
-                    "Failed to load relation "
-                    f"{executable.target_adapter.quoted_dot_notation(relation)} "
-                    f" into target: {exc}"
-                ) from exc
+    @staticmethod
+    def _mark_loaded(relation: Relation, executable: GraphExecutable, start_time: float) -> None:
+        logger.info(
+            "Done replication of relation "
+            f"{executable.target_adapter.quoted_dot_notation(relation)} "
+            f" in {duration(start_time)}."
+        )
+        relation.target_loaded = True
 
-            logger.info(
-                "Done replication of relation "
-                f"{executable.target_adapter.quoted_dot_notation(relation)} "
-                f" in {duration(start_time)}."
-            )
-            relation.target_loaded = True
+    def _complete_relation(self, relation: Relation) -> None:
         relation.source_extracted = True
         logger.info(
             f"population:{relation.population_size}, sample:{relation.sample_size}"
@@ -333,9 +793,21 @@ class GraphSetRunner:
             logger.debug(
                 f"Executing graph with {len(executable.graph)} relations in it..."
             )
-            sorted_graphs = nx.algorithms.dag.topological_sort(executable.graph)
-            for i, relation in enumerate(sorted_graphs, start=1):
-                self._process_relation(i, relation, executable)
+            sorted_graphs = list(nx.algorithms.dag.topological_sort(executable.graph))
+            with tracing.span(f"component of {sorted_graphs[0].dot_notation}", 'component',
+                              relations=len(sorted_graphs)):
+                if executable.batched:
+                    self._execute_isolated_batch(executable)
+                    return
+                if (self.sample_store is not None and not executable.analyze
+                        and self._load_graph_from_store(sorted_graphs, executable)):
+                    return
+                if self._submits_async(executable):
+                    self._execute_generations(executable)
+                    return
+                for i, relation in enumerate(sorted_graphs, start=1):
+                    with tracing.span(relation.dot_notation, 'relation'), self.run_report.relation(relation):
+                        self._process_relation(i, relation, executable)
             gc.collect()
         except Exception as exc:
             logger.error(f"failed with error of type {type(exc)}: {str(exc)}")
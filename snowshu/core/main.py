@@ -111,6 +111,11 @@ def init(path: click.Path) -> None:
     '--incremental', '-i',
     help="creates relations and loads data only for new entries found in replica.yml, "
          "which are not already present in target replica image")
+@click.option(
+    '--refresh',
+    is_flag=True,
+    help="with --incremental, also samples again the relations whose source data changed since the "
+         "incremental image was built, and their downstream relations")
 @click.option(
     '--retry-count', '-r',
     help="Overrides default retry count (default is 1)",
@@ -121,14 +126,35 @@ def init(path: click.Path) -> None:
     help="Tells SnowShu to build replicas of both arm and amd architectures",
     is_flag=True
 )
+@click.option(
+    '--plan', '-p', 'plan_path',
+    type=click.Path(exists=True),
+    help="an execution plan built with `snowshu plan`, used instead of discovering the source catalog "
+         "when the replica file did not change since the plan was built")
+@click.option(
+    '--report',
+    type=click.Path(),
+    help="writes the per relation timings, rows, bytes and retries of the run to "
+         "<REPORT>.jsonl and to the Prometheus textfile <REPORT>.prom")
+@click.option(
+    '--trace',
+    type=click.Path(),
+    help="writes a trace of the run, with a span per graph, relation, query and docker call, "
+         "to the Chrome trace file TRACE, to open in chrome://tracing or ui.perfetto.dev")
 def create(replica_file: click.Path,  # noqa pylint: disable=too-many-arguments
            name: str,
            barf: bool,
            incremental: str,
+           refresh: bool,
            retry_count: int,
-           multiarch):
+           multiarch,
+           plan_path: click.Path,
+           report: click.Path,
+           trace: click.Path):
     """Generate a new replica from a replica.yml file.
     """
+    if refresh and not incremental:
+        raise click.UsageError("--refresh requires an --incremental image to refresh.")
     if multiarch:
         target_arch = get_multiarch_list(LOCAL_ARCHITECTURE)
     else:
@@ -137,8 +163,33 @@ def create(replica_file: click.Path,  # noqa pylint: disable=too-many-arguments
     replica = ReplicaFactory()
     replica.load_config(replica_file, target_arch=target_arch)
     replica.incremental = incremental
+    replica.refresh = refresh
+    replica.report_path = report
+    replica.trace_path = trace
 
-    click.echo(replica.create(name=name, barf=barf, retry_count=retry_count))
+    click.echo(replica.create(name=name, barf=barf, retry_count=retry_count, plan=plan_path))
+
+
+@cli.command()
+@click.option(
+    '--replica-file',
+    type=click.Path(
+        exists=True),
+    default=REPLICA_DEFAULT,
+    help="where snowshu will look for your replica configuration file, default is ./replica.yml")
+@click.option(
+    '--output', '-o',
+    type=click.Path(),
+    default=os.path.join(os.getcwd(), 'plan.json'),
+    help="where snowshu will write the execution plan, default is ./plan.json")
+def plan(replica_file: click.Path,
+         output: click.Path):
+    """Build the execution plan of a replica: the relation graph, sample queries, execution order and
+    size estimates. Pass it to `snowshu create --plan` to skip catalog discovery and graph building.
+    """
+    replica = ReplicaFactory()
+    replica.load_config(replica_file, [LOCAL_ARCHITECTURE.value])
+    click.echo(replica.plan(output))
 
 
 @cli.command()
@@ -156,13 +207,27 @@ def create(replica_file: click.Path,  # noqa pylint: disable=too-many-arguments
     help="Overrides default retry count (default is 1)",
     default=DEFAULT_RETRY_COUNT
 )
+@click.option(
+    '--report',
+    type=click.Path(),
+    help="writes the per relation timings, rows, bytes and retries of the run to "
+         "<REPORT>.jsonl and to the Prometheus textfile <REPORT>.prom")
+@click.option(
+    '--trace',
+    type=click.Path(),
+    help="writes a trace of the run, with a span per graph, relation, query and docker call, "
+         "to the Chrome trace file TRACE, to open in chrome://tracing or ui.perfetto.dev")
 def analyze(replica_file: click.Path,
             barf: bool,
-            retry_count: int):
+            retry_count: int,
+            report: click.Path,
+            trace: click.Path):
     """Perform a "dry run" of the replica creation without actually executing, and return the expected results.
     """
     replica = ReplicaFactory()
     replica.load_config(replica_file, [LOCAL_ARCHITECTURE.value])
+    replica.report_path = report
+    replica.trace_path = trace
     click.echo(replica.analyze(barf=barf, retry_count=retry_count))
 
 
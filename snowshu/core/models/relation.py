@@ -1,8 +1,6 @@
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 import logging
-import json
 import re
-from sqlalchemy.types import JSON
 import pandas as pd
 
 from snowshu.configs import (
@@ -32,8 +30,16 @@ class Relation:
     unsampled: bool = False
     include_outliers: bool = False
     max_number_of_outliers: int = DEFAULT_MAX_NUMBER_OF_OUTLIERS
+    outliers_from_samples: bool = False
     temp_database: str = DEFAULT_TEMPORARY_DATABASE
     temp_schema: Optional[str] = None
+    max_allowed_bytes: Optional[int] = None
+    projected_bytes: Optional[int] = None
+    actual_bytes: Optional[int] = None
+    key_table_sizes: Optional[Dict[str, int]] = None
+    sample_key: Optional[str] = None
+    # the SELECT a view is defined by, read with the catalog when the source provides it
+    view_definition: Optional[str] = None
 
     def __init__(self,  # noqa pylint: disable=too-many-arguments
                  database: str,
@@ -71,8 +77,9 @@ class Relation:
     def data(self, val: pd.DataFrame) -> None:
         """ Setter for the relation's dataframe
 
-            Adjusts data columns to match corrected attribute names and
-            fixes mismatched datatypes
+            Adjusts data columns to match corrected attribute names. Values are
+            left as-is; type specific cleanup (ie JSON) happens in the target
+            adapter sanitization stage right before loading.
         """
         lowered_columns = [correct_case(col, False)
                            for col in val.columns.to_list()]
@@ -81,12 +88,6 @@ class Relation:
         val.columns = [attrs[lowered_attrs.index(
             col)] for col in lowered_columns]
 
-        # handle the fact that pandas.read_sql may not preserve json type on load
-        for attr in self.attributes:
-            if isinstance(attr.data_type.sqlalchemy_type, JSON):
-                transform_func = (lambda v: json.loads(v) if isinstance(v, str) else v)  # noqa pylint: disable=unnecessary-lambda-assignment
-                val[attr.name] = val[attr.name].transform(func=transform_func)
-
         self._data = val
 
     @data.deleter
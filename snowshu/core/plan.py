@@ -0,0 +1,166 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, List, TextIO, Union
+import logging
+
+import networkx
+
+from snowshu.core.compile import RuntimeSourceCompiler
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.models import data_types as dt
+from snowshu.core.models import materializations as mz
+from snowshu.core.models.attribute import Attribute
+from snowshu.core.models.relation import Relation
+
+if TYPE_CHECKING:
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+    from snowshu.core.configuration_parser import Configuration
+
+logger = logging.getLogger(__name__)
+
+PLAN_VERSION = 1
+
+
+def replica_file_hash(config: Union[Path, str, TextIO, dict]) -> str:
+    """The content hash of a replica configuration, in any of the forms the configuration parser accepts.
+
+    Streams are rewound after reading so they can still be parsed.
+    """
+    if isinstance(config, dict):
+        content = json.dumps(config, sort_keys=True, default=str).encode()
+    elif hasattr(config, 'read'):
+        content = config.read()
+        config.seek(0)
+        content = content.encode() if isinstance(content, str) else content
+    else:
+        content = Path(config).read_bytes()
+    return hashlib.sha256(content).hexdigest()
+
+
+@dataclass
+class ExecutionPlan:
+    """A resolved replica build that can be stored and executed later without rebuilding the graph.
+
+    The plan holds the graph of relations and relationships, the order relations are sampled in,
+    the compiled sample queries with population and size estimates (for review), and the content
+    hash of the replica configuration it was built from. Changes to the source catalog are not
+    detected, the plan has to be built again after them.
+
+    The compiled queries are informative: at execution time the queries are compiled again, since
+    constraints read the samples of upstream relations from per-run temp tables.
+    """
+    replica_file_hash: str
+    graph: networkx.MultiDiGraph
+    steps: List[dict] = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat())
+
+    @classmethod
+    def build(cls,
+              graph: SnowShuGraph,
+              source_adapter: 'BaseSourceAdapter',
+              config_hash: str) -> 'ExecutionPlan':
+        """Compiles every relation of the graph in execution order and collects its estimates.
+
+        Args:
+            graph: the built :class:`SnowShuGraph <snowshu.core.graph.SnowShuGraph>`.
+            source_adapter: the source adapter to count populations and compile queries with.
+            config_hash: the :func:`replica_file_hash` of the configuration the graph was built from.
+        """
+        plan = cls(config_hash, graph.graph)
+        for index, dag in enumerate(graph.get_connected_subgraphs()):
+            for order, relation in enumerate(networkx.algorithms.dag.topological_sort(dag), start=1):
+                plan.steps.append(cls._plan_relation(index, order, relation, dag, source_adapter))
+        return plan
+
+    @staticmethod
+    def _plan_relation(index: int,
+                       order: int,
+                       relation: Relation,
+                       dag: networkx.MultiDiGraph,
+                       source_adapter: 'BaseSourceAdapter') -> dict:
+        step = dict(relation=relation.dot_notation,
+                    subgraph=index,
+                    order=order,
+                    population_size=None,
+                    target_sample_size=None,
+                    estimated_bytes=None)
+        # placeholder for the per-run schema, only visible in queries reading upstream samples
+        relation.temp_schema = relation.temp_schema or "_".join([relation.database, relation.schema, 'PLAN'])
+        if not relation.is_view:
+            relation.population_size = int(source_adapter.scalar_query(
+                source_adapter.population_count_statement(relation)))
+            relation.sampling.prepare(relation, source_adapter)
+            step['population_size'] = relation.population_size
+            step['target_sample_size'] = (relation.population_size if relation.unsampled
+                                          else min(relation.sampling.size, relation.population_size))
+            relation_bytes = source_adapter.scalar_query(source_adapter.relation_bytes_statement(relation))
+            if relation_bytes is not None and relation.population_size:
+                step['estimated_bytes'] = int(float(relation_bytes)
+                                              * step['target_sample_size'] / relation.population_size)
+        # analyze compilation reads upstream sample queries instead of temp tables
+        RuntimeSourceCompiler.compile_queries_for_relation(relation, dag, source_adapter, True)
+        step['query'] = relation.core_query
+        return step
+
+    def to_dict(self) -> dict:
+        relations = [dict(database=relation.database,
+                          schema=relation.schema,
+                          name=relation.name,
+                          materialization=relation.materialization.name,
+                          attributes=[[attr.name, attr.data_type.name] for attr in relation.attributes or []])
+                     for relation in self.graph.nodes]
+        edges = [dict(upstream=upstream.dot_notation, downstream=downstream.dot_notation, **data)
+                 for upstream, downstream, data in self.graph.edges(data=True)]
+        return dict(version=PLAN_VERSION,
+                    created_at=self.created_at,
+                    replica_file_hash=self.replica_file_hash,
+                    relations=relations,
+                    edges=edges,
+                    steps=self.steps)
+
+    def save(self, path: Union[Path, str]) -> None:
+        with open(path, 'w', encoding='utf-8') as plan_file:
+            json.dump(self.to_dict(), plan_file, indent=2)
+        logger.info('Execution plan with %s relations written to %s.', len(self.graph), path)
+
+    @classmethod
+    def from_dict(cls, loaded: dict, configs: 'Configuration') -> 'ExecutionPlan':
+        """Rebuilds the plan graph, applying the sampling settings of the configuration to every relation.
+
+        Args:
+            loaded: a plan as produced by :meth:`to_dict`.
+            configs: the :class:`Configuration <snowshu.core.configuration_parser.Configuration>`
+                the plan was built from.
+        """
+        if loaded.get('version') != PLAN_VERSION:
+            raise ValueError(f"Unsupported execution plan version {loaded.get('version')}, "
+                             f"expected {PLAN_VERSION}.")
+        relations = dict()
+        for rel in loaded['relations']:
+            relation = Relation(rel['database'],
+                                rel['schema'],
+                                rel['name'],
+                                getattr(mz, rel['materialization']),
+                                [Attribute(name, getattr(dt, data_type.upper()))
+                                 for name, data_type in rel['attributes']])
+            SnowShuGraph._set_globals_for_node(relation, configs)  # noqa pylint: disable=protected-access
+            SnowShuGraph._set_overriding_params_for_node(relation, configs)  # noqa pylint: disable=protected-access
+            relations[relation.dot_notation] = relation
+
+        graph = networkx.MultiDiGraph()
+        graph.add_nodes_from(relations.values())
+        for edge in loaded['edges']:
+            data = {key: value for key, value in edge.items() if key not in ('upstream', 'downstream',)}
+            graph.add_edge(relations[edge['upstream']], relations[edge['downstream']], **data)
+        return cls(loaded['replica_file_hash'],
+                   graph,
+                   loaded.get('steps', []),
+                   loaded['created_at'])
+
+    @classmethod
+    def load(cls, path: Union[Path, str], configs: 'Configuration') -> 'ExecutionPlan':
+        with open(path, 'r', encoding='utf-8') as plan_file:
+            return cls.from_dict(json.load(plan_file), configs)
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Any, List, Union
+from typing import Any, List, Optional, Union
 import logging
 
 import networkx as nx
@@ -18,15 +18,21 @@ class ReportRow:
     count_of_dependencies: str
     percent_to_target: Any
     percent_is_acceptable: bool
-
-    def to_tuple(self) -> list:
-        return (self.dot_notation,
-                self.population_size,
-                self.target_sample_size,
-                self.final_sample_size,
-                self.count_of_dependencies,
-                self.percent_to_target,
-                )
+    projected_bytes: Union[int, str] = "N/A"
+    actual_bytes: Union[int, str] = "N/A"
+
+    def to_tuple(self, with_bytes: bool = False) -> list:
+        row = (self.dot_notation,
+               self.population_size,
+               self.target_sample_size,
+               self.final_sample_size,
+               self.count_of_dependencies,
+               self.percent_to_target,
+               )
+        if with_bytes:
+            row += (self.projected_bytes,
+                    self.actual_bytes,)
+        return row
 
 
 def process_relation(graph, relation):
@@ -73,9 +79,15 @@ def process_relation(graph, relation):
             deps,
             percent,
             percent_is_acceptable,
+            _bytes_or_na(getattr(relation, 'projected_bytes', None)),
+            _bytes_or_na(getattr(relation, 'actual_bytes', None)),
         )
 
 
+def _bytes_or_na(value: Union[int, None]) -> Union[int, str]:
+    return "N/A" if value is None else value
+
+
 def graph_to_result_list(graphs: nx.Graph) -> list:
     report = []
     for graph in graphs:
@@ -89,24 +101,30 @@ def graph_to_result_list(graphs: nx.Graph) -> list:
     return report
 
 
-def printable_result(report: List[ReportRow], analyze: bool) -> str:
+def printable_result(report: List[ReportRow], analyze: bool, peak_rss_bytes: Optional[int] = None) -> str:
     colors = dict(reset="\033[0m",
                   red="\033[0;31m",
                   green="\033[0;32m")
+    # byte columns are only reported when a byte budget applied to the replica
+    with_bytes = any(row.projected_bytes != "N/A" or row.actual_bytes != "N/A" for row in report)
     printable = []
     for row in report:
         formatter = 'green' if row.percent_is_acceptable else 'red'
         row.percent_to_target = f"{colors[formatter]}{row.percent_to_target} %{colors['reset']}"
-        printable.append(row.to_tuple())
+        printable.append(row.to_tuple(with_bytes))
 
     headers = ('relation', 'population size', 'target sample size',
                'final sample size',
                'dependencies', 'aproximate % to target',)
     column_alignment = ('left', 'right', 'right', 'right', 'center', 'right',)
+    if with_bytes:
+        headers += ('projected bytes', 'actual bytes',)
+        column_alignment += ('right', 'right',)
     title = 'ANALYZE' if analyze else 'RUN'
     message_top = f"\n\n{title} RESULTS:\n\n"
+    message_bottom = f"\npeak memory: {peak_rss_bytes / 1024 ** 2:.1f} MB\n" if peak_rss_bytes is not None else ''
     return message_top + \
-        tabulate(printable, headers, colalign=column_alignment) + "\n"
+        tabulate(printable, headers, colalign=column_alignment) + "\n" + message_bottom
 
 
 def format_set_of_available_images(imageset: iter) -> str:
@@ -1,21 +1,23 @@
 import re
 import time
 from pathlib import Path
-from typing import Optional, TextIO, Union
+from typing import Dict, List, Optional, Set, TextIO, Union
 
 import logging
 
+from snowshu.core import tracing
 from snowshu.core.configuration_parser import (Configuration,
                                                ConfigurationParser)
 from snowshu.core.graph import SnowShuGraph
 from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.plan import ExecutionPlan, replica_file_hash
 from snowshu.core.printable_result import (graph_to_result_list,
                                            printable_result)
 from snowshu.logger import duration
 from snowshu.configs import DEFAULT_RETRY_COUNT
-from snowshu.core.models.relation import alter_relation_case
+from snowshu.core.models.relation import Relation, alter_relation_case
 from snowshu.exceptions import UnableToExecuteCopyReplicaCommand
-from snowshu.core.utils import remove_dangling_replica_containers
+from snowshu.core.utils import peak_rss_bytes, remove_dangling_replica_containers
 
 logger = logging.getLogger(__name__)
 
@@ -27,31 +29,121 @@ class ReplicaFactory:
         self.config: Optional[Configuration] = None
         self.run_analyze: Optional[bool] = None
         self.incremental: Optional[str] = None
+        self.refresh: bool = False
         self.retry_count: Optional[int] = DEFAULT_RETRY_COUNT
+        self.replica_file_hash: Optional[str] = None
+        self.report_path: Optional[Union[Path, str]] = None
+        self.trace_path: Optional[Union[Path, str]] = None
 
     def create(self,
                name: Optional[str],
                barf: bool,
-               retry_count: Optional[int] = DEFAULT_RETRY_COUNT) -> Optional[str]:
+               retry_count: Optional[int] = DEFAULT_RETRY_COUNT,
+               plan: Optional[Union[Path, str]] = None) -> Optional[str]:
         self.run_analyze = False
         if retry_count:
             self.retry_count = retry_count
-        return self._execute(name=name, barf=barf)
+        return self._traced_execute(name=name, barf=barf, plan=plan)
 
     def analyze(self, barf: bool, retry_count: int) -> None:
         self.run_analyze = True
         self.retry_count = retry_count
-        return self._execute(barf=barf)
+        return self._traced_execute(barf=barf)
+
+    def plan(self, path: Union[Path, str]) -> str:
+        """Builds the graph, compiles every relation and stores the resulting execution plan at path."""
+        graph = SnowShuGraph()
+        graph.build_graph(self.config)
+        start_timer = time.time()
+        plan = ExecutionPlan.build(graph,
+                                   self.config.source_profile.adapter,
+                                   self.replica_file_hash)
+        plan.save(path)
+        logger.info('Execution plan built in %s.', duration(start_timer))
+        estimated_bytes = sum(step['estimated_bytes'] or 0 for step in plan.steps)
+        return (f"Execution plan for {len(plan.steps)} relations in "
+                f"{len(graph.get_connected_subgraphs())} graphs "
+                f"(~{estimated_bytes} bytes) written to {path}.")
+
+    def _load_plan_graph(self, path: Union[Path, str]) -> Optional[SnowShuGraph]:
+        """Loads the graph of a stored execution plan, or None if the replica file changed since planning."""
+        plan = ExecutionPlan.load(path, self.config)
+        if plan.replica_file_hash != self.replica_file_hash:
+            logger.warning('Replica file changed since execution plan %s was built, '
+                           'ignoring the plan and building the graph from the source catalog.', path)
+            return None
+        logger.info('Using execution plan %s built at %s, skipping catalog discovery.', path, plan.created_at)
+        graph = SnowShuGraph()
+        graph.graph = plan.graph
+        return graph
+
+    @staticmethod
+    def _loaded_fingerprints(relations: List[Relation],
+                             stored: Dict[str, str],
+                             current: Dict[str, str]) -> Dict[str, str]:
+        """Merges the current fingerprints of the loaded relations into the stored ones.
+
+        Relations of the run that were not loaded lose their stored fingerprint, so the next refresh
+        samples them again.
+        """
+        attempted = {relation.dot_notation for relation in relations}
+        fingerprints = {dot_notation: fingerprint for dot_notation, fingerprint in stored.items()
+                        if dot_notation not in attempted}
+        fingerprints.update({relation.dot_notation: current[relation.dot_notation] for relation in relations
+                             if relation.target_loaded and current.get(relation.dot_notation) is not None})
+        return fingerprints
+
+    def _refresh_fingerprints(self,
+                              graph: SnowShuGraph,
+                              target_catalog: Set[Relation],
+                              stored: Dict[str, str]) -> Dict[str, str]:
+        """Reduces the graph to the relations with changed source data since the incremental image was built.
+
+        Relations are compared on the source change fingerprints stored in the image. Relations missing from
+        the image or without a fingerprint count as changed.
+
+        Returns:
+            the current source fingerprints of the graph relations.
+        """
+        current = self.config.source_profile.adapter.get_change_fingerprints(graph.graph.nodes)
+        changed = {relation for relation in graph.graph.nodes
+                   if relation not in target_catalog
+                   or current.get(relation.dot_notation) is None
+                   or stored.get(relation.dot_notation) != current[relation.dot_notation]}
+        logger.info('Found %s of %s relations changed since the incremental image was built.',
+                    len(changed), len(graph.graph))
+        graph.graph = SnowShuGraph.refresh_difference(graph.graph, changed)
+        if len(graph.graph) > len(changed):
+            logger.info('Sampling %s relations again, including downstream relations of the changed ones.',
+                        len(graph.graph))
+        return current
+
+    def _traced_execute(self, **kwargs) -> Optional[str]:
+        """Executes the run, recording a trace of it when a trace path is set."""
+        if self.trace_path is None:
+            return self._execute(**kwargs)
+        tracing.tracer.start()
+        try:
+            with tracing.span('analyze' if self.run_analyze else 'create', 'run', replica=self.config.name):
+                return self._execute(**kwargs)
+        finally:
+            tracing.tracer.stop()
+            tracing.tracer.write(self.trace_path)
 
     def _execute(self,
                  barf: bool = False,
-                 name: Optional[str] = None) -> Optional[str]:
-        graph = SnowShuGraph()
+                 name: Optional[str] = None,
+                 plan: Optional[Union[Path, str]] = None) -> Optional[str]:
         if name is not None:
             self.config.name = name
 
-        graph.build_graph(self.config)
+        graph = self._load_plan_graph(plan) if plan is not None else None
+        if graph is None:
+            graph = SnowShuGraph()
+            graph.build_graph(self.config)
 
+        stored: Dict[str, str] = dict()
+        current: Dict[str, str] = dict()
         if self.incremental:
             # TODO replica container should not be started for analyze commands
 
@@ -68,22 +160,43 @@ class ReplicaFactory:
                 case_function=self.config.source_profile.adapter._correct_case)  # noqa pylint: disable=protected-access
             incremental_target_catalog_casted = set(map(apply_source_case, incremental_target_catalog))
 
-            graph.graph = SnowShuGraph.catalog_difference(graph.graph,
-                                                          incremental_target_catalog_casted)
+            stored = self.config.target_profile.adapter.get_relation_fingerprints()
+            if self.refresh:
+                current = self._refresh_fingerprints(graph, incremental_target_catalog_casted, stored)
+            else:
+                graph.graph = SnowShuGraph.catalog_difference(graph.graph,
+                                                              incremental_target_catalog_casted)
 
         graphs = graph.get_connected_subgraphs()
         if len(graphs) < 1:
-            args = (' new ', ' incremental ', '; image up-to-date') if self.incremental else (' ', ' ', '')
+            args = ((' new or changed ' if self.refresh else ' new ', ' incremental ', '; image up-to-date')
+                    if self.incremental else (' ', ' ', ''))
             message = "No{}relations found per provided{}replica configuration{}, exiting.".format(*args)  # noqa: pylint: disable=consider-using-f-string
             remove_dangling_replica_containers()
             return message
 
+        if not self.run_analyze and not (self.incremental and self.refresh):
+            # taken before sampling, so data changed while sampling shows up in the next refresh
+            current = self.config.source_profile.adapter.get_change_fingerprints(graph.graph.nodes)
+
         if not self.config.target_profile.adapter.container:
             # TODO replica container should not be started for analyze commands
             self.config.target_profile.adapter.initialize_replica(
                 self.config.source_profile.name)
 
-        runner = GraphSetRunner()
+        runner = GraphSetRunner(max_allowed_bytes=self.config.max_allowed_bytes,
+                                key_tables=self.config.key_tables,
+                                max_memory_bytes=self.config.max_memory_bytes,
+                                source_concurrency=self.config.source_concurrency,
+                                target_concurrency=self.config.target_concurrency,
+                                transform_processes=self.config.processes,
+                                async_queries=self.config.async_queries,
+                                partition_min_rows=self.config.partition_min_rows,
+                                partitions=self.config.partitions,
+                                isolated_batch_size=self.config.isolated_batch_size,
+                                batch_fetch_max_rows=self.config.batch_fetch_max_rows,
+                                sample_store=self.config.sample_store,
+                                collect_report=self.report_path is not None)
         runner.execute_graph_set(graphs,
                                  self.config.source_profile.adapter,
                                  self.config.target_profile.adapter,
@@ -91,6 +204,8 @@ class ReplicaFactory:
                                  retry_count=self.retry_count,
                                  analyze=self.run_analyze,
                                  barf=barf)
+        if self.report_path is not None:
+            runner.run_report.write(self.report_path)
         if not self.run_analyze:
             relations = [relation for graph in graphs for relation in graph.nodes]
             if self.config.source_profile.adapter.SUPPORTS_CROSS_DATABASE:
@@ -98,6 +213,8 @@ class ReplicaFactory:
                 self.config.target_profile.adapter.enable_cross_database()
                 logger.info('X-database enabled.')
             self.config.target_profile.adapter.create_all_database_extensions()
+            self.config.target_profile.adapter.store_relation_fingerprints(
+                self._loaded_fingerprints(relations, stored, current))
 
             logger.info(
                 'Applying %s emulation functions to target...',
@@ -118,7 +235,8 @@ class ReplicaFactory:
 
         return printable_result(
             graph_to_result_list(graphs),
-            self.run_analyze)
+            self.run_analyze,
+            peak_rss_bytes=peak_rss_bytes())
 
     def load_config(self,
                     config: Union[Path, str, TextIO],
@@ -127,6 +245,7 @@ class ReplicaFactory:
         object usable."""
         logger.info('Loading configuration...')
         start_timer = time.time()
+        self.replica_file_hash = replica_file_hash(config)
         self.config = ConfigurationParser().from_file_or_path(config)
         self.config.target_profile.adapter.target_arch = target_arch
         logger.info('Configuration loaded in %s.', duration(start_timer))
@@ -0,0 +1,250 @@
+import json
+import numbers
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, Optional, TypeVar, Union
+import logging
+
+from snowshu.core import utils
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('schema_generation',
+          'population_count',
+          'prepare',
+          'compile',
+          'temp_table',
+          'memory_wait',
+          'count_check',
+          'fetch',
+          'sanitize',
+          'load',
+          'partitioned_transfer',)
+
+# relations fetched in parallel partitions record from several threads
+_metrics_lock = threading.Lock()
+
+# the metrics of the relation processed by the current thread, and the phase it is in
+_current_metrics: ContextVar[Optional['RelationMetrics']] = ContextVar('snowshu_relation_metrics', default=None)
+_current_phase: ContextVar[Optional[str]] = ContextVar('snowshu_relation_phase', default=None)
+# if the report the current relation records into is written out at the end of the run
+_recording: ContextVar[bool] = ContextVar('snowshu_recording', default=False)
+
+T = TypeVar('T')
+
+
+@dataclass
+class RelationMetrics:
+    """The timings and volumes of processing a single relation.
+
+    Phase times add up over every attempt at the relation. Retries count both the
+    retried source queries and the attempts at the relation after the first.
+    """
+    relation: str
+    phases: Dict[str, float] = field(default_factory=dict)
+    rows: Optional[int] = None
+    bytes: Optional[int] = None
+    retries: int = 0
+    attempts: int = 0
+    status: str = 'running'
+
+    def add_phase(self, phase: str, seconds: float) -> None:
+        with _metrics_lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_bytes(self, nbytes: int) -> None:
+        with _metrics_lock:
+            self.bytes = (self.bytes or 0) + nbytes
+
+    @property
+    def seconds(self) -> float:
+        return sum(self.phases.values())
+
+    def to_dict(self) -> dict:
+        metrics = asdict(self)
+        metrics['phases'] = {phase_name: round(self.phases[phase_name], 6)
+                             for phase_name in PHASES if phase_name in self.phases}
+        metrics['seconds'] = round(self.seconds, 6)
+        return metrics
+
+
+class RunReport:
+    """Collects the per relation metrics of a replica build, safe to share between threads.
+
+    The runner opens :meth:`relation` around the processing of every relation; anything called
+    within it, in the same thread, records into the metrics of that relation with :func:`phase`,
+    :func:`record_bytes` and :func:`record_retry`.
+
+    Args:
+        collected: if the report is written out, measurements only made for the report
+            (see :func:`recording`) are skipped otherwise.
+    """
+
+    def __init__(self, collected: bool = True):
+        self.collected = collected
+        self.relations: Dict[str, RelationMetrics] = dict()
+        self.created_at = datetime.now()
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def relation(self, relation: 'Relation', resume: bool = False) -> Iterator[RelationMetrics]:
+        """Records into the metrics of the relation within the block.
+
+        Args:
+            relation: the relation processed within the block.
+            resume: the block continues the last attempt at the relation rather than starting a new one.
+                Blocks that leave the relation to be resumed later set its status to something else
+                than running, so it is not reported as a success yet.
+        """
+        with self.lock:
+            metrics = self.relations.setdefault(relation.dot_notation, RelationMetrics(relation.dot_notation))
+        if not resume:
+            metrics.attempts += 1
+            if metrics.attempts > 1:
+                metrics.retries += 1
+            # loaded bytes are counted again on every attempt
+            metrics.bytes = None
+        metrics.status = 'running'
+        token = _current_metrics.set(metrics)
+        recording_token = _recording.set(self.collected)
+        try:
+            yield metrics
+            if metrics.status == 'running':
+                metrics.status = 'success'
+        except BaseException:
+            metrics.status = 'failed'
+            raise
+        finally:
+            _current_metrics.reset(token)
+            _recording.reset(recording_token)
+            # views have no sample size
+            sample_size = getattr(relation, 'sample_size', None)
+            if isinstance(sample_size, numbers.Integral):
+                metrics.rows = int(sample_size)
+
+    def to_jsonl(self) -> str:
+        return ''.join(json.dumps(metrics.to_dict()) + '\n' for metrics in self.relations.values())
+
+    def to_prometheus(self) -> str:
+        """The metrics in the Prometheus text exposition format, for the node exporter textfile collector."""
+        lines = list()
+
+        def family(name: str, help_text: str, samples: list) -> None:
+            lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} gauge"])
+            lines.extend(f"{name}{{{_labels(labels)}}} {value}" if labels else f"{name} {value}"
+                         for labels, value in samples)
+
+        relations = self.relations.values()
+        family('snowshu_relation_phase_seconds',
+               'Wall time spent in a phase of processing a relation.',
+               [(dict(relation=metrics.relation, phase=phase_name), round(metrics.phases[phase_name], 6))
+                for metrics in relations for phase_name in PHASES if phase_name in metrics.phases])
+        family('snowshu_relation_seconds',
+               'Wall time spent processing a relation.',
+               [(dict(relation=metrics.relation), round(metrics.seconds, 6)) for metrics in relations])
+        family('snowshu_relation_rows',
+               'Rows sampled for a relation.',
+               [(dict(relation=metrics.relation), metrics.rows) for metrics in relations if metrics.rows is not None])
+        family('snowshu_relation_bytes',
+               'In memory bytes of the sample loaded into the target for a relation.',
+               [(dict(relation=metrics.relation), metrics.bytes) for metrics in relations
+                if metrics.bytes is not None])
+        family('snowshu_relation_retries',
+               'Retried source queries and attempts at a relation.',
+               [(dict(relation=metrics.relation), metrics.retries) for metrics in relations])
+        family('snowshu_relation_success',
+               'Whether the last attempt at a relation succeeded.',
+               [(dict(relation=metrics.relation), int(metrics.status == 'success')) for metrics in relations])
+        family('snowshu_run_timestamp_seconds',
+               'Time the replica build started.',
+               [(dict(), round(self.created_at.timestamp(), 3))])
+        peak_rss_bytes = utils.peak_rss_bytes()
+        if peak_rss_bytes is not None:
+            family('snowshu_run_peak_rss_bytes',
+                   'Peak resident memory of the replica build process.',
+                   [(dict(), peak_rss_bytes)])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: Union[Path, str]) -> None:
+        """Writes the report as ``<path>.jsonl`` and ``<path>.prom``."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for suffix, content in (('.jsonl', self.to_jsonl()), ('.prom', self.to_prometheus())):
+            report_file = path.with_name(path.name + suffix)
+            # the textfile collector may read at any time, only complete files are moved into place
+            temp_file = report_file.with_name(report_file.name + '.tmp')
+            temp_file.write_text(content, encoding='utf-8')
+            temp_file.replace(report_file)
+        logger.info(f"Run report of {len(self.relations)} relations written to {path}.jsonl and {path}.prom.")
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    def escape(value: str) -> str:
+        return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(str(value))}"' for key, value in labels.items())
+
+
+def recording() -> bool:
+    """If a relation is being processed by this thread for a collected report, to skip measurements nobody reads."""
+    return _recording.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Adds the wall time of the block to the phase of the relation processed by this thread, if any.
+
+    Phases do not nest, a block within another phase counts towards the outer one only. The count
+    and fetch of a population count query belong to the population count, not to the count check
+    and fetch phases.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or _current_phase.get() is not None:
+        yield
+        return
+    token = _current_phase.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, time.perf_counter() - start)
+        _current_phase.reset(token)
+
+
+def timed_iter(name: str, iterable: Iterable[T]) -> Iterator[T]:
+    """Yields from the iterable, adding the time spent producing every item to the phase."""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def current_phase() -> Optional[str]:
+    """The phase this thread is in, if any."""
+    return _current_phase.get()
+
+
+def record_bytes(nbytes: int) -> None:
+    """Adds to the loaded bytes of the relation processed by this thread, if any."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_bytes(nbytes)
+
+
+def record_retry() -> None:
+    """Counts a retried source query against the relation processed by this thread, if any."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        with _metrics_lock:
+            metrics.retries += 1
@@ -0,0 +1,121 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING
+import logging
+
+import pandas as pd
+
+from snowshu.configs import DEFAULT_INSERT_CHUNK_SIZE
+from snowshu.core import tracing
+from snowshu.core.models import Relation
+from snowshu.core.run_report import phase, timed_iter
+from snowshu.exceptions import TooManyRecords
+from snowshu.storages import SpillFile
+
+if TYPE_CHECKING:
+    from snowshu.core.graph_set_runner import GraphExecutable
+
+logger = logging.getLogger(__name__)
+
+
+class SampleTransferMixin:
+    """Moves samples too large to fetch in one frame from the source into the target, for the
+    :class:`GraphSetRunner <snowshu.core.graph_set_runner.GraphSetRunner>`.
+
+    Large relations are transferred as hash partitions in parallel, and samples over the memory
+    limit are spilled to local disk.
+    """
+
+    @staticmethod
+    def _count_sample(relation: Relation, executable: 'GraphExecutable') -> int:
+        """ Counts the rows of the temp table of a sampled relation, raising when over the max allowed rows """
+        with phase('count_check'):
+            count = int(executable.source_adapter.scalar_query(
+                f"SELECT COUNT(*) FROM {relation.temp_dot_notation}"))
+        if count > relation.sampling.max_allowed_rows:
+            raise TooManyRecords(
+                f"failed to execute query, result would have returned {count} rows "
+                f"but the max allowed rows for this type of query is {relation.sampling.max_allowed_rows}.")
+        return count
+
+    def _transfer_partitioned(self, relation: Relation, query: str, executable: 'GraphExecutable') -> int:
+        """ Moves the rows of a query into the target relation as disjoint hash partitions transferred in parallel
+
+            Every partition is streamed from its own source connection and appended to the target relation on
+            its own target connection, for postgres as concurrent COPY streams into the same table.
+
+            Returns:
+                the number of rows transferred.
+        """
+        source_adapter, target_adapter = executable.source_adapter, executable.target_adapter
+        logger.info(f"Transferring relation {relation.dot_notation} into "
+                    f"{target_adapter.quoted_dot_notation(relation)} in {self.partitions} partitions...")
+
+        def transfer(partition: int) -> int:
+            rows = 0
+            with tracing.span(f"partition {partition}", 'partition'):
+                for chunk in source_adapter.stream_query(
+                        source_adapter.partition_statement(query, self.partitions, partition),
+                        DEFAULT_INSERT_CHUNK_SIZE):
+                    target_adapter.load_data_into_relation(relation, chunk, if_exists='append')
+                    rows += len(chunk)
+            return rows
+
+        try:
+            # the partitions append to the relation, created empty beforehand
+            target_adapter.load_data_into_relation(
+                relation, pd.DataFrame(columns=[attribute.name for attribute in relation.attributes]))
+            with phase('partitioned_transfer'), \
+                    ThreadPoolExecutor(max_workers=self.partitions, thread_name_prefix='snowshu_partition') as executor:
+                futures = [executor.submit(tracing.propagate(transfer), partition)
+                           for partition in range(self.partitions)]
+                rows = sum(future.result() for future in futures)
+        except Exception as exc:
+            raise SystemError(
+                f"Failed to transfer relation {relation.dot_notation} into target "
+                f"{target_adapter.quoted_dot_notation(relation)} in partitions: {exc}"
+            ) from exc
+        logger.info(f"{rows} records transferred for relation {relation.dot_notation}.")
+        return rows
+
+    @staticmethod
+    def _spill_sample(relation: Relation, executable: 'GraphExecutable') -> None:
+        """ Moves a sample from the source into the target through Parquet files on local disk, a chunk at a time
+
+            Spilled samples are not kept in the sample store.
+        """
+        fetch_query = f"SELECT * FROM {relation.temp_dot_notation}"
+        with tempfile.TemporaryDirectory(prefix='snowshu_spill_') as spill_directory:
+            spill = SpillFile(Path(spill_directory) / 'sample.parquet')
+            try:
+                SampleTransferMixin._count_sample(relation, executable)
+                relation.sample_size = spill.write(
+                    timed_iter('fetch', executable.source_adapter.stream_query(fetch_query,
+                                                                               DEFAULT_INSERT_CHUNK_SIZE)))
+                logger.info(
+                    f"{relation.sample_size} records spilled for relation {relation.dot_notation}."
+                )
+            except Exception as exc:
+                raise SystemError(
+                    f"Failed to retrieve records from source {relation.temp_dot_notation} "
+                    f"with query: {fetch_query} "
+                    f"issue details: {exc}"
+                ) from exc
+            logger.info(
+                f"Inserting relation {executable.target_adapter.quoted_dot_notation(relation)}"
+                " into target..."
+            )
+            try:
+                if relation.sample_size:
+                    executable.target_adapter.stream_data_into_relation(relation,
+                                                                        spill.read(DEFAULT_INSERT_CHUNK_SIZE))
+                else:
+                    executable.target_adapter.load_data_into_relation(
+                        relation, pd.DataFrame(columns=[attribute.name for attribute in relation.attributes]))
+            except Exception as exc:
+                raise SystemError(
+                    "Failed to load relation "
+                    f"{executable.target_adapter.quoted_dot_notation(relation)} "
+                    f" into target: {exc}"
+                ) from exc
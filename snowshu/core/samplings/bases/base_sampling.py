@@ -1,13 +1,21 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
+import logging
+import math
 
 if TYPE_CHECKING:
     from snowshu.adapters.source_adapters import BaseSourceAdapter
     from snowshu.core.models.relation import Relation
+    from snowshu.samplings.samplings.recent_window_sampling import TimeWindow
+
+logger = logging.getLogger(__name__)
 
 
 class BaseSampling:
     """Base class for all executable sampling classes.
     """
+    max_allowed_bytes: Optional[int] = None
+    # restricts the relation to a time window before sampling, see RecentWindowSampling
+    window: Optional["TimeWindow"] = None
 
     def sample_method(self):
         raise NotImplementedError()
@@ -30,3 +38,42 @@ class BaseSampling:
                                 instance to use for executing prepare queries.
         """
         raise NotImplementedError()
+
+    def cap_to_byte_budget(self,
+                           relation: "Relation",
+                           source_adapter: "BaseSourceAdapter",
+                           size: int) -> int:
+        """Lowers a sample size to fit the byte budgets of the sampling and of the relation.
+
+        The row width is estimated from the source storage metadata, the projected bytes
+        of the sample are stored in ``relation.projected_bytes``. Nothing is queried when
+        neither budget is set.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` being sampled.
+            source_adapter: The source adapter to read the storage metadata with.
+            size: The sample size in rows before the byte budgets are applied.
+
+        Returns:
+            The sample size in rows fitting the budgets.
+        """
+        budgets = [budget for budget in (self.max_allowed_bytes, relation.max_allowed_bytes)
+                   if budget is not None]
+        if not budgets:
+            return size
+
+        row_bytes = source_adapter.scalar_query(
+            source_adapter.average_row_bytes_statement(relation))
+        row_bytes = None if row_bytes is None else float(row_bytes)
+        if row_bytes is None or math.isnan(row_bytes) or row_bytes <= 0:
+            logger.debug("No storage metadata to estimate the row width of %s, byte budget not applied.",
+                         relation.dot_notation)
+            return size
+
+        capped_size = min(size, int(min(budgets) // row_bytes))
+        if capped_size < size:
+            logger.info("Sample of %s lowered from %s to %s rows to fit a byte budget of %s bytes "
+                        "(~%s bytes per row).", relation.dot_notation, size, capped_size, min(budgets),
+                        int(row_bytes))
+        relation.projected_bytes = int(capped_size * row_bytes)
+        return capped_size
@@ -0,0 +1,126 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar('F', bound=Callable[..., Any])
+
+# the span open in the current thread, spans opened within it are its children
+_current_span: ContextVar[Optional[int]] = ContextVar('snowshu_span', default=None)
+
+
+class Tracer:
+    """Records nested, timed spans from any thread, exported as a Chrome trace.
+
+    Spans are only recorded between :meth:`start` and :meth:`stop`, a disabled tracer
+    costs a context variable lookup per span. The trace opens in ``chrome://tracing``
+    or `Perfetto <https://ui.perfetto.dev>`_, with a row per thread.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events: List[dict] = list()
+        self.threads: Dict[int, str] = dict()
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self._ids = itertools.count(1)
+
+    def start(self) -> None:
+        with self.lock:
+            self.events = list()
+            self.threads = dict()
+            self.origin = time.perf_counter()
+            self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    @contextmanager
+    def span(self, name: str, category: str, **args) -> Iterator[None]:
+        """Records the block as a span, a child of the span open in this thread if any."""
+        if not self.enabled:
+            yield
+            return
+        span_id = next(self._ids)
+        parent_id = _current_span.get()
+        token = _current_span.set(span_id)
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            args['error'] = f"{exc.__class__.__name__}: {exc}"
+            raise
+        finally:
+            end = time.perf_counter()
+            _current_span.reset(token)
+            thread = threading.current_thread()
+            event = dict(name=name,
+                         cat=category,
+                         ph='X',
+                         ts=round((start - self.origin) * 1e6, 3),
+                         dur=round((end - start) * 1e6, 3),
+                         pid=os.getpid(),
+                         tid=thread.native_id,
+                         args=dict(span_id=span_id, parent_id=parent_id, **args))
+            with self.lock:
+                self.events.append(event)
+                self.threads.setdefault(thread.native_id, thread.name)
+
+    def to_chrome_trace(self) -> dict:
+        """The spans in the Chrome trace event format, with the thread names as metadata."""
+        with self.lock:
+            metadata = [dict(name='thread_name', ph='M', pid=os.getpid(), tid=tid, args=dict(name=name))
+                        for tid, name in self.threads.items()]
+            events = sorted(self.events, key=lambda event: event['ts'])
+        return dict(traceEvents=metadata + events, displayTimeUnit='ms')
+
+    def write(self, path: Union[Path, str]) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        trace = self.to_chrome_trace()
+        path.write_text(json.dumps(trace), encoding='utf-8')
+        logger.info(f"Trace of {len(trace['traceEvents'])} events written to {path}.")
+
+
+tracer = Tracer()
+
+
+def span(name: str, category: str, **args) -> Any:
+    """Records the block as a span of the module tracer."""
+    return tracer.span(name, category, **args)
+
+
+def traced(category: str, name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorates a function to record every call as a span, named after the function by default."""
+    def decorator(func: F) -> F:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def propagate(func: F) -> F:
+    """Binds the function to the current span, for functions submitted to other threads.
+
+    Threads of a pool do not inherit the context they are submitted from, so without it
+    their spans would not be children of the submitting span.
+    """
+    context = copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,103 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional, TypeVar, Union
+import logging
+
+import pandas as pd
+import pyarrow as pa
+from pandas.api.types import infer_dtype
+
+from snowshu.configs import TRANSFORM_MIN_ROWS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# the transformer of the run, for the current thread and the threads it propagates to
+_transformer: ContextVar[Optional['FrameTransformer']] = ContextVar('snowshu_transformer', default=None)
+
+
+class FrameTransformer:
+    """Runs CPU bound transformations of frames in worker processes, so loading threads do not contend for the GIL.
+
+    Frames travel to the workers as Arrow IPC streams when their object columns all hold strings, the
+    common case for frames fetched from a source, and pickled otherwise. Workers are spawned on the first
+    transformation, rather than forked from a process running threads.
+
+    Args:
+        processes: the number of worker processes.
+        min_rows: frames with fewer rows are transformed in the calling thread, shipping them costs more.
+    """
+
+    def __init__(self, processes: int, min_rows: int = TRANSFORM_MIN_ROWS):
+        self.processes = processes
+        self.min_rows = min_rows
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def offloads(self, frame: pd.DataFrame) -> bool:
+        return len(frame) >= self.min_rows
+
+    def apply(self, func: Callable[[pd.DataFrame], T], frame: pd.DataFrame) -> T:
+        """Returns func(frame) computed in a worker process, func must be picklable."""
+        return self._get_executor().submit(_apply, func, to_ipc(frame)).result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                logger.debug(f"Starting {self.processes} frame transformation processes...")
+                self._executor = ProcessPoolExecutor(max_workers=self.processes,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+            return self._executor
+
+
+def to_ipc(frame: pd.DataFrame) -> Union[pa.Buffer, pd.DataFrame]:
+    """Serializes a frame as an Arrow IPC stream, or returns it as is when Arrow would not round trip its values."""
+    object_columns = frame.select_dtypes(include='object').columns
+    if all(infer_dtype(frame[column], skipna=True) in ('string', 'empty',) for column in object_columns):
+        try:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return sink.getvalue()
+        except (pa.ArrowException, ValueError):
+            pass
+    return frame
+
+
+def from_ipc(payload: Union[pa.Buffer, pd.DataFrame]) -> pd.DataFrame:
+    if isinstance(payload, pd.DataFrame):
+        return payload
+    return pa.ipc.open_stream(payload).read_all().to_pandas()
+
+
+def _apply(func: Callable[[pd.DataFrame], Any], payload: Union[pa.Buffer, pd.DataFrame]) -> Any:
+    return func(from_ipc(payload))
+
+
+@contextmanager
+def bind(transformer: Optional[FrameTransformer]) -> Iterator[None]:
+    """Offloads the frame transformations of the current thread to the transformer.
+
+    Threads started with :func:`snowshu.core.tracing.propagate` offload to it too.
+    """
+    token = _transformer.set(transformer)
+    try:
+        yield
+    finally:
+        _transformer.reset(token)
+
+
+def current() -> Optional[FrameTransformer]:
+    """The transformer bound to the current thread, if any."""
+    return _transformer.get()
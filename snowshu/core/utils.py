@@ -1,5 +1,6 @@
 import os
 import re
+import sys
 import uuid
 from importlib import import_module
 from pathlib import Path
@@ -137,3 +138,14 @@ def generate_unique_uuid(is_upper: bool = True) -> str:
     """Generates a unique name based on name and randomly generated uuid."""
     _uuid = str(uuid.uuid4()).rsplit('-', maxsplit=1)[-1]
     return _uuid.upper() if is_upper else _uuid
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """ Returns the peak resident memory of the current process in bytes, or None where it cannot be read """
+    try:
+        import resource  # noqa pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # reported in kilobytes everywhere but macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
@@ -6,6 +6,7 @@ from typing import Optional
 
 from coloredlogs import ColoredFormatter
 
+from snowshu.core import concurrency, run_report
 from snowshu.formats import (LOGGING_CLI_FORMAT, LOGGING_CLI_WARNING_FORMAT,
                              LOGGING_DATE_FORMAT, LOGGING_FILE_FORMAT)
 
@@ -66,6 +67,8 @@ class Logger:
 
     def log_retries(self, retry_state):
         """ Function for passing to tenacity.retry decorator. """
+        run_report.record_retry()
+        concurrency.record_congestion()
         logging.getLogger('snowshu').warning('Retrying %s: attempt %s ended with: %s',
                                              retry_state.fn.__qualname__,
                                              retry_state.attempt_number,
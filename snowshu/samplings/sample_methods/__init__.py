@@ -1 +1,4 @@
 from .bernoulli_sample_method import BernoulliSampleMethod
+from .hash_sample_method import HashSampleMethod
+from .stratified_sample_method import StratifiedSampleMethod
+from .system_sample_method import SystemSampleMethod
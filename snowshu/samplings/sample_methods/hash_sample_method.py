@@ -0,0 +1,40 @@
+from typing import Optional
+
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class HashSampleMethod(BaseSampleMethod):
+    """Deterministic sample selection on a stable hash of a key.
+
+    Rows are kept when the hash of ``key`` lands in the first ``probability`` share of ``buckets``.
+    The same key value always lands in the same bucket, so relations sampled on the same key domain
+    select matching rows independently of each other.
+
+    Args:
+        probability: the share of hash buckets to keep, from 0.0 to 1.0
+        key: the attribute to hash. Default ``None`` hashes the entire row
+        buckets: the number of hash buckets the keys are spread over. Default 10000
+
+    Example:
+        ``HashSampleMethod(0.1, key='USER_ID')`` keeps every row whose ``USER_ID`` hashes into the first 10% of buckets.
+    """
+    name = 'HASH'
+
+    def __init__(self,
+                 probability: float,
+                 key: Optional[str] = None,
+                 buckets: int = 10000):
+        assert 0 <= probability <= 1
+        self._probability = probability
+        self.key = key
+        self.buckets = buckets
+
+    @property
+    def probability(self) -> float:
+        return self._probability
+
+    @property
+    def threshold(self) -> int:
+        """The number of buckets kept, at least one for any probability above 0."""
+        kept = round(self._probability * self.buckets)
+        return max(1, kept) if self._probability > 0 else kept
@@ -0,0 +1,31 @@
+from typing import List
+
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class StratifiedSampleMethod(BaseSampleMethod):
+    """Sample selection drawing separately from every stratum of the population.
+
+    Each stratum (unique combination of the ``strata`` attribute values) keeps a random ``fraction`` of its rows,
+    but never fewer than ``min_per_stratum`` rows (or the whole stratum when it is smaller), so rare values are
+    always represented.
+
+    Args:
+        strata: the attributes the population is partitioned by
+        fraction: the share of each stratum to keep, from 0.0 to 1.0
+        min_per_stratum: the minimum number of rows kept from every stratum
+
+    Example:
+        ``StratifiedSampleMethod(['COUNTRY'], 0.01, 10)`` keeps 1% of the rows of every country,
+        and at least 10 rows each.
+    """
+    name = 'STRATIFIED'
+
+    def __init__(self,
+                 strata: List[str],
+                 fraction: float,
+                 min_per_stratum: int):
+        assert 0 <= fraction <= 1
+        self.strata = strata
+        self.fraction = fraction
+        self.min_per_stratum = min_per_stratum
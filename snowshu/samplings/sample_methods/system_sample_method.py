@@ -0,0 +1,26 @@
+from snowshu.core.samplings.bases.base_sample_method import BaseSampleMethod
+
+
+class SystemSampleMethod(BaseSampleMethod):
+    """Sample selection of whole storage blocks (micro-partitions) instead of individual rows.
+    `https://docs.snowflake.com/en/sql-reference/constructs/sample`
+
+    Only the selected blocks are scanned, which makes it much cheaper than row level sampling on very
+    large relations. Rows sharing a block are kept or dropped together, so a relation clustered on a
+    column yields a sample biased toward some values of that column.
+
+    Args:
+        probability: the % of blocks to keep, from 0 to 100
+
+    Example:
+        ``SystemSampleMethod(0.5)`` would give you a sample of aprox. 0.5% of the population size.
+    """
+    name = 'SYSTEM'
+
+    def __init__(self, probability: float):
+        assert 0 <= probability <= 100
+        self._probability = probability
+
+    @property
+    def probability(self) -> float:
+        return self._probability
@@ -1,2 +1,6 @@
+from .block_sampling import BlockSampling
 from .brute_force_sampling import BruteForceSampling
 from .default_sampling import DefaultSampling
+from .hash_sampling import HashSampling
+from .recent_window_sampling import RecentWindowSampling
+from .stratified_sampling import StratifiedSampling
@@ -0,0 +1,113 @@
+import logging
+from typing import TYPE_CHECKING, Optional
+from snowshu.configs import DEFAULT_BLOCK_SAMPLING_MIN_POPULATION, MAX_ALLOWED_ROWS
+
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import BernoulliSampleMethod, SystemSampleMethod
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class BlockSampling(BaseSampling):
+    """
+    Sampling using :class:`Cochrans <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>`
+    theorem for sample size, switching from :class:`Bernoulli
+    <snowshu.samplings.sample_methods.bernoulli_sample_method.BernoulliSampleMethod>` to block level
+    :class:`System <snowshu.samplings.sample_methods.system_sample_method.SystemSampleMethod>` sampling
+    for very large relations.
+
+    Block sampling only scans the sampled blocks instead of the whole relation, at the price of
+    a sample biased by how the relation is clustered.
+
+    Blocks can only be sampled from stored tables, so views and relations filtered by relationship
+    or time window constraints fall back to sampling ``size`` rows of the filtered population
+    (see :attr:`filtered_sample_method`).
+
+    Args:
+        margin_of_error: The acceptable error % expressed in a decimal from 0.01 to 0.10 (1% to 10%).
+            Default 0.02 (2%).
+        confidence: The confidence interval to be observed for the sample expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+        min_sample_size: The minimum number of records to retrieve from the population. Default 1000.
+        max_allowed_rows: The maximum number of records to retrieve from the population.
+        min_population: The population size from which block sampling is used. Default 100 million rows.
+        min_bytes: The relation size in bytes from which block sampling is used. Default ``None`` (not checked).
+        max_allowed_bytes: The maximum number of bytes to retrieve from the relation, estimated from the
+            source storage metadata. Default ``None`` (no byte budget).
+    """
+
+    size: int
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99,
+                 min_sample_size: int = 1000,
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 min_population: Optional[int] = DEFAULT_BLOCK_SAMPLING_MIN_POPULATION,
+                 min_bytes: Optional[int] = None,
+                 max_allowed_bytes: Optional[int] = None):
+        self.min_sample_size = min_sample_size
+        self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
+        self.min_population = min_population
+        self.min_bytes = min_bytes
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Runs all necessary pre-activities and instanciates the sample method.
+
+        Prepare will be called before primary query compile time, so it can be used
+        to do any necessary pre-compile activities (such as collecting a histogram from the relation).
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        self.size = min(max(self.sample_size_method.size(
+            relation.population_size),
+            self.min_sample_size), self.max_allowed_rows)
+        self.size = self.cap_to_byte_budget(relation, source_adapter, self.size)
+
+        if self._use_block_sampling(relation, source_adapter):
+            logger.warning("Block sampling %s. Rows are sampled together with the rest of their "
+                           "storage block, the sample may be biased by how the relation is clustered.",
+                           relation.dot_notation)
+            # SYSTEM sampling has no fixed row count, so the size becomes a % of the population
+            probability = max(round(100 * self.size / relation.population_size, 6), 0.000001)
+            self.sample_method = SystemSampleMethod(min(probability, 100))
+        else:
+            self.sample_method = self.filtered_sample_method
+
+    @property
+    def filtered_sample_method(self) -> BernoulliSampleMethod:
+        """The row level sample method used once the relation is filtered.
+
+        The filtered rows are no longer stored blocks, and a % of the whole population would
+        under sample them, so ``size`` rows are drawn from the filtered population instead.
+        """
+        return BernoulliSampleMethod(self.size, units='rows')
+
+    def _use_block_sampling(self,
+                            relation: "Relation",
+                            source_adapter: "BaseSourceAdapter") -> bool:
+        if relation.is_view or not relation.population_size:
+            return False
+        large_population = self.min_population is not None and relation.population_size >= self.min_population
+        if not large_population and self.min_bytes is None:
+            return False
+        # views copied as tables have no storage of their own, so no bytes either
+        relation_bytes = source_adapter.scalar_query(
+            source_adapter.relation_bytes_statement(relation))
+        if relation_bytes is None:
+            return False
+        return large_population or relation_bytes >= self.min_bytes
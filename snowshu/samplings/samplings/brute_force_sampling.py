@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from snowshu.configs import MAX_ALLOWED_ROWS
 
 from snowshu.core.samplings.bases.base_sampling import BaseSampling
@@ -18,15 +18,19 @@ class BruteForceSampling(BaseSampling):
     Args:
         probability: The % sample size desired in decimal format from 0.01 to 0.99. Default 10%.
         min_sample_size: The minimum number of records to retrieve from the population. Default 1000.
+        max_allowed_bytes: The maximum number of bytes to retrieve from the relation, estimated from the
+            source storage metadata. Default ``None`` (no byte budget).
     """
     size: int
 
     def __init__(self,
                  probability: float = 0.10,
                  min_sample_size: int = 1000,
-                 max_allowed_rows: int = MAX_ALLOWED_ROWS):
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 max_allowed_bytes: Optional[int] = None):
         self.min_sample_size = min_sample_size
         self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
         self.sample_size_method = BruteForceSampleSize(probability)
 
     def prepare(self,
@@ -46,6 +50,7 @@ class BruteForceSampling(BaseSampling):
         self.size = min(max(self.sample_size_method.size(
             relation.population_size),
             self.min_sample_size), self.max_allowed_rows)
+        self.size = self.cap_to_byte_budget(relation, source_adapter, self.size)
 
         self.sample_method = BernoulliSampleMethod(self.size,
                                                    units='rows')
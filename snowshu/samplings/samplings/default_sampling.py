@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from snowshu.configs import MAX_ALLOWED_ROWS
 
 from snowshu.core.samplings.bases.base_sampling import BaseSampling
@@ -25,6 +25,8 @@ class DefaultSampling(BaseSampling):
             from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%). 
             `http://www.stat.yale.edu/Courses/1997-98/101/confint.htm`
         min_sample_size: The minimum number of records to retrieve from the population. Default 1000.
+        max_allowed_bytes: The maximum number of bytes to retrieve from the relation, estimated from the
+            source storage metadata. Default ``None`` (no byte budget).
     """ 
 
     size: int
@@ -33,9 +35,11 @@ class DefaultSampling(BaseSampling):
                  margin_of_error: float = 0.02,
                  confidence: float = 0.99,
                  min_sample_size: int = 1000,
-                 max_allowed_rows: int = MAX_ALLOWED_ROWS):
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 max_allowed_bytes: Optional[int] = None):
         self.min_sample_size = min_sample_size
         self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
         self.sample_size_method = CochransSampleSize(margin_of_error,
                                                      confidence)
 
@@ -56,6 +60,7 @@ class DefaultSampling(BaseSampling):
         self.size = max(self.sample_size_method.size(
                         relation.population_size),
                         self.min_sample_size)
+        self.size = self.cap_to_byte_budget(relation, source_adapter, self.size)
 
         self.sample_method = BernoulliSampleMethod(self.size,
                                                    units='rows')
@@ -0,0 +1,67 @@
+from typing import TYPE_CHECKING, Optional
+from snowshu.configs import MAX_ALLOWED_ROWS
+
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import HashSampleMethod
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class HashSampling(BaseSampling):
+    """
+    Deterministic sampling using a fixed % of :class:`hash buckets
+    <snowshu.samplings.sample_methods.hash_sample_method.HashSampleMethod>` of a key.
+
+    Repeated builds select the same rows. When a directional parent is hash sampled on the
+    attribute a relation references, the relation is constrained by the same hash instead of a
+    lookup against the sampled parent, so its sample query does not read the parent's temp table.
+    The parent still builds its temp table, and the relation is still sampled after it.
+
+    Args:
+        probability: The % of hash buckets to keep in decimal format from 0.01 to 0.99. Default 10%.
+        key: The attribute to hash, usually the key other relations reference. Default hashes the entire row.
+        buckets: The number of hash buckets. Default 10000.
+        max_allowed_rows: The maximum number of records to retrieve, lowers the % kept when needed.
+        max_allowed_bytes: The maximum number of bytes to retrieve, estimated from the source storage metadata.
+            Lowers the % kept when needed. Default ``None`` (no byte budget).
+    """
+    size: int
+
+    def __init__(self,
+                 probability: float = 0.10,
+                 key: Optional[str] = None,
+                 buckets: int = 10000,
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 max_allowed_bytes: Optional[int] = None):
+        self.probability = probability
+        self.key = key
+        self.buckets = buckets
+        self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Runs all necessary pre-activities and instanciates the sample method.
+
+        Prepare will be called before primary query compile time, so it can be used
+        to do any necessary pre-compile activities (such as collecting a histogram from the relation).
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to
+                use for executing prepare queries.
+        """
+        probability = self.probability
+        if relation.population_size:
+            size = min(int(relation.population_size * probability), self.max_allowed_rows)
+            size = self.cap_to_byte_budget(relation, source_adapter, size)
+            probability = min(probability, size / relation.population_size)
+        self.size = int(relation.population_size * probability)
+
+        self.sample_method = HashSampleMethod(probability,
+                                              key=self.key,
+                                              buckets=self.buckets)
@@ -0,0 +1,109 @@
+from typing import TYPE_CHECKING, Any, Optional
+from snowshu.configs import MAX_ALLOWED_ROWS
+
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+
+class TimeWindow:
+    """A window on a timestamp attribute, either the last ``days`` or the ``start`` to ``end`` range.
+
+    Args:
+        timestamp_attribute: the attribute the window is applied to, usually the one the relation is clustered by.
+        days: the number of days back from the current timestamp to keep.
+        start: the inclusive lower bound of the range (date or timestamp).
+        end: the exclusive upper bound of the range (date or timestamp).
+    """
+
+    def __init__(self,
+                 timestamp_attribute: str,
+                 days: Optional[int] = None,
+                 start: Optional[Any] = None,
+                 end: Optional[Any] = None):
+        if (days is None) == (start is None and end is None):
+            raise ValueError("A time window needs either days or a start / end range.")
+        if days is not None and days <= 0:
+            raise ValueError(f"A time window needs a positive number of days, got {days}.")
+        self.timestamp_attribute = timestamp_attribute
+        self.days = days
+        # yaml loads unquoted dates as date objects
+        self.start, self.end = [None if bound is None else str(bound) for bound in (start, end)]
+
+    def __repr__(self) -> str:
+        if self.days is not None:
+            return f"<TimeWindow {self.timestamp_attribute} last {self.days} days>"
+        return f"<TimeWindow {self.timestamp_attribute} from {self.start} to {self.end}>"
+
+
+class RecentWindowSampling(BaseSampling):
+    """
+    Sampling restricted to a :class:`TimeWindow <snowshu.samplings.samplings.recent_window_sampling.TimeWindow>`,
+    using :class:`Cochrans <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>` theorem
+    on the rows of the window for sample size and :class:`Bernoulli
+    <snowshu.samplings.sample_methods.bernoulli_sample_method.BernoulliSampleMethod>` sampling.
+
+    The window is compiled into a predicate on the timestamp attribute next to the relationship predicates,
+    and the sample is drawn from the filtered rows. For relations clustered by the attribute the source
+    prunes the partitions outside the window instead of scanning all of history.
+
+    Args:
+        timestamp_attribute: The attribute to apply the window to.
+        days: Keep the rows of the last ``days`` days.
+        start: Keep the rows from ``start`` (inclusive), instead of ``days``.
+        end: Keep the rows until ``end`` (exclusive), instead of ``days``.
+        margin_of_error: The acceptable error % expressed in a decimal from 0.01 to 0.10 (1% to 10%).
+            Default 0.02 (2%).
+        confidence: The confidence interval to be observed for the sample expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+        min_sample_size: The minimum number of records to retrieve from the window. Default 1000.
+        max_allowed_rows: The maximum number of records to retrieve from the window.
+        max_allowed_bytes: The maximum number of bytes to retrieve from the relation, estimated from the
+            source storage metadata. Default ``None`` (no byte budget).
+    """
+
+    size: int
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 timestamp_attribute: str,
+                 days: Optional[int] = None,
+                 start: Optional[Any] = None,
+                 end: Optional[Any] = None,
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99,
+                 min_sample_size: int = 1000,
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 max_allowed_bytes: Optional[int] = None):
+        self.window = TimeWindow(timestamp_attribute, days, start, end)
+        self.min_sample_size = min_sample_size
+        self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Counts the rows in the window and instanciates the sample method.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        window_size = int(source_adapter.scalar_query(
+            source_adapter.population_count_statement(relation)
+            + " WHERE " + source_adapter.window_constraint_statement(self.window)))
+        self.size = min(max(self.sample_size_method.size(window_size),
+                            self.min_sample_size),
+                        self.max_allowed_rows,
+                        window_size)
+        self.size = self.cap_to_byte_budget(relation, source_adapter, self.size)
+
+        self.sample_method = BernoulliSampleMethod(self.size,
+                                                   units='rows')
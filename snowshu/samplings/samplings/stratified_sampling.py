@@ -0,0 +1,117 @@
+import logging
+from typing import TYPE_CHECKING, List, Optional, Union
+
+import numpy as np
+
+from snowshu.configs import DEFAULT_MAX_STRATA, MAX_ALLOWED_ROWS
+from snowshu.core.samplings.bases.base_sampling import BaseSampling
+from snowshu.exceptions import TooManyRecords
+from snowshu.samplings.sample_methods import StratifiedSampleMethod
+from snowshu.samplings.sample_sizes import CochransSampleSize
+
+if TYPE_CHECKING:
+    from snowshu.core.models.relation import Relation
+    from snowshu.adapters.source_adapters.base_source_adapter import BaseSourceAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class StratifiedSampling(BaseSampling):
+    """
+    Sampling using :class:`Cochrans <snowshu.samplings.sample_sizes.cochrans_sample_size.CochransSampleSize>`
+    theorem for the total sample size and :class:`Stratified
+    <snowshu.samplings.sample_methods.stratified_sample_method.StratifiedSampleMethod>` selection.
+
+    During prepare the stratum sizes are collected in a single aggregate query, and the fraction drawn from
+    every stratum is chosen so that the sample lands on the total size while every stratum keeps at least
+    ``min_per_stratum`` rows. Skewed relations get rare values covered without oversampling the common ones.
+
+    Args:
+        strata: The attribute (or list of attributes) to stratify the relation by.
+        margin_of_error: The acceptable error % expressed in a decimal from 0.01 to 0.10 (1% to 10%).
+            Default 0.02 (2%).
+        confidence: The confidence interval to be observed for the sample expressed in a decimal
+            from 0.01 to 0.99 (1% to 99%). Default 0.99 (99%).
+        min_sample_size: The minimum number of records to retrieve from the population. Default 1000.
+        min_per_stratum: The minimum number of records to retrieve from every stratum. Default 10.
+        max_allowed_rows: The maximum number of records to retrieve from the population.
+        max_allowed_bytes: The maximum number of bytes to retrieve from the relation, estimated from the
+            source storage metadata. Default ``None`` (no byte budget).
+        max_strata: The maximum number of strata the relation may have. Default 10000.
+    """
+
+    size: int
+
+    def __init__(self,  # noqa pylint: disable=too-many-arguments
+                 strata: Union[str, List[str]],
+                 margin_of_error: float = 0.02,
+                 confidence: float = 0.99,
+                 min_sample_size: int = 1000,
+                 min_per_stratum: int = 10,
+                 max_allowed_rows: int = MAX_ALLOWED_ROWS,
+                 max_allowed_bytes: Optional[int] = None,
+                 max_strata: int = DEFAULT_MAX_STRATA):
+        self.strata = [strata] if isinstance(strata, str) else list(strata)
+        self.min_sample_size = min_sample_size
+        self.min_per_stratum = min_per_stratum
+        self.max_allowed_rows = max_allowed_rows
+        self.max_allowed_bytes = max_allowed_bytes
+        self.max_strata = max_strata
+        self.sample_size_method = CochransSampleSize(margin_of_error,
+                                                     confidence)
+
+    def prepare(self,
+                relation: "Relation",
+                source_adapter: "BaseSourceAdapter") -> None:
+        """Collects the stratum sizes and instanciates the sample method.
+
+        Args:
+            relation: The :class:`Relation <snowshu.core.models.relation.Relation>` object to prepare.
+            source_adapter: The :class:`source adapter
+                <snowshu.adapters.source_adapters.base_source_adapter.BaseSourceAdapter>` instance to use
+                for executing prepare queries.
+        """
+        # one stratum past the cap is enough to tell the relation has too many, in a single aggregation
+        histogram = source_adapter._safe_query(  # noqa pylint: disable=protected-access
+            source_adapter.stratum_count_statement(relation, self.strata, limit=self.max_strata + 1))
+        if len(histogram) > self.max_strata:
+            raise TooManyRecords(f"{relation.dot_notation} has more than max_strata ({self.max_strata}) strata "
+                                 f"of {', '.join(self.strata)}.")
+        stratum_sizes = histogram.iloc[:, 0].to_numpy(dtype=float)
+        target = min(max(self.sample_size_method.size(
+            relation.population_size),
+            self.min_sample_size), self.max_allowed_rows)
+        target = self.cap_to_byte_budget(relation, source_adapter, target)
+
+        fraction = self._fraction_for_target(stratum_sizes, target)
+        self.size = int(self._expected_size(stratum_sizes, fraction))
+        if self.size > self.max_allowed_rows:
+            logger.warning("Keeping %s rows from each of the %s strata of %s exceeds max_allowed_rows (%s).",
+                           self.min_per_stratum, len(stratum_sizes), relation.dot_notation, self.max_allowed_rows)
+
+        self.sample_method = StratifiedSampleMethod(self.strata,
+                                                    fraction,
+                                                    self.min_per_stratum)
+
+    def _expected_size(self, stratum_sizes: np.ndarray, fraction: float) -> float:
+        """The number of rows kept with the given fraction, mirroring the compiled per stratum limit."""
+        return np.minimum(stratum_sizes,
+                          np.maximum(self.min_per_stratum, np.ceil(stratum_sizes * fraction))).sum()
+
+    def _fraction_for_target(self, stratum_sizes: np.ndarray, target: int) -> float:
+        """Finds the smallest fraction keeping at least ``target`` rows.
+
+        Bisection, the number of rows kept grows with the fraction.
+        """
+        if self._expected_size(stratum_sizes, 0) >= target:
+            return 0.0
+        if self._expected_size(stratum_sizes, 1) <= target:
+            return 1.0
+        low, high = 0.0, 1.0
+        for _ in range(50):
+            middle = (low + high) / 2
+            if self._expected_size(stratum_sizes, middle) < target:
+                low = middle
+            else:
+                high = middle
+        return high
@@ -0,0 +1,2 @@
+from .sample_store import SampleStore
+from .spill import SpillFile
@@ -0,0 +1,138 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+import logging
+
+import pandas as pd
+
+from snowshu.configs import DEFAULT_SAMPLE_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+class SampleStore:
+    """A local, content addressed store of relation samples in Parquet files.
+
+    Samples are stored under a key hashing a description of how the sample is drawn (its sampling
+    configuration and relationships), the change fingerprint of the source table and the store
+    seed, so a changed configuration or source table never hits a stale sample. Samplings are
+    random, the seed is there to draw fresh samples of unchanged relations on demand. Reading a
+    sample marks it as recently used; once the store grows over ``max_bytes`` the least recently
+    used samples are evicted.
+
+    Args:
+        path: the directory the samples are stored in, created on first write.
+        max_bytes: the total size the stored samples may take on disk.
+        seed: changing it invalidates all stored samples.
+    """
+    SUFFIX = '.parquet'
+
+    def __init__(self,
+                 path: Union[Path, str],
+                 max_bytes: int = DEFAULT_SAMPLE_CACHE_MAX_BYTES,
+                 seed: int = 0):
+        self.path = Path(path).expanduser()
+        self.max_bytes = max_bytes
+        self.seed = seed
+
+    def __repr__(self) -> str:
+        return f"<SampleStore {self.path} ({self.max_bytes} bytes, seed {self.seed})>"
+
+    def key(self, spec: str, fingerprint: Optional[str]) -> str:
+        """The content address of a sample.
+
+        Args:
+            spec: a description of everything the sample is drawn with apart from the source data,
+                ie the sampling configuration and relationships of the relation.
+            fingerprint: the change fingerprint of the source table (ie last altered and row count).
+        """
+        return self.combined_key(spec, str(self.seed), str(fingerprint))
+
+    @staticmethod
+    def combined_key(*parts: str) -> str:
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / f"{key}{self.SUFFIX}"
+
+    def contains(self, key: str) -> bool:
+        return self._file(key).is_file()
+
+    def stored_bytes(self, key: str) -> Optional[int]:
+        """The size of a stored sample on disk, or None if the key is not in the store."""
+        try:
+            return self._file(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """Reads a stored sample, or None if the key is not in the store."""
+        sample_file = self._file(key)
+        try:
+            data = pd.read_parquet(sample_file)
+        except FileNotFoundError:
+            return None
+        # the modification time orders samples for eviction
+        os.utime(sample_file)
+        logger.debug('Sample %s read from store (%s rows).', key, len(data))
+        return data
+
+    def put(self, key: str, data: pd.DataFrame) -> None:
+        """Stores a sample, then evicts the least recently used samples over the size limit."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        sample_file = self._file(key)
+        # write aside and rename so concurrent readers never see a partial file
+        partial_file = sample_file.with_suffix(f".{os.getpid()}.partial")
+        data.to_parquet(partial_file, index=False)
+        os.replace(partial_file, sample_file)
+        logger.debug('Sample %s stored (%s rows, %s bytes).', key, len(data), sample_file.stat().st_size)
+        self.evict(keep=(key,))
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        if not self.path.is_dir():
+            return []
+        entries = []
+        for sample_file in self.path.glob(f"*{self.SUFFIX}"):
+            try:
+                stat = sample_file.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, sample_file,))
+        return sorted(entries)
+
+    @property
+    def size(self) -> int:
+        """The total bytes of all stored samples."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, keep: Iterable[str] = tuple()) -> int:
+        """Removes the least recently used samples until the store fits in ``max_bytes``.
+
+        Args:
+            keep: keys never evicted, even if the store stays over the limit.
+        Returns:
+            the number of samples evicted.
+        """
+        kept_files = {self._file(key) for key in keep}
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, sample_file in entries:
+            if total <= self.max_bytes:
+                break
+            if sample_file in kept_files:
+                continue
+            try:
+                sample_file.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        if evicted:
+            logger.info('Evicted %s samples from store %s, %s bytes remaining.', evicted, self.path, total)
+        return evicted
@@ -0,0 +1,64 @@
+from pathlib import Path
+from typing import Iterable, Iterator, List, Union
+import logging
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+
+class SpillFile:
+    """Parquet files holding a sample on local disk a chunk at a time, for samples too big for memory.
+
+    Chunks are appended as row groups. Chunks that do not share the schema of the previous one
+    (ie a column that was all null in the first chunk) start a new part file, so reading them back
+    yields the frames as they were written.
+
+    Args:
+        path: the file to spill to, parts are written next to it.
+    """
+
+    def __init__(self, path: Union[Path, str]):
+        self.path = Path(path)
+        self.parts: List[Path] = list()
+        self.rows = 0
+        self._writer = None
+
+    def write(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """Appends the chunks, returns the number of rows written."""
+        try:
+            for chunk in chunks:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if self._writer is None or not table.schema.equals(self._writer.schema):
+                    self._new_part(table.schema)
+                self._writer.write_table(table)
+                self.rows += len(chunk)
+        finally:
+            self._close_writer()
+        logger.debug(f"Spilled {self.rows} rows to {len(self.parts)} files at {self.path}.")
+        return self.rows
+
+    def read(self, batch_size: int) -> Iterator[pd.DataFrame]:
+        """Reads the spilled rows back in frames of at most batch size rows."""
+        for part in self.parts:
+            for batch in pq.ParquetFile(part).iter_batches(batch_size=batch_size):
+                yield batch.to_pandas()
+
+    def remove(self) -> None:
+        self._close_writer()
+        for part in self.parts:
+            part.unlink(missing_ok=True)
+        self.parts = list()
+
+    def _new_part(self, schema: pa.Schema) -> None:
+        self._close_writer()
+        part = self.path.with_name(f"{self.path.stem}.{len(self.parts)}{self.path.suffix}")
+        self._writer = pq.ParquetWriter(part, schema)
+        self.parts.append(part)
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
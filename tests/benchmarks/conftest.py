@@ -0,0 +1,88 @@
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import pytest
+
+BENCHMARKS_ENABLED = os.getenv('SNOWSHU_BENCHMARKS') is not None
+
+# benchmarks are slow by design, they only run when explicitly requested
+requires_benchmarks = pytest.mark.skipif(not BENCHMARKS_ENABLED,
+                                         reason='set SNOWSHU_BENCHMARKS=1 to run benchmarks')
+
+# the best time of every reported benchmark is compared to the stored baseline. Baselines are
+# absolute timings of the machine they were saved on, so failing on a regression is opt-in:
+# a benchmark slower than its baseline by more than the tolerance then fails
+BASELINES_PATH = Path(os.getenv('SNOWSHU_BENCHMARK_BASELINES', Path(__file__).parent / 'baselines.json'))
+REGRESSION_TOLERANCE = float(os.getenv('SNOWSHU_BENCHMARK_TOLERANCE', '0.5'))
+SAVE_BASELINES = os.getenv('SNOWSHU_BENCHMARK_SAVE_BASELINES') is not None
+CHECK_BASELINES = os.getenv('SNOWSHU_BENCHMARK_CHECK_BASELINES') is not None
+
+
+class BenchmarkTimer:
+    """runs a callable a number of rounds and keeps the wall times."""
+
+    def __init__(self, name: str, baselines: Optional[Dict[str, float]] = None):
+        self.name = name
+        self.timings = []
+        self.baselines = baselines
+
+    def __call__(self, func: Callable, *args, rounds: int = 5, setup: Callable = None, **kwargs):
+        result = None
+        for _ in range(rounds):
+            call_args = setup() if setup else args
+            start = time.perf_counter()
+            result = func(*call_args, **kwargs)
+            self.timings.append(time.perf_counter() - start)
+        return result
+
+    @property
+    def best(self) -> float:
+        return min(self.timings)
+
+    @property
+    def mean(self) -> float:
+        return statistics.mean(self.timings)
+
+    def report(self, **extra) -> dict:
+        report = dict(name=self.name,
+                      rounds=len(self.timings),
+                      best_seconds=round(self.best, 6),
+                      mean_seconds=round(self.mean, 6))
+        baseline = None if self.baselines is None else self.baselines.get(self.name)
+        if baseline:
+            report['baseline_ratio'] = round(self.best / baseline, 3)
+        report.update(extra)
+        print(report)
+        self.check_baseline()
+        return report
+
+    def check_baseline(self) -> None:
+        """stores the best time as baseline when saving baselines, else fails on a regression against it if asked to."""
+        if self.baselines is None:
+            return
+        if SAVE_BASELINES:
+            self.baselines[self.name] = round(self.best, 6)
+            return
+        if not CHECK_BASELINES:
+            return
+        baseline = self.baselines.get(self.name)
+        if baseline and self.best > baseline * (1 + REGRESSION_TOLERANCE):
+            pytest.fail(f"{self.name} regressed: best of {self.best:.6f}s against a baseline of {baseline:.6f}s "
+                        f"(tolerance {REGRESSION_TOLERANCE:.0%})", pytrace=False)
+
+
+@pytest.fixture(scope='session')
+def benchmark_baselines():
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else dict()
+    yield baselines
+    if SAVE_BASELINES and baselines:
+        BASELINES_PATH.write_text(json.dumps(dict(sorted(baselines.items())), indent=2) + '\n')
+
+
+@pytest.fixture
+def benchmark(request, benchmark_baselines):
+    return BenchmarkTimer(request.node.name, benchmark_baselines)
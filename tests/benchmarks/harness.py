@@ -0,0 +1,303 @@
+"""End to end benchmarks of ``snowshu create`` and ``snowshu analyze``.
+
+A benchmark builds a synthetic catalog of a given shape in local DuckDB files, samples it with the
+:class:`DuckdbAdapter <snowshu.adapters.source_adapters.duckdb_adapter.DuckdbAdapter>` as source
+(optionally with injected query latency) into the Postgres target and writes the wall time, the
+time spent per phase, rows/s, bytes/s and peak RSS to a JSON result named after the shape, the
+mode and the commit, so runs of the same shape are comparable across commits::
+
+    python -m tests.benchmarks.harness run --relations 50 --depth 3 --fan-out 3 --mode analyze
+    python -m tests.benchmarks.harness compare .benchmarks/baseline.json .benchmarks/current.json
+
+Every run should happen in a fresh process, since peak RSS is measured for the whole process.
+"""
+import functools
+import json
+import numbers
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+from unittest import mock
+
+import click
+import pandas as pd
+import yaml
+
+from snowshu.adapters.source_adapters.duckdb_adapter import generate_synthetic_catalog
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.replica.replica_factory import ReplicaFactory
+
+DEFAULT_OUTPUT = Path('.benchmarks')
+MODES = ('analyze', 'create',)
+
+
+@dataclass(frozen=True)
+class CatalogShape:
+    """The shape of a synthetic catalog, see :func:`generate_synthetic_catalog`."""
+    relations: int = 20
+    depth: Optional[int] = 3
+    fan_out: int = 3
+    rows: int = 10000
+    columns: int = 2
+    column_width: int = 32
+    json_columns: int = 0
+    latency: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return (f"r{self.relations}-d{self.depth or 'x'}-f{self.fan_out}-n{self.rows}"
+                f"-c{self.columns}x{self.column_width}-j{self.json_columns}-l{self.latency:g}")
+
+
+class PhaseTimer:
+    """Adds up the wall time spent in wrapped callables per phase.
+
+    Phases nest (the graph build includes the catalog build) and phases run from several
+    threads add up the time of every thread, so phases can sum to more than the wall time.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.seconds[phase] += time.perf_counter() - start
+                self.calls[phase] += 1
+        return timed
+
+    def patch(self, stack: ExitStack, phase: str, target: object, attribute: str) -> None:
+        stack.enter_context(mock.patch.object(target, attribute, self.wrap(phase, getattr(target, attribute))))
+
+
+def write_source(shape: CatalogShape, directory: Path) -> Dict[str, Optional[str]]:
+    """Generates the catalog of the shape, returns the parent of every relation."""
+    return generate_synthetic_catalog(directory,
+                                      databases=1,
+                                      schemas=1,
+                                      relations=shape.relations,
+                                      rows=shape.rows,
+                                      fan_out=shape.fan_out,
+                                      depth=shape.depth,
+                                      columns=shape.columns,
+                                      column_width=shape.column_width,
+                                      json_columns=shape.json_columns)
+
+
+def replica_configuration(directory: Path, parents: Dict[str, Optional[str]]) -> dict:
+    """A replica file sampling every relation of the catalog, constrained on its parent."""
+    credpath = directory / 'credentials.yml'
+    credpath.write_text(yaml.dump(dict(version='1',
+                                       sources=[dict(name='benchmark',
+                                                     adapter='duckdb',
+                                                     host=str(directory),
+                                                     database='db_0')])))
+    specified_relations = list()
+    for relation, parent in parents.items():
+        if parent is None:
+            continue
+        database, schema, name = relation.split('.')
+        specified_relations.append(dict(
+            database=database,
+            schema=schema,
+            relation=name,
+            relationships=dict(directional=[dict(local_attribute='parent_id',
+                                                 database='',
+                                                 schema='',
+                                                 relation=parent.split('.')[-1],
+                                                 remote_attribute='id')])))
+    return dict(version='1',
+                credpath=str(credpath),
+                name='snowshu-benchmark',
+                short_description='synthetic benchmark replica',
+                long_description='synthetic benchmark replica',
+                threads=4,
+                source=dict(profile='benchmark',
+                            sampling='default',
+                            include_outliers=False,
+                            general_relations=dict(databases=[dict(pattern='db_0',
+                                                                   schemas=[dict(pattern='.*',
+                                                                                 relations=['.*'])])]),
+                            specified_relations=specified_relations),
+                target=dict(adapter='postgres'))
+
+
+def _commit() -> dict:
+    try:
+        sha = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, check=True, text=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, check=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return dict(sha=None, dirty=None)
+    return dict(sha=sha, dirty=dirty)
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_benchmark(shape: CatalogShape, mode: str = 'analyze', directory: Optional[Path] = None) -> dict:
+    """Builds the catalog of the shape and times a full run of the mode against it.
+
+    Args:
+        shape: the catalog to build.
+        mode: ``analyze`` or ``create``.
+        directory: where the source databases are written, default a temporary directory.
+    Returns:
+        the benchmark result.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown benchmark mode {mode}, expected one of {MODES}.")
+    with ExitStack() as stack:
+        if directory is None:
+            directory = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        start = time.perf_counter()
+        parents = write_source(shape, directory)
+        generate_seconds = time.perf_counter() - start
+
+        factory = ReplicaFactory()
+        factory.load_config(StringIO(yaml.dump(replica_configuration(directory, parents))))
+        source_adapter = factory.config.source_profile.adapter
+        source_adapter.latency = shape.latency
+        target_adapter = factory.config.target_profile.adapter
+
+        timer = PhaseTimer()
+        timer.patch(stack, 'catalog', source_adapter, 'build_catalog')
+        timer.patch(stack, 'graph', SnowShuGraph, 'build_graph')
+        timer.patch(stack, 'query', source_adapter, '_safe_query')
+        timer.patch(stack, 'initialize', target_adapter, 'initialize_replica')
+        timer.patch(stack, 'finalize', target_adapter, 'finalize_replica')
+
+        graphs = list()
+        execute_graph_set = GraphSetRunner.execute_graph_set
+
+        def capture_graphs(runner, graph_set, *args, **kwargs):
+            graphs.extend(graph_set)
+            return execute_graph_set(runner, graph_set, *args, **kwargs)
+        stack.enter_context(mock.patch.object(GraphSetRunner, 'execute_graph_set',
+                                              timer.wrap('execute', capture_graphs)))
+
+        loaded_bytes = list()
+        create_and_load_relation = target_adapter.create_and_load_relation
+
+        def measure_load(relation, data: pd.DataFrame):
+            loaded_bytes.append(int(data.memory_usage(deep=True).sum()))
+            return create_and_load_relation(relation, data)
+        stack.enter_context(mock.patch.object(target_adapter, 'create_and_load_relation',
+                                              timer.wrap('load', measure_load)))
+
+        start = time.perf_counter()
+        if mode == 'analyze':
+            factory.analyze(barf=False, retry_count=1)
+        else:
+            factory.create(None, barf=False, retry_count=1)
+        wall_seconds = time.perf_counter() - start
+
+    # views have no sample size
+    rows = sum(relation.sample_size for graph in graphs for relation in graph.nodes
+               if isinstance(relation.sample_size, numbers.Integral))
+    sampled_bytes = sum(loaded_bytes) if mode == 'create' else None
+    return dict(benchmark='snowshu-' + mode,
+                mode=mode,
+                shape=asdict(shape),
+                shape_name=shape.name,
+                commit=_commit(),
+                python=platform.python_version(),
+                platform=platform.platform(),
+                created_at=datetime.now().isoformat(),
+                generate_seconds=round(generate_seconds, 6),
+                wall_seconds=round(wall_seconds, 6),
+                phases={phase: dict(seconds=round(seconds, 6), calls=timer.calls[phase])
+                        for phase, seconds in sorted(timer.seconds.items())},
+                relations=sum(len(graph) for graph in graphs),
+                rows=int(rows),
+                bytes=sampled_bytes,
+                rows_per_second=round(rows / wall_seconds, 3),
+                bytes_per_second=None if sampled_bytes is None else round(sampled_bytes / wall_seconds, 3),
+                peak_rss_bytes=_peak_rss_bytes())
+
+
+def write_result(result: dict, output: Union[Path, str] = DEFAULT_OUTPUT) -> Path:
+    """Writes the result as ``<mode>-<shape>-<commit>.json`` in the output directory."""
+    output = Path(output)
+    output.mkdir(parents=True, exist_ok=True)
+    commit = (result['commit']['sha'] or 'unknown')[:12] + ('-dirty' if result['commit']['dirty'] else '')
+    path = output / f"{result['mode']}-{result['shape_name']}-{commit}.json"
+    path.write_text(json.dumps(result, indent=2))
+    return path
+
+
+def compare_results(baseline: dict, current: dict) -> Dict[str, Optional[float]]:
+    """The ratio of current to baseline of every timing and throughput, below 1 a time got faster.
+
+    Raises:
+        ValueError: when the results are of different shapes or modes, which are not comparable.
+    """
+    if (baseline['mode'], baseline['shape']) != (current['mode'], current['shape']):
+        raise ValueError(f"Cannot compare {baseline['mode']} {baseline['shape_name']} "
+                         f"to {current['mode']} {current['shape_name']}.")
+
+    def ratio(old, new) -> Optional[float]:
+        return None if not old or new is None else round(new / old, 3)
+
+    ratios = {key: ratio(baseline[key], current[key])
+              for key in ('wall_seconds', 'rows_per_second', 'bytes_per_second', 'peak_rss_bytes',)}
+    for phase, timing in current['phases'].items():
+        ratios[f"phases.{phase}"] = ratio(baseline['phases'].get(phase, {}).get('seconds'), timing['seconds'])
+    return ratios
+
+
+@click.group()
+def cli():
+    """Benchmarks of SnowShu replica builds."""
+
+
+@cli.command()
+@click.option('--relations', default=CatalogShape.relations, show_default=True)
+@click.option('--depth', default=CatalogShape.depth, show_default=True, help='0 for a single tree')
+@click.option('--fan-out', default=CatalogShape.fan_out, show_default=True)
+@click.option('--rows', default=CatalogShape.rows, show_default=True)
+@click.option('--columns', default=CatalogShape.columns, show_default=True)
+@click.option('--column-width', default=CatalogShape.column_width, show_default=True)
+@click.option('--json-columns', default=CatalogShape.json_columns, show_default=True)
+@click.option('--latency', default=CatalogShape.latency, show_default=True, help='seconds added to every query')
+@click.option('--mode', type=click.Choice(MODES), default='analyze', show_default=True)
+@click.option('--output', default=str(DEFAULT_OUTPUT), show_default=True, help='directory of the results')
+def run(relations, depth, fan_out, rows, columns, column_width, json_columns, latency, mode, output):  # noqa pylint: disable=too-many-arguments
+    """Runs one benchmark and writes its result."""
+    shape = CatalogShape(relations, depth or None, fan_out, rows, columns, column_width, json_columns, latency)
+    result = run_benchmark(shape, mode)
+    click.echo(json.dumps(result, indent=2))
+    click.echo(f"Result written to {write_result(result, output)}")
+
+
+@cli.command()
+@click.argument('baseline', type=click.Path(exists=True))
+@click.argument('current', type=click.Path(exists=True))
+def compare(baseline, current):
+    """Prints the ratio of CURRENT to BASELINE timings and throughputs."""
+    for key, value in compare_results(json.loads(Path(baseline).read_text()),
+                                      json.loads(Path(current).read_text())).items():
+        click.echo(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    cli()  # noqa pylint: disable=no-value-for-parameter
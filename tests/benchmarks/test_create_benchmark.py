@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from tests.benchmarks.conftest import requires_benchmarks
+from tests.benchmarks.harness import MODES, compare_results
+
+pytestmark = requires_benchmarks
+
+OUTPUT = Path(os.getenv('SNOWSHU_BENCHMARK_OUTPUT', '.benchmarks'))
+
+SHAPES = (
+    dict(relations=20, depth=3, fan_out=3, rows=10000),
+    dict(relations=50, depth=5, fan_out=2, rows=50000, columns=4, column_width=128, json_columns=2),
+    dict(relations=20, depth=3, fan_out=3, rows=10000, latency=0.05),
+)
+
+
+@pytest.mark.parametrize('mode', MODES)
+@pytest.mark.parametrize('shape', SHAPES)
+def test_replica_benchmark(mode, shape):
+    # every run in its own process, peak RSS is measured per process
+    args = [f"--{key.replace('_', '-')}={value}" for key, value in shape.items()]
+    completed = subprocess.run([sys.executable, '-m', 'tests.benchmarks.harness', 'run',
+                                f"--mode={mode}", f"--output={OUTPUT}", *args],
+                               capture_output=True, check=True, text=True)
+    result_path = Path(completed.stdout.strip().splitlines()[-1].rsplit(' ', 1)[-1])
+    result = json.loads(result_path.read_text())
+
+    assert result['relations'] == shape['relations']
+    assert result['rows'] > 0
+    assert result['peak_rss_bytes'] > 0
+    assert all(ratio == 1 for ratio in compare_results(result, result).values() if ratio is not None)
@@ -0,0 +1,188 @@
+"""Microbenchmarks of the pure python hot paths of a replica build on large catalogs.
+
+Catalogs of 1k, 10k and 100k relations are spread over 10 databases of 10 schemas each, with
+hundreds of specified relationships between them. The sizes to run can be narrowed with
+``SNOWSHU_BENCHMARK_SIZES=1k,10k``.
+"""
+import os
+from io import StringIO
+from typing import Set
+from unittest import mock
+
+import networkx
+import pytest
+import yaml
+
+from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.core.compile import RuntimeSourceCompiler
+from snowshu.core.configuration_parser import ConfigurationParser
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.models import data_types
+from snowshu.core.models.attribute import Attribute
+from snowshu.core.models.materializations import TABLE
+from snowshu.core.models.relation import Relation, at_least_one_full_pattern_match
+from snowshu.core.printable_result import graph_to_result_list
+from tests.benchmarks.conftest import requires_benchmarks
+
+pytestmark = requires_benchmarks
+
+CATALOG_SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+SIZES = os.getenv('SNOWSHU_BENCHMARK_SIZES', ','.join(CATALOG_SIZES)).split(',')
+DATABASES = 10
+SCHEMAS = 10
+SPECIFIED_RELATIONS = 300
+ATTRIBUTES = [Attribute('id', data_types.BIGINT),
+              Attribute('parent_id', data_types.BIGINT),
+              Attribute('name', data_types.VARCHAR),
+              Attribute('amount', data_types.DECIMAL),
+              Attribute('created_at', data_types.TIMESTAMP_NTZ),
+              Attribute('is_active', data_types.BOOLEAN),
+              Attribute('payload', data_types.JSON),
+              Attribute('updated_at', data_types.TIMESTAMP_NTZ)]
+
+
+def rounds_for(size: int, fast: bool = False) -> int:
+    # a single round of the larger catalogs takes long enough to be stable, fast benchmarks need more
+    if fast:
+        return 20 if size <= 1000 else 5 if size <= 10000 else 1
+    return 3 if size <= 1000 else 1
+
+
+def synthetic_catalog(size: int) -> Set[Relation]:
+    relations_per_schema = size // (DATABASES * SCHEMAS)
+    return {Relation(f"db_{database}", f"schema_{schema}", f"relation_{relation}", TABLE, list(ATTRIBUTES))
+            for database in range(DATABASES)
+            for schema in range(SCHEMAS)
+            for relation in range(relations_per_schema)}
+
+
+def specified_relations() -> list:
+    """every specified relation depends on the previous relation of its schema, alternating literal and
+    regex patterns, directional and bidirectional relationships."""
+    specified = list()
+    for index in range(SPECIFIED_RELATIONS):
+        database = index % DATABASES
+        schema = (index // DATABASES) % SCHEMAS
+        relation = 1 + index // (DATABASES * SCHEMAS)
+        direction = 'bidirectional' if index % 3 == 0 else 'directional'
+        specified.append(dict(database=f"db_{database}",
+                              schema=f"schema_{schema}" if index % 2 else 'schema_0*' + str(schema),
+                              relation=f"relation_{relation}" if index % 2 else 'relation_0*' + str(relation),
+                              relationships={direction: [dict(local_attribute='parent_id',
+                                                              database='',
+                                                              schema='',
+                                                              relation=f"relation_{relation - 1}",
+                                                              remote_attribute='id')]}))
+    return specified
+
+
+@pytest.fixture(scope='module')
+def replica_configs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('graph_benchmarks')
+    credpath = directory / 'credentials.yml'
+    credpath.write_text(yaml.dump(dict(version='1',
+                                       sources=[dict(name='benchmark',
+                                                     adapter='duckdb',
+                                                     host=str(directory),
+                                                     database='db_0')])))
+    replica = dict(version='1',
+                   credpath=str(credpath),
+                   name='graph-benchmark',
+                   short_description='synthetic catalog',
+                   long_description='synthetic catalog',
+                   threads=4,
+                   source=dict(profile='benchmark',
+                               sampling='default',
+                               include_outliers=False,
+                               general_relations=dict(databases=[dict(pattern='db_.*',
+                                                                      schemas=[dict(pattern='schema_.*',
+                                                                                    relations=['relation_.*'])])]),
+                               specified_relations=specified_relations()),
+                   target=dict(adapter='postgres'))
+    with mock.patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker'):
+        return ConfigurationParser().from_file_or_path(StringIO(yaml.dump(replica)))
+
+
+@pytest.fixture(scope='module', params=SIZES)
+def catalog_size(request):
+    return CATALOG_SIZES[request.param]
+
+
+def configs_with_catalog(configs, size: int):
+    """a fresh catalog every round, the graph build sets the config values on the relations"""
+    catalog = synthetic_catalog(size)
+    configs.source_profile.adapter.build_catalog = lambda **_: catalog
+    return configs, catalog
+
+
+@pytest.fixture(scope='module')
+def built_graph(replica_configs, catalog_size):
+    configs, _ = configs_with_catalog(replica_configs, catalog_size)
+    shgraph = SnowShuGraph()
+    shgraph.build_graph(configs)
+    source_adapter = SnowflakeAdapter()
+    for relation in shgraph.graph.nodes:
+        relation.population_size = 100000
+        relation.sampling.prepare(relation, source_adapter)
+        relation.sample_size = relation.sampling.size
+    return shgraph
+
+
+def test_build_graph(benchmark, replica_configs, catalog_size):
+    def build(configs):
+        SnowShuGraph().build_graph(configs)
+
+    benchmark(build,
+              rounds=rounds_for(catalog_size),
+              setup=lambda: configs_with_catalog(replica_configs, catalog_size)[:1])
+    benchmark.report(relations=catalog_size, specified_relations=SPECIFIED_RELATIONS)
+
+
+def test_apply_specifications(benchmark, replica_configs, catalog_size):
+    def setup():
+        configs, catalog = configs_with_catalog(replica_configs, catalog_size)
+        graph = networkx.MultiDiGraph()
+        graph.add_nodes_from(catalog)
+        return configs, graph, catalog
+
+    graph = benchmark(SnowShuGraph._apply_specifications,  # noqa pylint: disable=protected-access
+                      rounds=rounds_for(catalog_size),
+                      setup=setup)
+    benchmark.report(relations=catalog_size, edges=graph.number_of_edges())
+
+
+def test_get_connected_subgraphs(benchmark, built_graph, catalog_size):
+    dags = benchmark(built_graph.get_connected_subgraphs, rounds=rounds_for(catalog_size, fast=True))
+    benchmark.report(relations=catalog_size, subgraphs=len(dags))
+
+
+def test_pattern_matching(benchmark, replica_configs, catalog_size):
+    # the general patterns match every relation on the first try, the specified ones are all tried
+    patterns = SnowShuGraph.build_sum_patterns_from_configs(replica_configs)[1:]
+    catalog = synthetic_catalog(catalog_size)
+
+    def match():
+        return [relation for relation in catalog if at_least_one_full_pattern_match(relation, patterns)]
+
+    matched = benchmark(match, rounds=rounds_for(catalog_size))
+    benchmark.report(relations=catalog_size, patterns=len(patterns), matched=len(matched))
+
+
+def test_compile_queries(benchmark, built_graph, catalog_size):
+    dags = built_graph.get_connected_subgraphs()
+    source_adapter = SnowflakeAdapter()
+
+    def compile_all():
+        for dag in dags:
+            for relation in networkx.topological_sort(dag):
+                RuntimeSourceCompiler.compile_queries_for_relation(relation, dag, source_adapter, True)
+
+    benchmark(compile_all, rounds=rounds_for(catalog_size, fast=True))
+    benchmark.report(relations=catalog_size)
+
+
+def test_graph_to_result_list(benchmark, built_graph, catalog_size):
+    dags = built_graph.get_connected_subgraphs()
+    report = benchmark(graph_to_result_list, dags, rounds=rounds_for(catalog_size, fast=True))
+    assert len(report) == catalog_size
+    benchmark.report(relations=catalog_size)
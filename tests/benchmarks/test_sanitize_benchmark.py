@@ -0,0 +1,57 @@
+import json
+import random
+from unittest.mock import patch
+
+import pandas as pd
+
+from snowshu.adapters.target_adapters.postgres_adapter import PostgresAdapter
+from snowshu.core.models import data_types
+from snowshu.core.models.attribute import Attribute
+from snowshu.core.models.materializations import TABLE
+from snowshu.core.models.relation import Relation
+from tests.benchmarks.conftest import requires_benchmarks
+from tests.common import rand_string
+
+pytestmark = requires_benchmarks
+
+ROWS = 200000
+TEXT_COLUMNS = 10
+NUL_RATE = 0.01
+
+
+def string_heavy_frame() -> pd.DataFrame:
+    random.seed(42)
+    pool = [rand_string(40) for _ in range(1000)]
+    frame = {f"text_{i}": [random.choice(pool) if random.random() > NUL_RATE else "nul\x00value"
+                           for _ in range(ROWS)]
+             for i in range(TEXT_COLUMNS)}
+    frame["payload"] = [json.dumps(dict(key=random.choice(pool), values=[1, 2, 3])) for _ in range(ROWS)]
+    return pd.DataFrame(frame)
+
+
+def string_heavy_relation() -> Relation:
+    attributes = [Attribute(f"text_{i}", data_types.VARCHAR) for i in range(TEXT_COLUMNS)]
+    attributes.append(Attribute("payload", data_types.JSON))
+    return Relation("db", "schema", "string_heavy", TABLE, attributes)
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_sanitize_string_heavy_frame(_, benchmark):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = string_heavy_relation()
+    source = string_heavy_frame()
+
+    benchmark(adapter.sanitize_data, setup=lambda: (relation, source.copy()))
+    benchmark.report(rows=ROWS, rows_per_second=round(ROWS / benchmark.best))
+
+
+def test_legacy_row_by_row_json_parse(benchmark):
+    """the per row json.loads the Relation.data setter used to run, for comparison"""
+    source = string_heavy_frame()
+
+    def legacy(frame):
+        frame["payload"] = frame["payload"].transform(lambda v: json.loads(v) if isinstance(v, str) else v)
+        return frame
+
+    benchmark(legacy, setup=lambda: (source.copy(),))
+    benchmark.report(rows=ROWS, rows_per_second=round(ROWS / benchmark.best))
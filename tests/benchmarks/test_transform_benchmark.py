@@ -0,0 +1,56 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from snowshu.adapters.target_adapters.postgres_adapter.postgres_adapter import CopyRenderer
+from snowshu.core.transform import FrameTransformer
+from tests.benchmarks.conftest import requires_benchmarks
+from tests.benchmarks.test_sanitize_benchmark import ROWS, string_heavy_frame, string_heavy_relation
+
+pytestmark = requires_benchmarks
+
+# loading threads each hand a batch over, as many as there are processes
+BATCHES = 16
+
+
+def batches():
+    return np.array_split(string_heavy_frame(), BATCHES)
+
+
+def renderer() -> CopyRenderer:
+    relation = string_heavy_relation()
+    return CopyRenderer({attr.name.lower(): attr.data_type.name for attr in relation.attributes}, '')
+
+
+def test_render_in_threads(benchmark):
+    """sanitizing and rendering the batches in the loading threads, contending for the GIL"""
+    frames, render = batches(), renderer()
+
+    def run():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            return list(executor.map(lambda frame: render(frame.copy()), frames))
+
+    benchmark(run, rounds=3)
+    benchmark.report(rows=ROWS, rows_per_second=round(ROWS / benchmark.best))
+
+
+@pytest.mark.parametrize('processes', (4, 8, 16,))
+def test_render_in_processes(benchmark, processes):
+    if (os.cpu_count() or 1) < processes:
+        pytest.skip(f"needs {processes} cores")
+    frames, render = batches(), renderer()
+    transformer = FrameTransformer(processes, min_rows=0)
+    try:
+        # spawns the workers outside of the timed rounds
+        transformer.apply(render, frames[0])
+
+        def run():
+            with ThreadPoolExecutor(max_workers=processes) as executor:
+                return list(executor.map(lambda frame: transformer.apply(render, frame), frames))
+
+        benchmark(run, rounds=3)
+    finally:
+        transformer.shutdown()
+    benchmark.report(rows=ROWS, processes=processes, rows_per_second=round(ROWS / benchmark.best))
@@ -143,40 +143,33 @@ def test_unsampled_statement(sf_adapter):
     assert len(sf_adapter._safe_query(statement)) > 0
 
 
-def test_union_constraint_statement(sf_adapter):
+def test_outliers_union_statement(sf_adapter):
     DATABASE, SCHEMA, TABLE = "SNOWSHU_DEVELOPMENT", "POLYMORPHIC_DATA", "PARENT_TABLE_2"
     subject = Relation(database=DATABASE,
                        schema=SCHEMA,
                        name=TABLE,
                        materialization=[],
                        attributes=[])
+    subject.max_number_of_outliers = randrange(1, 10)
     DATABASE, SCHEMA, TABLE = "SNOWSHU_DEVELOPMENT", "POLYMORPHIC_DATA", "CHILD_TYPE_1_ITEMS"
     constraint = Relation(database=DATABASE,
                           schema=SCHEMA,
                           name=TABLE,
                           materialization=[],
                           attributes=[])
-    max_number_of_outliers = randrange(1, 10)
     subject_key, constraint_key = "ID", "PARENT_2_ID"
-    statement = sf_adapter.union_constraint_statement(subject, constraint, subject_key, constraint_key,
-                                                      max_number_of_outliers)
+    sample = f"SELECT * FROM {sf_adapter.quoted_dot_notation(subject)} LIMIT 0"
+    statement = sf_adapter.outliers_union_statement(sample, subject, [(constraint, subject_key, constraint_key, False)])
 
-    assert query_equalize(statement) == query_equalize(f"""
-            (SELECT
-                *
-            FROM
-            {sf_adapter.quoted_dot_notation(subject)}
+    assert query_equalize(f"""
             WHERE
-                {subject_key}
-            NOT IN
-            (SELECT
-                {constraint_key}
-            FROM
-            {sf_adapter.quoted_dot_notation(constraint)})
-            LIMIT {max_number_of_outliers})
-            """)
+                (snowshu_subject.{subject_key} IS NOT NULL AND NOT EXISTS
+                (SELECT 1 FROM {sf_adapter.quoted_dot_notation(constraint)} AS snowshu_constraint
+                WHERE snowshu_constraint.{constraint_key} = snowshu_subject.{subject_key}))
+            """) in query_equalize(statement)
 
-    assert len(sf_adapter._safe_query(statement)) > 0
+    outliers = sf_adapter._safe_query(statement)
+    assert 0 < len(outliers) <= subject.max_number_of_outliers
 
 
 def test_polymorphic_constraint_statement(sf_adapter):
@@ -0,0 +1,82 @@
+from unittest import mock
+import pytest
+
+from snowshu.samplings.samplings import BlockSampling
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
+    mock_rel.is_view=False
+    mock_source_adapter=mock.MagicMock()
+    yield mock_rel,mock_source_adapter
+
+
+ONE_BILLION_ROWS=1e9
+ONE_HUNDRED_THOUSAND_ROWS=1e5
+def test_block_sampling_small_population_uses_bernoulli(mock_args):
+    mock_args[0].population_size=ONE_HUNDRED_THOUSAND_ROWS
+    block=BlockSampling(min_sample_size=5000)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'BERNOULLI'
+    assert block.sample_method.rows == 5000
+    mock_args[1].scalar_query.assert_not_called()
+
+def test_block_sampling_large_population_uses_system(mock_args):
+    # GIVEN: ONE_BILLION_ROWS over the default population threshold
+    #        the min_sample_size is 100000
+    #        expectation - 0.01% of the blocks to be sampled
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    block=BlockSampling(min_sample_size=100000)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'SYSTEM'
+    assert block.sample_method.probability == 0.01
+    assert block.size == 100000
+
+def test_block_sampling_byte_threshold(mock_args):
+    mock_args[0].population_size=ONE_HUNDRED_THOUSAND_ROWS
+    mock_args[1].scalar_query.return_value=5 * 1024 ** 4
+    block=BlockSampling(min_sample_size=5000, min_population=None, min_bytes=1024 ** 4)
+    block.prepare(*mock_args)
+
+    mock_args[1].relation_bytes_statement.assert_called_once_with(mock_args[0])
+    assert block.sample_method.name == 'SYSTEM'
+    assert block.sample_method.probability == 5.0
+
+def test_block_sampling_byte_threshold_not_reached(mock_args):
+    mock_args[0].population_size=ONE_HUNDRED_THOUSAND_ROWS
+    mock_args[1].scalar_query.return_value=None
+    block=BlockSampling(min_sample_size=5000, min_population=None, min_bytes=1024 ** 4)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'BERNOULLI'
+
+def test_block_sampling_views_use_bernoulli(mock_args):
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[0].is_view=True
+    block=BlockSampling(min_sample_size=100000)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'BERNOULLI'
+
+def test_block_sampling_relations_without_storage_use_bernoulli(mock_args):
+    # views copied as tables report no bytes
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[1].scalar_query.return_value=None
+    block=BlockSampling(min_sample_size=100000)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'BERNOULLI'
+    assert block.sample_method.rows == 100000
+
+def test_block_sampling_filtered_sample_method(mock_args):
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    block=BlockSampling(min_sample_size=100000)
+    block.prepare(*mock_args)
+
+    assert block.sample_method.name == 'SYSTEM'
+    assert block.filtered_sample_method.name == 'BERNOULLI'
+    assert block.filtered_sample_method.rows == 100000
@@ -7,6 +7,7 @@ from snowshu.samplings.samplings import BruteForceSampling
 @pytest.fixture()
 def mock_args():
     mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
     mock_source_adapter=mock.MagicMock()
     yield mock_rel,mock_source_adapter
 
@@ -8,8 +8,8 @@ from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
 from snowshu.core.compile import RuntimeSourceCompiler
 from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.relation import Relation
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
-from snowshu.samplings.samplings import DefaultSampling
+from snowshu.samplings.sample_methods import BernoulliSampleMethod, HashSampleMethod, SystemSampleMethod
+from snowshu.samplings.samplings import BlockSampling, DefaultSampling, HashSampling, RecentWindowSampling
 from tests.common import query_equalize
 from tests.conftest import RelationTestHelper
 
@@ -290,7 +290,24 @@ def test_run_deps_bidirectional_include_outliers(stub_relation_set):
     with patch.object(adapter, 'predicate_constraint_statement', new=_mock.predicate_constraint_statement):
         RuntimeSourceCompiler.compile_queries_for_relation(downstream, dag, adapter, False)
 
-    assert query_equalize(downstream.compiled_query)==query_equalize(f"""
+    def with_outliers(relation, sample, constraint):
+        return f"""
+        WITH {relation.scoped_cte('SNOWSHU_SAMPLE')} AS ( {sample} )
+        ,{relation.scoped_cte('SNOWSHU_OUTLIERS')} AS (
+        SELECT * FROM {adapter.quoted_dot_notation(relation)} AS snowshu_subject
+        WHERE (snowshu_subject.id IS NOT NULL AND NOT EXISTS
+            (SELECT 1 FROM {adapter.quoted_dot_notation(constraint)} AS snowshu_constraint
+             WHERE snowshu_constraint.id = snowshu_subject.id))
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY snowshu_subject.id ORDER BY snowshu_subject.id) = 1
+        LIMIT 100 )
+        SELECT * FROM {relation.scoped_cte('SNOWSHU_SAMPLE')}
+        UNION ALL
+        SELECT * FROM {relation.scoped_cte('SNOWSHU_OUTLIERS')} AS snowshu_outlier
+        WHERE NOT EXISTS (SELECT 1 FROM {relation.scoped_cte('SNOWSHU_SAMPLE')} AS snowshu_sampled
+            WHERE snowshu_sampled.id IS NOT DISTINCT FROM snowshu_outlier.id)
+        """
+
+    assert query_equalize(downstream.compiled_query)==query_equalize(with_outliers(downstream, f"""
         WITH {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} AS (
         SELECT
                 *
@@ -298,12 +315,10 @@ def test_run_deps_bidirectional_include_outliers(stub_relation_set):
         WHERE id IN (1,2,3) )
         ,{downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')} AS (
             SELECT * FROM {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} SAMPLE BERNOULLI (1500 ROWS) )
-        SELECT * FROM {downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')} UNION
-        (SELECT * FROM {adapter.quoted_dot_notation(downstream)} WHERE id NOT IN (SELECT id FROM {adapter.quoted_dot_notation(upstream)}) LIMIT 100)
-        """)
-
+        SELECT * FROM {downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
+        """, upstream))
 
-    assert query_equalize(upstream.compiled_query)==query_equalize(f"""
+    assert query_equalize(upstream.compiled_query)==query_equalize(with_outliers(upstream, f"""
         WITH {upstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} AS (
         SELECT * FROM
         {adapter.quoted_dot_notation(upstream)}
@@ -321,20 +336,91 @@ def test_run_deps_bidirectional_include_outliers(stub_relation_set):
             *
         FROM
             {upstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
-        UNION
-        (SELECT
-            *
-        FROM
-        {adapter.quoted_dot_notation(upstream)}
-        WHERE
-            id
-        NOT IN
-            (SELECT
-                id
-            FROM
-        {adapter.quoted_dot_notation(downstream)}) LIMIT 100)
-        """
-        )
+        """, downstream))
+
+
+def test_run_deps_directional_outliers_from_samples(stub_relation_set):
+    """ all edges share one outlier scan, matched against the parent sample when asked to """
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    grandparent=stub_relation_set.iso_relation
+    for relation in (downstream,upstream,grandparent,):
+        relation.attributes=[Attribute('id',dt.INTEGER),Attribute('other_id',dt.INTEGER)]
+        relation=stub_out_sampling(relation)
+        relation.temp_schema = 'mock_schema'
+    downstream.include_outliers=True
+    downstream.outliers_from_samples=True
+    downstream.max_number_of_outliers=10
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='id')
+    dag.add_edge(grandparent,downstream,direction="directional",remote_attribute='id',local_attribute='other_id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement', return_value='1=1'):
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,False)
+
+    compiled=query_equalize(downstream.compiled_query)
+    assert compiled.count(f"FROM {adapter.quoted_dot_notation(downstream)} AS snowshu_subject") == 1
+    assert query_equalize(f"""
+        WHERE (snowshu_subject.id IS NOT NULL AND NOT EXISTS
+            (SELECT 1 FROM {upstream.temp_dot_notation} AS snowshu_constraint WHERE snowshu_constraint.id = snowshu_subject.id))
+        OR (snowshu_subject.other_id IS NOT NULL AND NOT EXISTS
+            (SELECT 1 FROM {grandparent.temp_dot_notation} AS snowshu_constraint WHERE snowshu_constraint.id = snowshu_subject.other_id))
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY snowshu_subject.id, snowshu_subject.other_id ORDER BY snowshu_subject.id) = 1
+        LIMIT 10
+    """) in compiled
+    assert " UNION ALL " in compiled and " UNION SELECT" not in compiled
+
+
+def test_run_deps_directional_outliers_from_samples_analyze(stub_relation_set):
+    """ analyze creates no temp tables, outliers are matched against the parent population """
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    for relation in (downstream,upstream,):
+        relation.attributes=[Attribute('id',dt.INTEGER)]
+        relation=stub_out_sampling(relation)
+        relation.temp_schema = 'mock_schema'
+    downstream.include_outliers=True
+    downstream.outliers_from_samples=True
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement', return_value='1=1'):
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,True)
+
+    compiled=query_equalize(downstream.compiled_query)
+    assert upstream.temp_dot_notation not in compiled
+    assert query_equalize(f"""
+        (SELECT 1 FROM {adapter.quoted_dot_notation(upstream)} AS snowshu_constraint
+         WHERE snowshu_constraint.id = snowshu_subject.id)
+    """) in compiled
+
+
+def test_block_sampled_constrained_relation_samples_rows(stub_relation_set):
+    """ blocks cannot be sampled from the filtered rows, the wrapping sample falls back to rows """
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    for relation in (downstream,upstream,):
+        relation.attributes=[Attribute('id',dt.INTEGER)]
+        relation=stub_out_sampling(relation)
+        relation.temp_schema = 'mock_schema'
+    downstream.sampling=BlockSampling()
+    downstream.sampling.size=2000
+    downstream.sampling.sample_method=SystemSampleMethod(0.5)
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement', return_value='id IN (1,2,3)'):
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,False)
+
+    compiled=query_equalize(downstream.compiled_query)
+    assert "SAMPLE SYSTEM" not in compiled
+    assert query_equalize(f"{downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} SAMPLE BERNOULLI (2000 ROWS)") in compiled
 
 
 def test_run_deps_bidirectional_exclude_outliers(stub_relation_set):
@@ -1036,4 +1122,148 @@ def test_run_deps_mixed_multi_deps():
             *
         FROM
         {relations['rel_e'].scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
-    """)
\ No newline at end of file
+    """)
+
+
+def stub_out_hash_sampling(rel:Relation, key:str=None)->Relation:
+    rel.sampling=HashSampling(key=key)
+    rel.sampling.sample_method=HashSampleMethod(0.1,key=key,buckets=100)
+    return rel
+
+
+def test_run_deps_directional_hash_propagation(stub_relation_set):
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    for relation in (downstream,upstream,):
+        relation.attributes=[Attribute('id',dt.INTEGER),Attribute('upstream_id',dt.INTEGER)]
+        relation.temp_schema = 'mock_schema'
+    upstream=stub_out_hash_sampling(upstream,'id')
+    downstream=stub_out_sampling(downstream)
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='ID',local_attribute='upstream_id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement') as predicate_constraint_statement:
+        upstream = RuntimeSourceCompiler.compile_queries_for_relation(upstream,dag,adapter,False)
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,False)
+    # the upstream temp table is never read
+    predicate_constraint_statement.assert_not_called()
+
+    assert query_equalize(upstream.compiled_query)==query_equalize(f"""
+        SELECT
+            *
+        FROM
+        {adapter.quoted_dot_notation(upstream)}
+        WHERE MOD(ABS(HASH(id::VARCHAR)), 100) < 10
+    """)
+    assert query_equalize(downstream.compiled_query)==query_equalize(f"""
+        WITH
+        {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} AS (
+        SELECT
+            *
+        FROM
+        {adapter.quoted_dot_notation(downstream)}
+        WHERE MOD(ABS(HASH(upstream_id::VARCHAR)), 100) < 10
+        )
+        ,{downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')} AS (
+        SELECT
+            *
+        FROM
+        {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} SAMPLE BERNOULLI (1500 ROWS)
+        )
+        SELECT
+            *
+        FROM
+        {downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
+    """)
+
+
+def test_run_deps_directional_hash_not_propagated_when_restricted(stub_relation_set):
+    """ a hash sampled parent that is itself constrained holds fewer rows than its hash buckets """
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    grandparent=stub_relation_set.iso_relation
+    for relation in (downstream,upstream,grandparent,):
+        relation.attributes=[Attribute('id',dt.INTEGER)]
+        relation.temp_schema = 'mock_schema'
+    upstream=stub_out_hash_sampling(upstream,'id')
+    downstream=stub_out_hash_sampling(downstream,'id')
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(grandparent,upstream,direction="directional",remote_attribute='id',local_attribute='id')
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement', return_value='id IN (1,2,3)') as predicate_constraint_statement:
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,False)
+    predicate_constraint_statement.assert_called_once_with(upstream, False, 'id', 'id')
+
+    assert query_equalize(downstream.compiled_query)==query_equalize(f"""
+        SELECT
+            *
+        FROM
+        {adapter.quoted_dot_notation(downstream)}
+        WHERE id IN (1,2,3) AND MOD(ABS(HASH(id::VARCHAR)), 100) < 10
+    """)
+
+
+def test_run_deps_directional_recent_window(stub_relation_set):
+    """ the window is a predicate on the relation next to the directional one, sampling is applied after both """
+    upstream=stub_relation_set.upstream_relation
+    downstream=stub_relation_set.downstream_relation
+    for relation in (downstream,upstream,):
+        relation.attributes=[Attribute('id',dt.INTEGER),Attribute('upstream_id',dt.INTEGER)]
+        relation.temp_schema = 'mock_schema'
+    upstream=stub_out_sampling(upstream)
+    downstream.sampling=RecentWindowSampling('created_at',days=30)
+    downstream.sampling.sample_method=BernoulliSampleMethod(1500,units='rows')
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(upstream,downstream,direction="directional",remote_attribute='id',local_attribute='upstream_id')
+    adapter=SnowflakeAdapter()
+
+    with patch.object(adapter, 'predicate_constraint_statement', return_value='upstream_id IN (1,2,3)'):
+        downstream = RuntimeSourceCompiler.compile_queries_for_relation(downstream,dag,adapter,False)
+
+    assert query_equalize(downstream.compiled_query)==query_equalize(f"""
+        WITH
+        {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} AS (
+        SELECT
+            *
+        FROM
+        {adapter.quoted_dot_notation(downstream)}
+        WHERE created_at >= DATEADD(DAY, -30, CURRENT_TIMESTAMP()) AND upstream_id IN (1,2,3)
+        )
+        ,{downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')} AS (
+        SELECT
+            *
+        FROM
+        {downstream.scoped_cte('SNOWSHU_FINAL_SAMPLE')} SAMPLE BERNOULLI (1500 ROWS)
+        )
+        SELECT
+            *
+        FROM
+        {downstream.scoped_cte('SNOWSHU_DIRECTIONAL_SAMPLE')}
+    """)
+
+
+def test_run_deps_bidirectional_recent_window(stub_relation_set):
+    """ a relation bidirectionally constrained by a windowed relation only matches the rows of the window """
+    left=stub_relation_set.birelation_left
+    right=stub_relation_set.birelation_right
+    for relation in (left,right,):
+        relation.temp_schema = 'mock_schema'
+    left=stub_out_sampling(left)
+    right.sampling=RecentWindowSampling('created_at',start='2023-01-01')
+    right.sampling.sample_method=BernoulliSampleMethod(1500,units='rows')
+
+    dag=nx.MultiDiGraph()
+    dag.add_edge(left,right,direction="bidirectional",remote_attribute='left_id',local_attribute='id')
+    adapter=SnowflakeAdapter()
+
+    left = RuntimeSourceCompiler.compile_queries_for_relation(left,dag,adapter,False)
+
+    assert query_equalize(f"""
+        WHERE left_id in (SELECT id FROM {adapter.quoted_dot_notation(right)} WHERE created_at >= '2023-01-01')
+    """) in query_equalize(left.compiled_query)
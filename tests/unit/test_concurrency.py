@@ -0,0 +1,105 @@
+import threading
+from unittest import mock
+
+import pytest
+
+from snowshu.core import concurrency, run_report
+from snowshu.core.concurrency import AIMDController
+
+
+def test_additive_increase_within_maximum():
+    controller = AIMDController('source', 1, 3)
+    for _ in range(10):
+        with controller.slot('fetch'):
+            pass
+    assert controller.current == 3
+
+
+def test_multiplicative_decrease_on_slow_and_failed_queries():
+    controller = AIMDController('source', 2, 20, initial=16)
+    # usual fetches take 1s
+    with mock.patch('snowshu.core.concurrency.time.perf_counter', side_effect=[0.0, 1.0, 0.0, 10.0]):
+        with controller.slot('fetch'):
+            pass
+        assert controller.limit == pytest.approx(16 + 1 / 16)
+        with controller.slot('fetch'):
+            pass
+    assert controller.current == 8
+    # slow queries of another kind are compared against their own latency
+    assert set(controller.latencies) == {'fetch'}
+
+    with pytest.raises(ValueError):
+        with controller.slot('count_check'):
+            raise ValueError('failed')
+    assert controller.current == 4
+    controller.congestion()
+    controller.congestion()
+    assert controller.current == 2
+
+
+def test_one_decrease_per_round_in_flight():
+    controller = AIMDController('source', 1, 8, initial=8)
+    entered, release = threading.Barrier(3), threading.Event()
+
+    def failing():
+        with pytest.raises(ValueError):
+            with controller.slot('fetch'):
+                entered.wait()
+                release.wait()
+                raise ValueError('failed')
+
+    threads = [threading.Thread(target=failing) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    entered.wait()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert controller.current == 4
+
+
+def test_slots_wait_for_limit():
+    controller = AIMDController('target', 1, 1)
+    entered, release = threading.Event(), threading.Event()
+    order = []
+
+    def hold():
+        with controller.slot('load'):
+            entered.set()
+            release.wait()
+            order.append('first')
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    entered.wait()
+
+    def wait():
+        with controller.slot('load'):
+            order.append('second')
+
+    second = threading.Thread(target=wait)
+    second.start()
+    second.join(0.1)
+    assert order == [] and controller.in_use == 1
+    release.set()
+    thread.join()
+    second.join(1)
+    assert order == ['first', 'second'] and controller.in_use == 0
+
+
+def test_bound_slots():
+    source = AIMDController('source', 1, 1)
+    # nothing is gated outside of a bound run
+    with concurrency.slot(concurrency.SOURCE):
+        assert source.in_use == 0
+    with concurrency.bind(source=source, target=None):
+        with run_report.phase('fetch'), concurrency.slot(concurrency.SOURCE):
+            assert source.in_use == 1
+            # a held slot is not taken twice
+            with concurrency.slot(concurrency.SOURCE):
+                assert source.in_use == 1
+            with concurrency.slot(concurrency.TARGET):
+                pass
+        concurrency.record_congestion()
+    assert set(source.latencies) == {'query'}
+    assert source.limit == 1
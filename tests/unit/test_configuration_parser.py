@@ -8,7 +8,7 @@ import pytest
 import yaml
 from jsonschema.exceptions import ValidationError
 
-from snowshu.configs import DEFAULT_MAX_NUMBER_OF_OUTLIERS
+from snowshu.configs import DEFAULT_BATCH_FETCH_MAX_ROWS, DEFAULT_FETCH_PARTITIONS, DEFAULT_MAX_NUMBER_OF_OUTLIERS
 from snowshu.core.configuration_parser import ConfigurationParser, REPLICA_JSON_SCHEMA, CREDENTIALS_JSON_SCHEMA, materializations
 from snowshu.samplings.samplings import DefaultSampling
 from tests.common import rand_string
@@ -138,6 +138,25 @@ def test_schema_verification(tmpdir, stub_creds, stub_configs):
     assert isinstance(cred_config, dict)
 
 
+@pytest.mark.parametrize('sampling, valid', [
+    ({'block': {'min_population': 1000, 'min_bytes': 1024}}, True),
+    ({'default': {'min_population': 1000}}, False),
+    ({'brute_force': {'min_bytes': 1024}}, False),
+])
+def test_schema_verification_block_only_params(tmpdir, stub_configs, sampling, valid):
+    """ the block thresholds are rejected by the samplings that do not take them """
+    replica_file = Path(tmpdir / 'replica_file.yml')
+    stub_configs = stub_configs()
+    stub_configs['source']['sampling'] = sampling
+    replica_file.write_text(json.dumps(stub_configs))
+
+    if valid:
+        ConfigurationParser()._get_dict_from_anything(replica_file, REPLICA_JSON_SCHEMA)
+    else:
+        with pytest.raises(ValidationError):
+            ConfigurationParser()._get_dict_from_anything(replica_file, REPLICA_JSON_SCHEMA)
+
+
 materialization_mappings_test_cases = [
     (   
         True,  # set to True
@@ -172,3 +191,39 @@ def test_materialization_mappings(condition, expected, stub_configs):
     parsed = ConfigurationParser().from_file_or_path(mock_config_file)
 
     assert parsed.source_profile.adapter.MATERIALIZATION_MAPPINGS == expected
+
+
+def test_builds_concurrency_controllers(stub_configs):
+    stub_configs = stub_configs()
+    stub_configs['threads'] = 6
+    stub_configs['concurrency'] = dict(source=dict(min=2, max=16), target=dict(min=1, max=4))
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+
+    assert (parsed.source_concurrency.minimum, parsed.source_concurrency.maximum) == (2, 16)
+    # the limits start at the thread count, within the configured range
+    assert parsed.source_concurrency.current == 6
+    assert parsed.target_concurrency.current == 4
+
+    del stub_configs['concurrency']
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.source_concurrency is None and parsed.target_concurrency is None
+
+
+def test_partitioned_fetch(stub_configs):
+    stub_configs = stub_configs()
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.partition_min_rows is None
+
+    stub_configs['source']['partitioned_fetch'] = dict(min_rows=1000)
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert (parsed.partition_min_rows, parsed.partitions) == (1000, DEFAULT_FETCH_PARTITIONS)
+
+
+def test_isolated_batches(stub_configs):
+    stub_configs = stub_configs()
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert parsed.isolated_batch_size is None
+
+    stub_configs['source']['isolated_batches'] = dict(size=50)
+    parsed = ConfigurationParser().from_file_or_path(StringIO(yaml.dump(stub_configs)))
+    assert (parsed.isolated_batch_size, parsed.batch_fetch_max_rows) == (50, DEFAULT_BATCH_FETCH_MAX_ROWS)
@@ -7,6 +7,7 @@ from snowshu.samplings.samplings import DefaultSampling
 @pytest.fixture()
 def mock_args():
     mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
     mock_source_adapter=mock.MagicMock()
     yield mock_rel,mock_source_adapter
 
@@ -37,3 +38,33 @@ def test_default_sampling_override_min(mock_args):
     mock_args[0].population_size=ONE_HUNDRED_THOUSAND_ROWS
     default.prepare(*mock_args)
     assert default.sample_method.rows == 5000
+
+def test_default_sampling_max_allowed_bytes(mock_args):
+    # GIVEN: rows of ~2000 bytes and a budget of 1MB
+    #        expectation - the 4147 rows sample is lowered to 500 rows
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[1].scalar_query.return_value=2000.0
+    default=DefaultSampling(max_allowed_bytes=1000000)
+    default.prepare(*mock_args)
+
+    mock_args[1].average_row_bytes_statement.assert_called_once_with(mock_args[0])
+    assert default.sample_method.rows == 500
+    assert mock_args[0].projected_bytes == 1000000
+
+def test_default_sampling_relation_byte_budget(mock_args):
+    # the tighter of the sampling and relation (replica share) budgets wins
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[0].max_allowed_bytes=100000
+    mock_args[1].scalar_query.return_value=2000.0
+    default=DefaultSampling(max_allowed_bytes=1000000)
+    default.prepare(*mock_args)
+
+    assert default.sample_method.rows == 50
+
+def test_default_sampling_byte_budget_without_metadata(mock_args):
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[1].scalar_query.return_value=None
+    default=DefaultSampling(max_allowed_bytes=1000000)
+    default.prepare(*mock_args)
+
+    assert default.sample_method.rows == 4147
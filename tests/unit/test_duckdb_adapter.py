@@ -0,0 +1,201 @@
+import json
+import tempfile
+from unittest import mock
+
+import pytest
+from jsonschema.exceptions import ValidationError
+
+from snowshu.adapters.source_adapters.duckdb_adapter import (DuckdbAdapter, generate_synthetic_catalog,
+                                                             synthetic_parent)
+from snowshu.core.configuration_parser import ConfigurationParser
+from snowshu.core.models.credentials import Credentials
+from snowshu.core.models.materializations import TABLE, VIEW
+from snowshu.core.models.relation import Relation
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod, HashSampleMethod,
+                                              StratifiedSampleMethod, SystemSampleMethod)
+from tests.common import query_equalize
+
+
+@pytest.fixture
+def duckdb_source(tmpdir):
+    relations = generate_synthetic_catalog(tmpdir, databases=2, schemas=1, relations=2, rows=500)
+    adapter = DuckdbAdapter()
+    adapter.credentials = Credentials(database='db_0', host=str(tmpdir))
+    return adapter, relations
+
+
+def catalog_relation(adapter, dot_notation):
+    catalog = adapter.build_catalog([dict(database='.*', schema='.*', name='.*')], 2)
+    return next(rel for rel in catalog if rel.dot_notation == dot_notation)
+
+
+def test_build_catalog(duckdb_source):
+    adapter, relations = duckdb_source
+    catalog = adapter.build_catalog([dict(database='db_1', schema='schema_0', name='.*')], 2)
+
+    assert sorted(rel.dot_notation for rel in catalog) == [rel for rel in relations if rel.startswith('db_1')]
+    relation = next(iter(catalog))
+    assert [(attr.name, attr.data_type.name) for attr in relation.attributes] == [
+        ('id', 'bigint'),
+        ('parent_id', 'bigint'),
+        ('name', 'varchar'),
+        ('amount', 'decimal'),
+        ('created_at', 'timestamp_ntz'),
+        ('is_active', 'boolean')]
+
+
+def test_synthetic_catalog_is_deterministic(tmpdir, duckdb_source):
+    adapter, _ = duckdb_source
+    relation = catalog_relation(adapter, 'db_0.schema_0.relation_1')
+    fingerprint = adapter.scalar_query(adapter.change_fingerprint_statement(relation))
+
+    generate_synthetic_catalog(tmpdir, databases=2, schemas=1, relations=2, rows=500)
+    assert adapter.scalar_query(adapter.change_fingerprint_statement(relation)) == fingerprint
+    assert adapter.scalar_query(adapter.population_count_statement(relation)) == 500
+    # every parent id is an id of the parent relation
+    assert adapter.scalar_query("SELECT COUNT(*) FROM db_0.schema_0.relation_1 "
+                                "WHERE parent_id NOT IN (SELECT id FROM db_0.schema_0.relation_0)") == 0
+
+
+def test_synthetic_catalog_shape(tmpdir):
+    # a chain by default
+    assert [synthetic_parent(index) for index in range(4)] == [None, 0, 1, 2]
+    # trees of 3 levels with 2 children per relation
+    assert [synthetic_parent(index, 2, 3) for index in range(9)] == [None, 0, 0, 1, 1, 2, 2, None, 7]
+
+    parents = generate_synthetic_catalog(tmpdir, databases=1, schemas=1, relations=4, rows=10,
+                                         fan_out=3, columns=2, column_width=40, json_columns=1)
+    assert parents == {'db_0.schema_0.relation_0': None,
+                       'db_0.schema_0.relation_1': 'db_0.schema_0.relation_0',
+                       'db_0.schema_0.relation_2': 'db_0.schema_0.relation_0',
+                       'db_0.schema_0.relation_3': 'db_0.schema_0.relation_0'}
+    adapter = DuckdbAdapter()
+    adapter.credentials = Credentials(database='db_0', host=str(tmpdir))
+    relation = catalog_relation(adapter, 'db_0.schema_0.relation_3')
+    assert [(attr.name, attr.data_type.name) for attr in relation.attributes][-3:] == [
+        ('text_0', 'varchar'), ('text_1', 'varchar'), ('json_0', 'json')]
+    assert adapter.scalar_query("SELECT MIN(LENGTH(text_1)) FROM db_0.schema_0.relation_3") == 40
+
+
+def test_sample_clauses(duckdb_source):
+    adapter, _ = duckdb_source
+    relation = catalog_relation(adapter, 'db_0.schema_0.relation_0')
+
+    assert adapter._sample_type_to_query_sql(BernoulliSampleMethod(10)) == 'TABLESAMPLE RESERVOIR(10 ROWS)'
+    assert adapter._sample_type_to_query_sql(BernoulliSampleMethod(20, units='probability')) == \
+        'TABLESAMPLE BERNOULLI(20%)'
+    assert adapter._sample_type_to_query_sql(SystemSampleMethod(50)) == 'TABLESAMPLE SYSTEM(50%)'
+    with pytest.raises(NotImplementedError):
+        adapter._sample_type_to_query_sql(HashSampleMethod(0.1))
+
+    assert len(adapter.check_count_and_query(
+        adapter.sample_statement_from_relation(relation, BernoulliSampleMethod(10)), 10, False)) == 10
+    stratified = adapter.check_count_and_query(
+        adapter.sample_statement_from_relation(relation, StratifiedSampleMethod(['is_active'], 0.0, 2)), 4, False)
+    assert stratified['is_active'].value_counts().tolist() == [2, 2]
+    # keyless hash sampling hashes the entire row
+    hashed = adapter.sample_statement_from_relation(relation, None) + \
+        ' WHERE ' + adapter.hash_constraint_statement(None, HashSampleMethod(0.5, buckets=10))
+    assert 0 < adapter._count_query(hashed) < 500
+
+
+def test_temp_tables(duckdb_source):
+    adapter, _ = duckdb_source
+    relation = catalog_relation(adapter, 'db_0.schema_0.relation_0')
+    relation.temp_schema = 'db_0_schema_0_test'
+
+    adapter.generate_schema(relation.temp_schema)
+    adapter.create_table(adapter.sample_statement_from_relation(relation, BernoulliSampleMethod(20)),
+                         relation.name, relation.temp_schema)
+    assert adapter.create_key_table(relation, 'id') == 20
+    assert 'snowshu' not in adapter._get_all_databases()
+
+    adapter.drop_table(relation.name, relation.temp_schema)
+    adapter.clone_table(relation)
+    assert adapter.scalar_query(f"SELECT COUNT(*) FROM {relation.temp_dot_notation}") == 500
+    adapter.drop_schema(relation.temp_schema)
+    assert relation.temp_schema not in adapter._get_all_schemas('snowshu')
+
+
+def test_partitions_are_disjoint(duckdb_source):
+    adapter, _ = duckdb_source
+    relation = catalog_relation(adapter, 'db_0.schema_0.relation_0')
+    query = adapter.sample_statement_from_relation(relation, None)
+
+    ids = [adapter._safe_query(adapter.partition_statement(query, 4, partition))['id'].tolist()
+           for partition in range(4)]
+    assert sorted(sum(ids, [])) == list(range(500))
+    assert all(ids)
+
+
+def test_change_fingerprints(duckdb_source):
+    adapter, _ = duckdb_source
+    relation = catalog_relation(adapter, 'db_1.schema_0.relation_0')
+    missing = Relation('db_1', 'schema_0', 'missing', relation.materialization, [])
+    before = adapter.get_change_fingerprints([relation, missing])
+    assert list(before) == [relation.dot_notation]
+
+    adapter._execute("UPDATE db_1.schema_0.relation_0 SET name = 'changed' WHERE id = 1")
+    assert adapter.get_change_fingerprints([relation]) != before
+
+
+def test_view_creation_statement(duckdb_source):
+    adapter, _ = duckdb_source
+    adapter._execute("CREATE VIEW db_0.schema_0.recent AS SELECT id FROM db_0.schema_0.relation_0 WHERE id < 10")
+    view = Relation('db_0', 'schema_0', 'recent', VIEW, [])
+    assert query_equalize(adapter.scalar_query(adapter.view_creation_statement(view))) == \
+        query_equalize("SELECT id FROM db_0.schema_0.relation_0 WHERE id < 10")
+
+
+def test_latency(duckdb_source):
+    adapter, _ = duckdb_source
+    adapter.latency = 0.25
+    with mock.patch('snowshu.adapters.source_adapters.duckdb_adapter.time.sleep') as sleep:
+        adapter.scalar_query('SELECT 1')
+    # count and query
+    assert sleep.call_args_list == [mock.call(0.25), mock.call(0.25)]
+
+
+def test_duckdb_credentials(tmpdir, stub_configs):
+    stub_configs = stub_configs()
+    creds = dict(version='1', sources=[dict(name='default', adapter='duckdb', host=str(tmpdir), database='db_0')])
+    with tempfile.NamedTemporaryFile(mode='w') as mock_file:
+        json.dump(creds, mock_file)
+        mock_file.seek(0)
+        stub_configs['source']['profile'] = 'default'
+        stub_configs['credpath'] = mock_file.name
+        adapter_profile = ConfigurationParser()._build_adapter_profile('source', stub_configs)
+    assert isinstance(adapter_profile.adapter, DuckdbAdapter)
+    assert str(adapter_profile.adapter.directory) == str(tmpdir)
+
+    # other adapters still need an account
+    creds['sources'][0]['adapter'] = 'snowflake'
+    with tempfile.NamedTemporaryFile(mode='w') as mock_file:
+        json.dump(creds, mock_file)
+        mock_file.seek(0)
+        stub_configs['credpath'] = mock_file.name
+        with pytest.raises(ValidationError):
+            ConfigurationParser()._build_adapter_profile('source', stub_configs)
+
+
+def test_population_counts_and_queries_in_batch(duckdb_source):
+    adapter, _ = duckdb_source
+    relations = [catalog_relation(adapter, dot_notation)
+                 for dot_notation in ('db_1.schema_0.relation_1', 'db_0.schema_0.relation_0')]
+
+    assert adapter.get_population_counts(relations) == [500, 500]
+    first, second = adapter.query_many(["SELECT 1 AS id", "SELECT 'a' AS name UNION ALL SELECT 'b'"])
+    assert first['id'].tolist() == [1]
+    assert second['name'].tolist() == ['a', 'b']
+
+
+def test_view_definitions_read_with_catalog(duckdb_source):
+    adapter, _ = duckdb_source
+    adapter._execute("CREATE VIEW db_0.schema_0.recent AS SELECT id FROM db_0.schema_0.relation_0 WHERE id < 10")
+    adapter.MATERIALIZATION_MAPPINGS = {"BASE TABLE": TABLE, "VIEW": VIEW}
+
+    view = catalog_relation(adapter, 'db_0.schema_0.recent')
+    assert view.is_view
+    assert query_equalize(view.view_definition) == \
+        query_equalize("SELECT id FROM db_0.schema_0.relation_0 WHERE id < 10")
+    assert catalog_relation(adapter, 'db_0.schema_0.relation_0').view_definition is None
@@ -834,3 +834,33 @@ def test_graph_diff_with_existing_relationships():
 
     result_graph = SnowShuGraph.catalog_difference(shgraph, target_catalog)
     assert set(result_graph.nodes) == expected_nodes
+
+
+def test_refresh_difference():
+    """ Changed relations are sampled again with their descendants, other components are left out """
+    helper = RelationTestHelper()
+    root, child, grandchild, other_root, other_child = [
+        Relation(name=name, **helper.rand_relation_helper())
+        for name in ('ROOT', 'CHILD', 'GRANDCHILD', 'OTHER_ROOT', 'OTHER_CHILD')]
+
+    def edge(direction='directional'):
+        return dict(direction=direction, local_attribute='ID', remote_attribute='ID')
+
+    def build():
+        dag = nx.MultiDiGraph()
+        dag.add_edge(root, child, **edge())
+        dag.add_edge(child, grandchild, **edge())
+        dag.add_edge(other_root, other_child, **edge())
+        return dag
+
+    # a changed root takes its descendants along
+    assert set(SnowShuGraph.refresh_difference(build(), {root}).nodes) == {root, child, grandchild}
+    # nothing changed
+    assert not SnowShuGraph.refresh_difference(build(), set()).nodes
+    # a changed leaf is constrained on an upstream sample that is not taken again, so the component is
+    assert set(SnowShuGraph.refresh_difference(build(), {grandchild}).nodes) == {root, child, grandchild}
+    # a changed relation in a bidirectional edge changes the upstream sample too
+    dag = nx.MultiDiGraph()
+    dag.add_edge(root, child, **edge('bidirectional'))
+    dag.add_node(other_root)
+    assert set(SnowShuGraph.refresh_difference(dag, {child}).nodes) == {root, child}
@@ -1,12 +1,16 @@
 import copy
+import threading
 from unittest import mock
 from unittest.mock import ANY
 
+import networkx as nx
 import pandas as pd
 
-from snowshu.core.graph_set_runner import GraphExecutable, GraphSetRunner
+from snowshu.core.graph_set_runner import GraphExecutable, GraphSetRunner, MemoryGovernor
 from snowshu.samplings.samplings import DefaultSampling
+from snowshu.core.models.materializations import TABLE, VIEW
 from snowshu.core.models.relation import Relation
+from snowshu.storages import SampleStore
 
 
 def test_traverse_and_execute_analyze(stub_graph_set):
@@ -106,3 +110,383 @@ def test_traverse_and_execute_custom_max_rows_pass(stub_graph_set):
              mock.patch.object(Relation, 'data', new=fake_data):
             runner._traverse_and_execute(dag_executable)
             mock_2.assert_called_with(ANY, 1234567, ANY)
+
+
+def test_replica_byte_budget_reserved_and_settled(stub_relation_set):
+    source_adapter=mock.MagicMock()
+    runner=GraphSetRunner(max_allowed_bytes=1000000)
+    relation=stub_relation_set.iso_relation
+    relation.population_size=1e9
+    relation.temp_schema='mock_schema'
+    relation.sampling=DefaultSampling()
+    # ~2000 bytes per row in the source, the extracted sample takes 400000 bytes
+    source_adapter.scalar_query.side_effect=[2000.0, 400000]
+
+    runner._prepare_sampling(relation, source_adapter)
+
+    assert relation.max_allowed_bytes == 1000000
+    assert relation.sampling.sample_method.rows == 500
+    assert runner.byte_budget.remaining == 0
+
+    runner._measure_actual_bytes(relation, source_adapter)
+
+    assert relation.actual_bytes == 400000
+    assert runner.byte_budget.remaining == 600000
+
+
+def test_key_tables_created_for_outgoing_edges(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.create_key_table.return_value=10
+    runner=GraphSetRunner(key_tables=True)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])  # last graph in the set is the dag
+    executable=GraphExecutable(dag, source_adapter, target_adapter, False)
+
+    for relation in dag.nodes:
+        runner._create_key_tables(relation, executable)
+        keys={edge['remote_attribute'] for _, _, edge in dag.out_edges(relation, data=True)}
+        assert relation.key_table_sizes == {key: 10 for key in keys}
+        for key in keys:
+            source_adapter.create_key_table.assert_any_call(relation, key)
+
+
+def test_unsampled_relation_streamed_without_temp_table(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=1000
+    source_adapter.unsampled_statement.return_value='SELECT * FROM UNSAMPLED'
+    target_adapter.stream_data_into_relation.return_value=1000
+    runner=GraphSetRunner()
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])  # last graph in the set is the dag
+    for rel in dag.nodes:
+        rel.unsampled=True
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    source_adapter.create_table.assert_not_called()
+    source_adapter.check_count_and_query.assert_not_called()
+    target_adapter.create_and_load_relation.assert_not_called()
+    source_adapter.stream_query.assert_called_with('SELECT * FROM UNSAMPLED', ANY)
+    # only relations constrained on by others get a (zero-copy) temp table
+    cloned={call.args[0] for call in source_adapter.clone_table.call_args_list}
+    assert cloned == {rel for rel in dag.nodes if dag.out_degree(rel) > 0}
+    assert cloned
+    for rel in dag.nodes:
+        assert rel.sample_size == 1000
+        assert rel.target_loaded is True
+
+
+def test_graph_loaded_from_sample_store_on_next_run(stub_graph_set, tmpdir):
+    store=SampleStore(tmpdir)
+    graph_set,_=stub_graph_set
+
+    def run_graph(fingerprint='v1', **runner_kwargs):
+        source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+        source_adapter.scalar_query.return_value=1000
+        source_adapter.get_change_fingerprints.side_effect=lambda relations: {
+            rel.dot_notation: fingerprint for rel in relations}
+        source_adapter.sample_statement_from_relation.side_effect=lambda rel, _: f"SELECT * FROM {rel.name}"
+        source_adapter.predicate_constraint_statement.return_value='KEY IN (SELECT KEY FROM UPSTREAM)'
+        source_adapter.upstream_constraint_statement.return_value='KEY IN (SELECT KEY FROM DOWNSTREAM)'
+        source_adapter.directionally_wrap_statement.side_effect=lambda sql, *_: sql
+        source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(KEY=1), dict(KEY=2)])
+        dag=copy.deepcopy(graph_set[-1])  # last graph in the set is the dag
+        for rel in dag.nodes:
+            rel.unsampled=False
+            rel.include_outliers=False
+            rel.sampling=DefaultSampling()
+        runner=GraphSetRunner(sample_store=store, **runner_kwargs)
+        # the bytes of the samples held in memory while each relation is loaded
+        held=[]
+        target_adapter.create_and_load_relation.side_effect=lambda rel, data: held.append(
+            (runner.memory_governor.in_flight_bytes, int(data.memory_usage(deep=True).sum())))
+        runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+        return dag, source_adapter, target_adapter, held
+
+    dag, source_adapter, target_adapter, _=run_graph(max_memory_bytes=10 ** 9)
+    assert source_adapter.create_table.call_count == len(dag)
+    assert len(list(store.path.glob('*.parquet'))) == len(dag)
+    # a miss counts the population once per relation
+    assert source_adapter.population_count_statement.call_count == len(dag)
+
+    dag, source_adapter, target_adapter, held=run_graph(max_memory_bytes=10 ** 9)
+    source_adapter.create_table.assert_not_called()
+    source_adapter.check_count_and_query.assert_not_called()
+    # a hit runs nothing but the catalog fingerprint lookup
+    source_adapter.population_count_statement.assert_not_called()
+    source_adapter.scalar_query.assert_not_called()
+    source_adapter.get_change_fingerprints.assert_called_once()
+    assert target_adapter.create_and_load_relation.call_count == len(dag)
+    for rel in dag.nodes:
+        assert rel.sample_size == 2
+        assert rel.target_loaded is True
+    # stored samples are read one at a time within the memory limit
+    assert all(in_flight == sample_bytes for in_flight, sample_bytes in held)
+
+    # changed source tables are extracted again
+    dag, source_adapter, target_adapter, _=run_graph(fingerprint='v2', max_memory_bytes=10 ** 9)
+    assert source_adapter.create_table.call_count == len(dag)
+
+
+def test_run_report_records_phases(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=1000
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(id=1)] * 10)
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    runner=GraphSetRunner()
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])  # last graph in the set is the dag
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    assert set(runner.run_report.relations) == {rel.dot_notation for rel in dag.nodes}
+    for metrics in runner.run_report.relations.values():
+        assert set(metrics.phases) == {'schema_generation', 'population_count', 'prepare', 'compile', 'temp_table'}
+        assert (metrics.rows, metrics.attempts, metrics.status) == (10, 1, 'success')
+
+
+def test_memory_governor_waits_for_in_flight_bytes():
+    governor=MemoryGovernor(100)
+    governor.acquire(60)
+    admitted=threading.Event()
+
+    def second():
+        governor.acquire(60)
+        admitted.set()
+
+    thread=threading.Thread(target=second)
+    thread.start()
+    assert not admitted.wait(0.1)
+    # settling under the estimate makes room
+    governor.settle(60, 30)
+    assert admitted.wait(1)
+    thread.join()
+    assert (governor.in_flight_bytes, governor.peak_bytes) == (90, 90)
+    governor.release(30)
+    governor.release(60)
+    # a sample over the limit on its own is still admitted
+    governor.acquire(500)
+    assert governor.in_flight_bytes == 500
+    assert not governor.fits(500)
+
+
+def test_sampled_relations_within_memory_limit(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=10
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(id=1)] * 10)
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    runner=GraphSetRunner(max_memory_bytes=10000)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    assert target_adapter.create_and_load_relation.call_count == len(dag)
+    source_adapter.stream_query.assert_not_called()
+    assert runner.memory_governor.in_flight_bytes == 0
+    assert 0 < runner.memory_governor.peak_bytes <= 10000
+
+
+def test_sampled_relations_over_memory_limit_spill(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=1000
+    source_adapter.stream_query.side_effect=lambda query, chunksize: iter([pd.DataFrame(dict(id=[1, 2])),
+                                                                           pd.DataFrame(dict(id=[None]))])
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    loaded=[]
+    target_adapter.stream_data_into_relation.side_effect=lambda relation, chunks: loaded.append(list(chunks))
+    runner=GraphSetRunner(max_memory_bytes=100)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    source_adapter.check_count_and_query.assert_not_called()
+    target_adapter.create_and_load_relation.assert_not_called()
+    assert len(loaded) == len(dag)
+    assert [chunk['id'].tolist() for chunk in loaded[0]][0] == [1, 2]
+    assert sum(len(chunk) for chunk in loaded[0]) == 3
+    assert all(rel.sample_size == 3 for rel in dag.nodes)
+
+
+def test_async_queries_submitted_per_generation(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.SUPPORTS_ASYNC_QUERIES=True
+    source_adapter.scalar_query.return_value=1000
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(id=1)] * 10)
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    source_adapter.submit_create_table.side_effect=lambda query, name, schema, database: name
+    source_adapter.wait_for_queries.side_effect=lambda query_ids: {query_id: 0.0 for query_id in query_ids}
+    runner=GraphSetRunner(async_queries=True)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    source_adapter.create_table.assert_not_called()
+    generations=[sorted(rel.name for rel in generation) for generation in nx.topological_generations(dag)]
+    assert [sorted(call.args[0]) for call in source_adapter.wait_for_queries.call_args_list] == generations
+    assert target_adapter.create_and_load_relation.call_count == len(dag)
+    assert all(rel.target_loaded and rel.sample_size == 10 for rel in dag.nodes)
+    for metrics in runner.run_report.relations.values():
+        assert (metrics.attempts, metrics.retries, metrics.status) == (1, 0, 'success')
+        assert 'temp_table' in metrics.phases
+
+
+def test_large_relations_transferred_in_partitions(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=1000
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    source_adapter.partition_statement.side_effect=lambda query, partitions, partition: f"{partition} of {partitions}"
+    source_adapter.stream_query.side_effect=lambda query, chunksize: iter([pd.DataFrame(dict(id=[1, 2]))] * 2)
+    runner=GraphSetRunner(partition_min_rows=500, partitions=3)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+    relation=next(iter(nx.topological_sort(dag)))
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    source_adapter.check_count_and_query.assert_not_called()
+    assert sorted(call.args[0] for call in source_adapter.stream_query.call_args_list) == \
+        sorted([f"{partition} of 3" for partition in range(3)] * len(dag))
+    loads=[call for call in target_adapter.load_data_into_relation.call_args_list if call.args[0] is relation]
+    # the relation is created empty, then every partition appends its chunks
+    assert loads[0].args[1].empty and 'if_exists' not in loads[0].kwargs
+    assert [call.kwargs['if_exists'] for call in loads[1:]] == ['append'] * 6
+    assert all(rel.sample_size == 12 for rel in dag.nodes)
+    assert 'partitioned_transfer' in runner.run_report.relations[relation.dot_notation].phases
+
+
+def test_small_relations_not_partitioned(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=100
+    source_adapter.check_count_and_query.return_value=pd.DataFrame([dict(id=1)] * 10)
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    runner=GraphSetRunner(partition_min_rows=500)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+
+    runner._traverse_and_execute(GraphExecutable(dag, source_adapter, target_adapter, False))
+
+    source_adapter.stream_query.assert_not_called()
+    assert target_adapter.create_and_load_relation.call_count == len(dag)
+
+
+def test_isolated_relations_counted_and_fetched_in_batches(stub_graph_set):
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.predicate_constraint_statement.return_value=str()
+    source_adapter.upstream_constraint_statement.return_value=str()
+    source_adapter.sample_statement_from_relation.return_value=str()
+    populations={f"lookup_{i}": 10 for i in range(4)}
+    populations['lookup_4']=5000
+    source_adapter.get_population_counts.side_effect=lambda relations: [populations[rel.name] for rel in relations]
+    source_adapter.query_many.side_effect=lambda queries: [pd.DataFrame(dict(id=range(10))) for _ in queries]
+    source_adapter.check_count_and_query.return_value=pd.DataFrame(dict(id=range(100)))
+    isolated=[]
+    for name in populations:
+        graph=nx.MultiDiGraph()
+        relation=Relation('db', 'schema', name, TABLE, [])
+        relation.unsampled=False
+        relation.include_outliers=False
+        relation.sampling=DefaultSampling()
+        graph.add_node(relation)
+        graph.contains_views=False
+        isolated.append(graph)
+    graph_set,_=stub_graph_set
+    dag=copy.deepcopy(graph_set[-1])
+    dag.contains_views=False
+    for rel in dag.nodes:
+        rel.unsampled=False
+        rel.include_outliers=False
+        rel.sampling=DefaultSampling()
+    source_adapter.scalar_query.return_value=100
+    runner=GraphSetRunner(isolated_batch_size=3, batch_fetch_max_rows=1000)
+
+    runner.execute_graph_set(isolated + [dag], source_adapter, target_adapter, 2, 0)
+
+    assert sorted(len(call.args[0]) for call in source_adapter.get_population_counts.call_args_list) == [2, 3]
+    # the relation over the max fetch rows goes through a temp table, the others are fetched with their batch
+    assert sorted(len(call.args[0]) for call in source_adapter.query_many.call_args_list) == [1, 3]
+    temp_tables=sorted(call.kwargs['name'] for call in source_adapter.create_table.call_args_list)
+    assert temp_tables == sorted(['lookup_4'] + [rel.name for rel in dag.nodes])
+    relations=[next(iter(graph.nodes)) for graph in isolated]
+    assert all(rel.target_loaded for rel in relations)
+    assert [rel.sample_size for rel in relations] == [10, 10, 10, 10, 100]
+    for name in populations:
+        metrics=runner.run_report.relations[f"db.schema.{name}"]
+        assert metrics.status == 'success' and 'population_count' in metrics.phases
+
+
+def test_views_created_in_dependency_order():
+    source_adapter,target_adapter=[mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value=10
+    source_adapter.view_creation_statement.return_value='GET_DDL'
+    definitions=dict(base_v='SELECT id FROM db.schema.orders',
+                     middle_v='SELECT id FROM base_v',
+                     top_v='SELECT m.id FROM "SCHEMA"."MIDDLE_V" m JOIN base_v USING (id)',
+                     # names that are not selected from are no dependencies
+                     column_v='SELECT top_v, middle_v AS base_v FROM db.schema.orders',
+                     other_v=None)
+    graphs=[]
+    for name, definition in definitions.items():
+        graph=nx.MultiDiGraph()
+        view=Relation('db', 'schema', name, VIEW, [])
+        view.sampling=DefaultSampling()
+        view.view_definition=definition
+        graph.add_node(view)
+        graph.contains_views=True
+        graphs.append(graph)
+    created=[]
+    target_adapter.create_and_load_relation.side_effect=lambda relation, data: created.append(relation.name)
+
+    runner=GraphSetRunner()
+    assert [sorted(next(iter(graph.nodes)).name for graph in generation)
+            for generation in runner._view_generations(graphs[::-1])] == \
+        [['base_v', 'column_v', 'other_v'], ['middle_v'], ['top_v']]
+    runner.execute_graph_set(graphs[::-1], source_adapter, target_adapter, 4, 0)
+
+    assert created.index('base_v') < created.index('middle_v') < created.index('top_v')
+    # views are neither counted nor sampled, only the view without a definition from the catalog looks up its DDL
+    assert [call.args[0] for call in source_adapter.scalar_query.call_args_list] == ['GET_DDL']
+    source_adapter.population_count_statement.assert_not_called()
+    source_adapter.create_schema_if_not_exists.assert_not_called()
+    views={next(iter(graph.nodes)).name: next(iter(graph.nodes)) for graph in graphs}
+    assert views['middle_v'].view_ddl == 'SELECT id FROM base_v'
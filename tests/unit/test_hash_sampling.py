@@ -0,0 +1,52 @@
+from unittest import mock
+import pytest
+
+from snowshu.samplings.sample_methods import HashSampleMethod
+from snowshu.samplings.samplings import HashSampling
+from snowshu.core.samplings.utils import get_sampling_from_partial
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
+    mock_source_adapter=mock.MagicMock()
+    yield mock_rel,mock_source_adapter
+
+
+ONE_BILLION_ROWS=1e9
+ONE_HUNDRED_THOUSAND_ROWS=1e5
+def test_hash_sampling_stock(mock_args):
+    mock_args[0].population_size=ONE_HUNDRED_THOUSAND_ROWS
+    hash_sampling=HashSampling()
+    hash_sampling.prepare(*mock_args)
+
+    assert hash_sampling.sample_method.name == 'HASH'
+    assert hash_sampling.sample_method.key is None
+    assert hash_sampling.sample_method.threshold == 1000
+    assert hash_sampling.size == 10000
+
+def test_hash_sampling_max(mock_args):
+    # GIVEN: 10% of ONE_BILLION_ROWS to be sampled with max_allowed_rows of 1000000
+    #        expectation - the kept buckets shrink to 0.1%
+    hash_sampling=HashSampling(key='ID', max_allowed_rows=1000000)
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    hash_sampling.prepare(*mock_args)
+
+    assert hash_sampling.sample_method.key == 'ID'
+    assert hash_sampling.sample_method.threshold == 10
+    assert hash_sampling.size == 1000000
+
+def test_hash_sample_method_keeps_a_bucket():
+    # GIVEN: a probability below half a bucket
+    #        expectation - one bucket is kept rather than none, no probability keeps nothing
+    assert HashSampleMethod(0.0004, buckets=1000).threshold == 1
+    assert HashSampleMethod(0.0006, buckets=1000).threshold == 1
+    assert HashSampleMethod(0.0015, buckets=1000).threshold == 2
+    assert HashSampleMethod(0, buckets=1000).threshold == 0
+
+def test_hash_sampling_from_partial():
+    hash_sampling=get_sampling_from_partial({'hash': {'key': 'USER_ID', 'probability': 0.2, 'buckets': 100}})
+
+    assert isinstance(hash_sampling, HashSampling)
+    assert (hash_sampling.key, hash_sampling.probability, hash_sampling.buckets,) == ('USER_ID', 0.2, 100,)
@@ -99,13 +99,13 @@ def test_custom_cli_input_create(create, load, temporary_replica):  # noqa pylin
     runner = CliRunner()
     # test create
     runner.invoke(main.cli, ('create'))
-    create.assert_called_with(name=ANY, barf=ANY, retry_count=1)
+    create.assert_called_with(name=ANY, barf=ANY, retry_count=1, plan=None)
 
     runner.invoke(main.cli, ('create --retry-count 5'))
-    create.assert_called_with(name=ANY, barf=ANY, retry_count=5)
+    create.assert_called_with(name=ANY, barf=ANY, retry_count=5, plan=None)
 
     runner.invoke(main.cli, ('create -r 50'))
-    create.assert_called_with(name=ANY, barf=ANY, retry_count=50)
+    create.assert_called_with(name=ANY, barf=ANY, retry_count=50, plan=None)
 
 
 @patch('snowshu.core.main.ReplicaFactory.load_config')
@@ -173,6 +173,8 @@ def test_custom_retry_count_passed_correctly_through_execute(graph_to_result_lis
             # disable any target related functions
             replica.config.target_profile.adapter = MagicMock()
             replica.config.target_profile.adapter.copy_replica_data = MagicMock(return_value=(0, ANY))
+            # and the source fingerprints stored with the replica
+            replica.config.source_profile.adapter.get_change_fingerprints = MagicMock(return_value=dict())
 
             replica._execute(name=None, barf=False)  # noqa pylint: disable=protected-access
             execute_graph_set_mock.assert_called_with(ANY,
@@ -0,0 +1,90 @@
+import copy
+from io import StringIO
+from unittest import mock
+
+import networkx as nx
+import yaml
+
+from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.core.configuration_parser import ConfigurationParser
+from snowshu.core.graph import SnowShuGraph
+from snowshu.core.plan import ExecutionPlan, replica_file_hash
+from snowshu.core.replica.replica_factory import ReplicaFactory
+from tests.conftest import CONFIGURATION
+
+
+def stub_plan_graph(vals) -> SnowShuGraph:
+    graph = SnowShuGraph()
+    dag = nx.MultiDiGraph()
+    dag.add_node(vals.iso_relation)
+    dag.add_edge(vals.upstream_relation, vals.downstream_relation, direction='directional',
+                 local_attribute=vals.directional_key, remote_attribute=vals.directional_key)
+    graph.graph = dag
+    return graph
+
+
+def test_replica_file_hash_rewinds_streams():
+    config = StringIO(yaml.dump(CONFIGURATION))
+    assert replica_file_hash(config) == replica_file_hash(StringIO(yaml.dump(CONFIGURATION)))
+    assert config.read() == yaml.dump(CONFIGURATION)
+
+    changed = copy.deepcopy(CONFIGURATION)
+    changed['threads'] = 3
+    assert replica_file_hash(CONFIGURATION) != replica_file_hash(changed)
+
+
+def test_plan_round_trip(tmpdir, stub_relation_set, stub_replica_configuration):
+    vals = stub_relation_set
+    graph = stub_plan_graph(vals)
+    for relation in graph.graph.nodes:
+        SnowShuGraph._set_globals_for_node(relation, stub_replica_configuration)
+    source_adapter = mock.MagicMock(wraps=SnowflakeAdapter())
+    source_adapter.scalar_query = mock.MagicMock(return_value=100000)
+
+    plan = ExecutionPlan.build(graph, source_adapter, 'abc123')
+    path = tmpdir / 'plan.json'
+    plan.save(path)
+    loaded = ExecutionPlan.load(path, stub_replica_configuration)
+
+    assert loaded.replica_file_hash == 'abc123'
+    assert set(loaded.graph.nodes) == set(graph.graph.nodes)
+    upstream, downstream, edge = next(iter(loaded.graph.edges(data=True)))
+    assert (upstream, downstream) == (vals.upstream_relation, vals.downstream_relation)
+    assert edge == dict(direction='directional',
+                        local_attribute=vals.directional_key,
+                        remote_attribute=vals.directional_key)
+    downstream = next(rel for rel in loaded.graph.nodes if rel == vals.downstream_relation)
+    assert downstream.attributes[0].name == vals.directional_key
+    assert downstream.attributes[0].data_type.name == 'integer'
+    assert downstream.sampling is stub_replica_configuration.sampling
+
+    steps = {step['relation']: step for step in loaded.steps}
+    assert steps[vals.upstream_relation.dot_notation]['order'] < steps[vals.downstream_relation.dot_notation]['order']
+    assert steps[vals.iso_relation.dot_notation]['population_size'] == 100000
+    assert steps[vals.iso_relation.dot_notation]['estimated_bytes'] is not None
+    # the downstream relation is constrained on the upstream sample query
+    assert vals.upstream_relation.core_query in steps[vals.downstream_relation.dot_notation]['query']
+
+
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_connected_subgraphs', return_value=[])
+def test_create_with_plan_skips_graph_build(_, build_graph, tmpdir, stub_relation_set):
+    config = yaml.dump(CONFIGURATION)
+    configs = ConfigurationParser().from_file_or_path(StringIO(config))
+    plan = ExecutionPlan(replica_file_hash(StringIO(config)),
+                         stub_plan_graph(stub_relation_set).graph)
+    path = tmpdir / 'plan.json'
+    plan.save(path)
+
+    replica = ReplicaFactory()
+    replica.load_config(StringIO(config))
+    replica.create(None, False, 1, plan=path)
+    build_graph.assert_not_called()
+
+    # a changed replica file invalidates the plan
+    changed = copy.deepcopy(CONFIGURATION)
+    changed['threads'] = 3
+    replica.load_config(StringIO(yaml.dump(changed)))
+    replica.create(None, False, 1, plan=path)
+    build_graph.assert_called_once()
+    assert configs.threads != replica.config.threads
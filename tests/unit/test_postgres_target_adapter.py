@@ -1,13 +1,25 @@
-from unittest.mock import MagicMock, ANY
+from unittest.mock import MagicMock, ANY, patch
 
+import pandas as pd
+import psycopg2
+import pytest
+import sqlalchemy
+from pandas import Series
 from pandas.core.frame import DataFrame
+from pandas.io.sql import SQLDatabase, SQLTable
+from sqlalchemy import BIGINT, Column, MetaData, Table
+from sqlalchemy.dialects import postgresql
 
 from snowshu.adapters.target_adapters.postgres_adapter import PostgresAdapter
+from snowshu.adapters.target_adapters.postgres_adapter.postgres_adapter import (CopyRenderer, PassthroughJSONB,
+                                                                            sanitize_text_column)
 from snowshu.configs import DOCKER_REMOUNT_DIRECTORY, DOCKER_REPLICA_MOUNT_FOLDER
+from snowshu.core import transform
 from snowshu.core.models import data_types
 from snowshu.core.models.attribute import Attribute
 from snowshu.core.models.materializations import TABLE
 from snowshu.core.models.relation import Relation
+from snowshu.core.run_report import RunReport
 from tests.common import rand_string
 
 
@@ -100,3 +112,231 @@ def test_copy_replica_command():
     pg_adapter.passive_container.exec_run = MagicMock(return_value=exec_return_value)
     pg_adapter.copy_replica_data()
     pg_adapter.container.exec_run.assert_called()
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_sanitize_data_text_columns(_):
+    """Text columns are cleaned by attribute type, not by peeking at the first value"""
+    adapter = PostgresAdapter(replica_metadata={}, pg_0x00_replacement="_")
+    relation = Relation("db", "schema", "table", TABLE, [
+        Attribute("id", data_types.BIGINT),
+        Attribute("content", data_types.VARCHAR),
+    ])
+    data = DataFrame({"id": [1, 2, 3, 4],
+                      "content": [None, "weird\x00value", "lone\ud800surrogate", "normal"]})
+
+    sanitized = adapter.sanitize_data(relation, data)
+
+    assert sanitized["content"].tolist() == [None, "weird_value", "lone�surrogate", "normal"]
+    assert sanitized["id"].tolist() == [1, 2, 3, 4]
+
+
+def test_sanitize_warning_reports_the_reason():
+    with patch('snowshu.adapters.target_adapters.postgres_adapter.postgres_adapter.logger') as logger:
+        sanitize_text_column(Series(["lone\ud800surrogate", "normal"], name="content"), "")
+        sanitize_text_column(Series(["weird\x00value", "lone\ud800surrogate"], name="content"), "")
+
+    reasons = [call.args[1] for call in logger.warning.call_args_list]
+    assert reasons == ["lone surrogates", "0x00 chars and lone surrogates"]
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_sanitize_data_json_columns(_):
+    """JSON text passes through untouched, parsed values are serialized once and NULs are removed"""
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("payload", data_types.JSON)])
+    raw = '{"a": [1, 2], "b": "c"}'
+    data = DataFrame({"payload": [raw,
+                                  {"parsed": True},
+                                  '{"nul": "x\\u0000y"}',
+                                  '{"literal": "x\\\\u0000y"}',
+                                  None]})
+
+    sanitized = adapter.sanitize_data(relation, data)
+
+    assert sanitized["payload"].tolist() == [raw,
+                                             '{"parsed": true}',
+                                             '{"nul": "xy"}',
+                                             '{"literal": "x\\\\u0000y"}',
+                                             None]
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_json_load_type_does_not_serialize(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    load_type = adapter._get_load_type(data_types.JSON)
+
+    assert isinstance(load_type, PassthroughJSONB)
+    assert load_type.bind_processor(postgresql.dialect()) is None
+    assert adapter._get_load_type(data_types.VARCHAR) is data_types.VARCHAR.sqlalchemy_type
+
+
+def _copy_target():
+    """A pandas SQLTable stand-in and a connection capturing what is sent to COPY"""
+    table = MagicMock()
+    table.table = Table("table", MetaData(), Column("id", BIGINT), Column("payload", PassthroughJSONB()),
+                        schema="schema")
+    conn = MagicMock()
+    conn.dialect = postgresql.dialect()
+    conn.connection.autocommit = True
+    cursor = conn.connection.cursor.return_value.__enter__.return_value
+    return table, conn, cursor
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_copy_insert_method_streams_raw_text(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT),
+                                                         Attribute("payload", data_types.JSON)])
+    table, conn, cursor = _copy_target()
+    copied = []
+    cursor.copy_expert.side_effect = lambda statement, buffer: copied.append((statement, buffer.read()))
+
+    insert = adapter._get_insert_method(relation)
+    insert(table, conn, ["id", "payload"], iter([(1, '{"a":\t"b\\nc"}'), (2, None)]))
+
+    statement, body = copied[0]
+    assert statement == 'COPY schema."table" (id, payload) FROM STDIN'
+    assert body == '1\t{"a":\\t"b\\\\nc"}\n2\t\\N\n'
+    cursor.execute.assert_not_called()
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_copy_insert_method_reports_malformed_json_rows(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT),
+                                                         Attribute("payload", data_types.JSON)])
+    table, conn, cursor = _copy_target()
+    conn.connection.autocommit = False
+    copied = []
+
+    def copy_expert(_statement, buffer):
+        body = buffer.read()
+        if "{broken" in body:
+            raise psycopg2.DataError("invalid input syntax for type json")
+        copied.append(body)
+
+    cursor.copy_expert.side_effect = copy_expert
+    insert = adapter._get_insert_method(relation)
+    insert(table, conn, ["id", "payload"], iter([(1, '{"ok": 1}')]))
+    with patch('snowshu.adapters.target_adapters.postgres_adapter.postgres_adapter.logger') as logger:
+        insert(table, conn, ["id", "payload"], iter([(2, '{broken'), (3, 'NaN'), (4, '[]')]))
+
+    assert copied == ['1\t{"ok": 1}\n', '2\t\\N\n3\t\\N\n4\t[]\n']
+    # rows are numbered across chunks
+    reported_rows = [call.args[3] for call in logger.warning.call_args_list[:2]]
+    assert reported_rows == [1, 2]
+    cursor.execute.assert_any_call('ROLLBACK TO SAVEPOINT snowshu_copy')
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_copy_insert_method_reraises_non_json_errors(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT),
+                                                         Attribute("payload", data_types.JSON)])
+    table, conn, cursor = _copy_target()
+    cursor.copy_expert.side_effect = psycopg2.DataError("value out of range")
+
+    insert = adapter._get_insert_method(relation)
+    with pytest.raises(psycopg2.DataError):
+        insert(table, conn, ["id", "payload"], iter([(1, '{"ok": 1}')]))
+    assert cursor.copy_expert.call_count == 1
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_stream_data_into_relation_replaces_then_appends(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT)])
+    chunks = [DataFrame({"id": [1, 2]}), DataFrame({"id": [3]})]
+
+    with patch.object(adapter, 'load_data_into_relation') as load_data_into_relation:
+        assert adapter.stream_data_into_relation(relation, iter(chunks)) == 3
+
+    assert [call.kwargs['if_exists'] for call in load_data_into_relation.call_args_list] == ['replace', 'append']
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_copy_insert_method_loads_nullable_int_columns(_):
+    """pandas holds integer columns with NULLs as floats, postgres integer columns reject 1.0"""
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT),
+                                                         Attribute("payload", data_types.JSON)])
+    table, conn, cursor = _copy_target()
+    copied = []
+    cursor.copy_expert.side_effect = lambda statement, buffer: copied.append(buffer.read())
+
+    sanitized = adapter.sanitize_data(relation, DataFrame({"id": [1, None, 3], "payload": ["{}", "[]", None]}))
+    # the rows the way pandas hands them to the insert method
+    _, columns = SQLTable("table", SQLDatabase(sqlalchemy.create_engine("sqlite://")),
+                          frame=sanitized, index=False).insert_data()
+    adapter._get_insert_method(relation)(table, conn, ["id", "payload"], zip(*columns))
+
+    assert copied == ['1\t{}\n\\N\t[]\n3\t\\N\n']
+
+
+def test_copy_renderer_loads_nullable_int_columns():
+    render = CopyRenderer({"id": "bigint", "amount": "integer", "ratio": "bigint"}, "")
+    frame = DataFrame({"id": [1, None], "amount": [None, -2], "ratio": [0.5, None]})
+
+    # fractions are left for postgres to reject
+    assert render(frame) == '1\t\\N\t0.5\n\\N\t-2\t\\N\n'
+
+
+def test_copy_renderer_formats_like_the_insert_method():
+    frame = DataFrame({"id": [1, None],
+                       "at": pd.to_datetime(["2020-01-02 03:04:05", None]),
+                       "payload": [{"a": "b\x00"}, None],
+                       "raw": [b"\x01", None]})
+    render = CopyRenderer({"id": "float", "at": "timestamp_ntz", "payload": "json", "raw": "binary"}, "")
+
+    assert render(frame) == '1.0\t2020-01-02 03:04:05\t{"a": "b"}\t\\\\x01\n\\N\t\\N\t\\N\t\\N\n'
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_load_data_into_relation_copies_rendered_rows(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT),
+                                                         Attribute("name", data_types.VARCHAR)])
+    transformer = MagicMock()
+    transformer.apply.side_effect = lambda func, frame: func(frame)
+    engine = MagicMock()
+    engine.dialect = postgresql.dialect()
+    cursor = engine.raw_connection.return_value.cursor.return_value.__enter__.return_value
+    copied = []
+    cursor.copy_expert.side_effect = lambda statement, buffer: copied.append((statement, buffer.read()))
+
+    with patch.object(adapter, 'get_connection', return_value=engine), \
+            patch.object(DataFrame, 'to_sql') as to_sql, \
+            transform.bind(transformer):
+        adapter.load_data_into_relation(relation, DataFrame({"id": [1, 2], "name": ["a", "b\x00"]}))
+
+    assert to_sql.call_count == 1
+    assert copied == [('COPY schema."table" (id, name) FROM STDIN', '1\ta\n2\tb\n')]
+    engine.raw_connection.return_value.commit.assert_called_once()
+
+    # rejected rows are loaded the regular way
+    cursor.copy_expert.side_effect = psycopg2.DataError("invalid input syntax for type json")
+    with patch.object(adapter, 'get_connection', return_value=engine), \
+            patch.object(DataFrame, 'to_sql') as to_sql, \
+            transform.bind(transformer):
+        adapter.load_data_into_relation(relation, DataFrame({"id": [1], "name": ["a"]}))
+
+    assert [call.kwargs['if_exists'] for call in to_sql.call_args_list] == ['replace', 'append']
+    engine.raw_connection.return_value.rollback.assert_called_once()
+
+
+@patch('snowshu.adapters.target_adapters.base_target_adapter.SnowShuDocker')
+def test_load_data_into_relation_measures_bytes_for_reports_only(_):
+    adapter = PostgresAdapter(replica_metadata={})
+    relation = Relation("db", "schema", "table", TABLE, [Attribute("id", data_types.BIGINT)])
+
+    for collected in (False, True):
+        report = RunReport(collected=collected)
+        with patch.object(adapter, 'get_connection'), \
+                patch.object(DataFrame, 'to_sql'), \
+                patch.object(DataFrame, 'memory_usage', return_value=Series([8])) as memory_usage, \
+                report.relation(relation):
+            adapter.load_data_into_relation(relation, DataFrame({"id": [1]}))
+
+        assert memory_usage.called == collected
+        assert report.relations[relation.dot_notation].bytes == (8 if collected else None)
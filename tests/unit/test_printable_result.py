@@ -45,3 +45,25 @@ def test_graph_to_list(stub_graph_set):
             assert row.count_of_dependencies in (' ', '1')  # some relations had a dependency
             assert row.percent_to_target == 1
             assert row.percent_is_acceptable == False
+
+
+def test_graph_to_list_with_bytes(stub_graph_set):
+    graph_list, _ = generate_stub_complete_graph(stub_graph_set)
+    sampled = next(rel for graph in graph_list for rel in graph if not rel.is_view)
+    sampled.projected_bytes = 2048
+    sampled.actual_bytes = 1024
+
+    report = pr.graph_to_result_list(graph_list)
+
+    row = next(row for row in report if row.dot_notation == sampled.dot_notation)
+    assert (row.projected_bytes, row.actual_bytes) == (2048, 1024)
+    assert len(row.to_tuple(with_bytes=True)) == len(row.to_tuple()) + 2
+
+
+def test_printable_result_peak_memory(stub_graph_set):
+    graph_list, _ = generate_stub_complete_graph(stub_graph_set)
+    report = pr.graph_to_result_list(graph_list)
+
+    assert 'peak memory' not in pr.printable_result(report, analyze=False)
+    assert pr.printable_result(report, analyze=False,
+                               peak_rss_bytes=3 * 1024 ** 2).endswith('\npeak memory: 3.0 MB\n')
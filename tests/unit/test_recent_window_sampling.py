@@ -0,0 +1,63 @@
+import datetime
+from unittest import mock
+import pytest
+
+from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
+from snowshu.samplings.samplings import RecentWindowSampling
+from snowshu.core.samplings.utils import get_sampling_from_partial
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
+    mock_source_adapter=mock.MagicMock()
+    mock_source_adapter.population_count_statement.return_value='SELECT COUNT(*) FROM MOCK'
+    mock_source_adapter.window_constraint_statement.return_value='CREATED_AT >= MOCK'
+    yield mock_rel,mock_source_adapter
+
+
+ONE_BILLION_ROWS=1e9
+def test_recent_window_sampling_sizes_on_the_window(mock_args):
+    # GIVEN: a billion rows of which a million fall in the window
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[1].scalar_query.return_value=1000000
+    recent=RecentWindowSampling('CREATED_AT', days=30)
+    recent.prepare(*mock_args)
+
+    mock_args[1].scalar_query.assert_called_once_with('SELECT COUNT(*) FROM MOCK WHERE CREATED_AT >= MOCK')
+    assert recent.sample_method.name == 'BERNOULLI'
+    assert recent.sample_method.rows == 4147
+    assert recent.size == 4147
+
+def test_recent_window_sampling_small_window(mock_args):
+    mock_args[0].population_size=ONE_BILLION_ROWS
+    mock_args[1].scalar_query.return_value=250
+    recent=RecentWindowSampling('CREATED_AT', start='2023-01-01', end='2023-02-01')
+    recent.prepare(*mock_args)
+
+    assert recent.size == 250
+
+def test_recent_window_requires_days_or_range():
+    with pytest.raises(ValueError):
+        RecentWindowSampling('CREATED_AT')
+    with pytest.raises(ValueError):
+        RecentWindowSampling('CREATED_AT', days=7, start='2023-01-01')
+    with pytest.raises(ValueError):
+        RecentWindowSampling('CREATED_AT', days=0)
+
+def test_recent_window_sampling_from_partial():
+    recent=get_sampling_from_partial({'recent_window': {'timestamp_attribute': 'CREATED_AT',
+                                                        'start': datetime.date(2023, 1, 1)}})
+
+    assert isinstance(recent, RecentWindowSampling)
+    assert SnowflakeAdapter.window_constraint_statement(recent.window) == "CREATED_AT >= '2023-01-01'"
+
+def test_window_constraint_statement():
+    days=RecentWindowSampling('CREATED_AT', days=30).window
+    date_range=RecentWindowSampling('CREATED_AT', start='2023-01-01', end='2023-02-01').window
+
+    assert SnowflakeAdapter.window_constraint_statement(days) == \
+        "CREATED_AT >= DATEADD(DAY, -30, CURRENT_TIMESTAMP())"
+    assert SnowflakeAdapter.window_constraint_statement(date_range) == \
+        "CREATED_AT >= '2023-01-01' AND CREATED_AT < '2023-02-01'"
@@ -4,10 +4,12 @@ from io import StringIO
 from pathlib import Path
 from unittest import mock
 
+import networkx as nx
 import yaml
 
 from snowshu.adapters.target_adapters.base_target_adapter import BaseTargetAdapter
 from snowshu.core.models import Relation
+from snowshu.core.graph import SnowShuGraph
 from snowshu.core.models.relation import alter_relation_case
 from snowshu.core.replica.replica_factory import ReplicaFactory
 from tests.common import rand_string
@@ -39,6 +41,154 @@ def tests_incremental_flag(graph, stub_configs):
     assert 'image up-to-date' in result
 
 
+@mock.patch('snowshu.core.replica.replica_factory.graph_to_result_list')
+@mock.patch('snowshu.core.replica.replica_factory.printable_result')
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+def tests_incremental_refresh(runner, _printable_result, _graph_to_result_list, stub_configs, stub_relation_set):
+    vals = stub_relation_set
+    graph = nx.MultiDiGraph()
+    graph.add_edge(vals.upstream_relation, vals.downstream_relation, direction='directional',
+                   local_attribute=vals.directional_key, remote_attribute=vals.directional_key)
+    graph.add_node(vals.iso_relation)
+    graph.add_node(vals.birelation_left)
+
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.incremental = rand_string(10)
+    replica.refresh = True
+    source = replica.config.source_profile.adapter = mock.MagicMock()
+    target = replica.config.target_profile.adapter = mock.MagicMock()
+    target.copy_replica_data.return_value = (0, '')
+    source._correct_case = str.upper
+    target.build_catalog.return_value = {vals.upstream_relation, vals.downstream_relation, vals.iso_relation}
+    target.get_relation_fingerprints.return_value = {vals.upstream_relation.dot_notation: 'old',
+                                                     vals.downstream_relation.dot_notation: 'same',
+                                                     vals.iso_relation.dot_notation: 'same'}
+    source.get_change_fingerprints.return_value = {vals.upstream_relation.dot_notation: 'new',
+                                                   vals.downstream_relation.dot_notation: 'same',
+                                                   vals.iso_relation.dot_notation: 'same',
+                                                   vals.birelation_left.dot_notation: 'added'}
+
+    runner.return_value.execute_graph_set.side_effect = _load_all
+
+    with mock.patch.object(SnowShuGraph, 'build_graph', new=lambda self, _: setattr(self, 'graph', graph)):
+        replica.create(None, False, 1)
+
+    graphs = runner.return_value.execute_graph_set.call_args.args[0]
+    refreshed = {relation for dag in graphs for relation in dag.nodes}
+    # changed, downstream of changed and missing relations are sampled again
+    assert refreshed == {vals.upstream_relation, vals.downstream_relation, vals.birelation_left}
+    target.store_relation_fingerprints.assert_called_once_with(source.get_change_fingerprints.return_value)
+
+
+def _load_all(graphs, *_, **__):
+    """ stands in for a run that loads every relation """
+    for dag in graphs:
+        for relation in dag.nodes:
+            relation.target_loaded = True
+
+
+@mock.patch('snowshu.core.replica.replica_factory.graph_to_result_list')
+@mock.patch('snowshu.core.replica.replica_factory.printable_result')
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+def tests_create_then_refresh_skips_unchanged(runner, _printable_result, _graph_to_result_list,
+                                              stub_configs, stub_relation_set):
+    """ a plain create stores fingerprints, so the first refresh of its image only samples what changed """
+    vals = stub_relation_set
+    graph = nx.MultiDiGraph()
+    graph.add_edge(vals.upstream_relation, vals.downstream_relation, direction='directional',
+                   local_attribute=vals.directional_key, remote_attribute=vals.directional_key)
+    graph.add_node(vals.iso_relation)
+
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    source = replica.config.source_profile.adapter = mock.MagicMock()
+    target = replica.config.target_profile.adapter = mock.MagicMock()
+    target.copy_replica_data.return_value = (0, '')
+    source._correct_case = str.upper
+    stored = dict()
+    target.store_relation_fingerprints.side_effect = stored.update
+    target.get_relation_fingerprints.side_effect = lambda: dict(stored)
+    source.get_change_fingerprints.side_effect = lambda relations: {relation.dot_notation: 'v1'
+                                                                    for relation in relations}
+    runner.return_value.execute_graph_set.side_effect = _load_all
+
+    with mock.patch.object(SnowShuGraph, 'build_graph', new=lambda self, _: setattr(self, 'graph', graph.copy())):
+        replica.create(None, False, 1)
+        assert stored == {relation.dot_notation: 'v1' for relation in graph.nodes}
+
+        replica.incremental = rand_string(10)
+        replica.refresh = True
+        target.build_catalog.return_value = set(graph.nodes)
+        source.get_change_fingerprints.side_effect = lambda relations: {
+            relation.dot_notation: 'v2' if relation == vals.iso_relation else 'v1' for relation in relations}
+        replica.create(None, False, 1)
+
+    graphs = runner.return_value.execute_graph_set.call_args.args[0]
+    assert {relation for dag in graphs for relation in dag.nodes} == {vals.iso_relation}
+
+
+@mock.patch('snowshu.core.replica.replica_factory.graph_to_result_list')
+@mock.patch('snowshu.core.replica.replica_factory.printable_result')
+@mock.patch('snowshu.core.replica.replica_factory.GraphSetRunner')
+def tests_refresh_samples_relation_that_failed_to_load(runner, _printable_result, _graph_to_result_list,
+                                                       stub_configs, stub_relation_set):
+    """ a relation that failed to load keeps no fingerprint, so the next refresh samples it again """
+    vals = stub_relation_set
+    graph = nx.MultiDiGraph()
+    graph.add_node(vals.iso_relation)
+    graph.add_node(vals.birelation_left)
+
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    source = replica.config.source_profile.adapter = mock.MagicMock()
+    target = replica.config.target_profile.adapter = mock.MagicMock()
+    target.copy_replica_data.return_value = (0, '')
+    source._correct_case = str.upper
+    stored = dict()
+
+    def store(fingerprints):
+        # the image keeps only the latest fingerprints
+        stored.clear()
+        stored.update(fingerprints)
+
+    target.store_relation_fingerprints.side_effect = store
+    target.get_relation_fingerprints.side_effect = lambda: dict(stored)
+    source.get_change_fingerprints.side_effect = lambda relations: {relation.dot_notation: 'v1'
+                                                                    for relation in relations}
+
+    def load_all_but_birelation(graphs, *_, **__):
+        for dag in graphs:
+            for relation in dag.nodes:
+                relation.target_loaded = relation != vals.birelation_left
+
+    runner.return_value.execute_graph_set.side_effect = load_all_but_birelation
+    with mock.patch.object(SnowShuGraph, 'build_graph', new=lambda self, _: setattr(self, 'graph', graph.copy())):
+        replica.create(None, False, 1)
+        assert stored == {vals.iso_relation.dot_notation: 'v1'}
+
+        replica.incremental = rand_string(10)
+        replica.refresh = True
+        target.build_catalog.return_value = set(graph.nodes)
+        runner.return_value.execute_graph_set.side_effect = _load_all
+        replica.create(None, False, 1)
+
+    graphs = runner.return_value.execute_graph_set.call_args.args[0]
+    assert {relation for dag in graphs for relation in dag.nodes} == {vals.birelation_left}
+    assert stored == {relation.dot_notation: 'v1' for relation in graph.nodes}
+
+
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.build_graph')
+@mock.patch('snowshu.core.replica.replica_factory.SnowShuGraph.get_connected_subgraphs', return_value=[])
+def tests_analyze_stores_no_fingerprints(_, build_graph, stub_configs):
+    replica = ReplicaFactory()
+    replica.load_config(stub_configs())
+    replica.run_analyze = True
+    source = replica.config.source_profile.adapter = mock.MagicMock()
+    replica.create(None, False, 1)
+    source.get_change_fingerprints.assert_not_called()
+
+
 def tests_incremental_run_patched(stub_graph_set, stub_relation_set):
     _, vals = stub_graph_set
 
@@ -0,0 +1,88 @@
+import json
+from unittest import mock
+
+import pytest
+
+from snowshu.core import run_report
+from snowshu.core.models.materializations import TABLE, VIEW
+from snowshu.core.models.relation import Relation
+from snowshu.core.run_report import RunReport
+
+
+def test_phases_recorded_per_relation():
+    report = RunReport()
+    relation = Relation('db', 'schema', 'table', TABLE, [])
+    with mock.patch('snowshu.core.run_report.time.perf_counter', side_effect=[0.0, 1.0, 2.0, 4.5]):
+        with report.relation(relation):
+            with run_report.phase('prepare'):
+                # phases do not nest
+                with run_report.phase('fetch'):
+                    pass
+            with run_report.phase('fetch'):
+                run_report.record_bytes(100)
+                run_report.record_bytes(20)
+            relation.sample_size = 10
+
+    metrics = report.relations['db.schema.table']
+    assert metrics.phases == dict(prepare=1.0, fetch=2.5)
+    assert (metrics.rows, metrics.bytes, metrics.retries, metrics.attempts, metrics.status) == (10, 120, 0, 1, 'success')
+    # nothing is recorded outside of a relation
+    with run_report.phase('fetch'):
+        run_report.record_retry()
+    assert not run_report.recording()
+    assert metrics.retries == 0
+
+
+def test_recording_only_for_collected_reports():
+    relation = Relation('db', 'schema', 'table', TABLE, [])
+    with RunReport().relation(relation):
+        assert run_report.recording()
+    with RunReport(collected=False).relation(relation):
+        # phases still drive the concurrency slots
+        with run_report.phase('fetch'):
+            assert run_report.current_phase() == 'fetch'
+        assert not run_report.recording()
+    assert not run_report.recording()
+
+
+def test_retries_and_failures():
+    report = RunReport()
+    relation = Relation('db', 'schema', 'table', TABLE, [])
+    with pytest.raises(ValueError):
+        with report.relation(relation):
+            run_report.record_retry()
+            raise ValueError('failed')
+    assert report.relations['db.schema.table'].status == 'failed'
+
+    with report.relation(relation):
+        pass
+    metrics = report.relations['db.schema.table']
+    assert (metrics.retries, metrics.attempts, metrics.status) == (2, 2, 'success')
+
+
+def test_write_report(tmpdir):
+    report = RunReport()
+    table = Relation('db', 'schema', 'ta"ble', TABLE, [])
+    view = Relation('db', 'schema', 'view', VIEW, [])
+    with report.relation(table):
+        run_report.record_bytes(64)
+        table.sample_size = 5
+    with report.relation(view):
+        view.sample_size = 'N/A'
+    report.relations['db.schema.ta"ble'].phases = dict(load=0.5, fetch=1.25)
+
+    report.write(tmpdir / 'reports' / 'run')
+    lines = [json.loads(line) for line in (tmpdir / 'reports' / 'run.jsonl').read_text('utf-8').splitlines()]
+    assert lines[0] == dict(relation='db.schema.ta"ble', phases=dict(fetch=1.25, load=0.5), rows=5, bytes=64,
+                            retries=0, attempts=1, status='success', seconds=1.75)
+    assert lines[1]['relation'] == 'db.schema.view'
+    assert lines[1]['rows'] is None
+
+    prom = (tmpdir / 'reports' / 'run.prom').read_text('utf-8').splitlines()
+    assert '# TYPE snowshu_relation_phase_seconds gauge' in prom
+    assert 'snowshu_relation_phase_seconds{relation="db.schema.ta\\"ble",phase="fetch"} 1.25' in prom
+    assert 'snowshu_relation_rows{relation="db.schema.ta\\"ble"} 5' in prom
+    assert 'snowshu_relation_bytes{relation="db.schema.ta\\"ble"} 64' in prom
+    assert 'snowshu_relation_success{relation="db.schema.view"} 1' in prom
+    assert any(line.startswith('snowshu_run_timestamp_seconds ') for line in prom)
+    assert not (tmpdir / 'reports' / 'run.prom.tmp').exists()
@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+
+from snowshu.storages import SampleStore
+
+
+def test_sample_store_round_trip(tmpdir):
+    store = SampleStore(tmpdir / 'samples')
+    data = pd.DataFrame([dict(ID=1, NAME='a'), dict(ID=2, NAME='b')])
+    key = store.key('db.schema.orders\nDefaultSampling(margin_of_error=0.05)', '2023-01-01 00:00:00:2')
+
+    assert store.get(key) is None
+    assert store.stored_bytes(key) is None
+    store.put(key, data)
+    assert store.contains(key)
+    assert store.stored_bytes(key) == store.size
+    pd.testing.assert_frame_equal(store.get(key), data)
+
+
+def test_sample_store_key_covers_spec_seed_and_fingerprint(tmpdir):
+    store = SampleStore(tmpdir)
+    key = store.key('spec', 'fingerprint')
+
+    assert key == store.key('spec', 'fingerprint')
+    assert key != store.key('other spec', 'fingerprint')
+    assert key != store.key('spec', 'altered')
+    assert key != SampleStore(tmpdir, seed=1).key('spec', 'fingerprint')
+
+
+def test_sample_store_evicts_least_recently_used(tmpdir):
+    data = pd.DataFrame([dict(ID=i) for i in range(100)])
+    store = SampleStore(tmpdir)
+    store.put('first', data)
+    store.put('second', data)
+    sample_bytes = store.size // 2
+
+    # make 'first' the oldest sample, then read it so 'second' becomes the least recently used
+    os.utime(tmpdir / 'first.parquet', (0, 0))
+    os.utime(tmpdir / 'second.parquet', (1, 1))
+    store.get('first')
+
+    store.max_bytes = sample_bytes * 2
+    store.put('third', data)
+
+    assert store.contains('first')
+    assert not store.contains('second')
+    assert store.contains('third')
+    assert store.size <= store.max_bytes
@@ -9,9 +9,10 @@ from psycopg2 import OperationalError
 
 from snowshu.adapters.source_adapters.snowflake_adapter import SnowflakeAdapter
 from snowshu.core.models.credentials import Credentials
-from snowshu.core.models.materializations import TABLE
+from snowshu.core.models.materializations import TABLE, VIEW
 from snowshu.core.models.relation import Relation
-from snowshu.samplings.sample_methods import BernoulliSampleMethod
+from snowshu.samplings.sample_methods import (BernoulliSampleMethod, HashSampleMethod,
+                                              StratifiedSampleMethod, SystemSampleMethod)
 from tests.common import query_equalize, rand_string
 
 
@@ -191,6 +192,7 @@ def test_predicate_constraint_statement_analyze_false_quoted_non_empty_constrain
     sf = SnowflakeAdapter()
     mock_format_remote_key.return_value = "remote_key::VARCHAR"
     mock_relation.temp_dot_notation = 'mock_dot_notation'
+    mock_relation.key_table_sizes = None
     mock_query.return_value = DataFrame(['1, 2, 3'])
     result = sf.predicate_constraint_statement(mock_relation, False, 'local_key', 'remote_key')
     assert query_equalize(result) == query_equalize("local_key IN ( SELECT DISTINCT remote_key::VARCHAR FROM mock_dot_notation )")
@@ -208,6 +210,7 @@ def test_predicate_constraint_statement_analyze_false_unquoted_non_empty_constra
     sf = SnowflakeAdapter()
     mock_format_remote_key.return_value = "remote_key"
     mock_relation.temp_dot_notation = "mock_dot_notation"
+    mock_relation.key_table_sizes = None
     mock_query.return_value = DataFrame(["1, 2, 3"])
     result = sf.predicate_constraint_statement(
         mock_relation, False, "local_key", "remote_key"
@@ -228,6 +231,7 @@ def test_predicate_constraint_statement_analyze_false_empty_constraint_set(mock_
     sf = SnowflakeAdapter()
     mock_format_remote_key.return_value = 'remote_key'
     mock_relation.temp_dot_notation = 'mock_dot_notation'
+    mock_relation.key_table_sizes = None
     mock_query.return_value = DataFrame([])
     with pytest.raises(IndexError, match=f"Failed to build predicates, the constraint set is empty."):
         sf.predicate_constraint_statement(mock_relation, False, 'local_key', 'remote_key')
@@ -240,6 +244,7 @@ def test_predicate_constraint_statement_analyze_false_key_error(mock_relation, m
     sf = SnowflakeAdapter()
     mock_format_remote_key.return_value = 'remote_key'
     mock_relation.temp_dot_notation = 'mock_dot_notation'
+    mock_relation.key_table_sizes = None
     mock_safe_query.side_effect = KeyError()
     with pytest.raises(KeyError, match=r"Remote key remote_key not found in mock_dot_notation table."):
         sf.predicate_constraint_statement(mock_relation, False, 'local_key', 'remote_key')
@@ -305,3 +310,195 @@ def test_sample_type_to_query_sql():
     qualifier = sample_type.probability
 
     assert sf._sample_type_to_query_sql(sample_type) == f"SAMPLE BERNOULLI ({qualifier})"
+
+
+def test_hash_constraint_statement():
+    sf = SnowflakeAdapter()
+    sample_type = HashSampleMethod(0.25, key='ID', buckets=100)
+
+    assert sf.hash_constraint_statement('USER_ID', sample_type) == "MOD(ABS(HASH(USER_ID::VARCHAR)), 100) < 25"
+    assert sf.hash_constraint_statement(None, sample_type) == "MOD(ABS(HASH(*)), 100) < 25"
+
+
+def test_sample_type_to_query_sql_system():
+    sf = SnowflakeAdapter()
+
+    assert sf._sample_type_to_query_sql(SystemSampleMethod(0.5)) == "SAMPLE SYSTEM (0.5)"
+
+
+def test_relation_bytes_statement():
+    sf = SnowflakeAdapter()
+    relation = Relation("SNOWSHU_DEVELOPMENT", "SOURCE_SYSTEM", "ORDERS", TABLE, [])
+
+    assert query_equalize(sf.relation_bytes_statement(relation)) == query_equalize("""
+        SELECT BYTES FROM SNOWSHU_DEVELOPMENT.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = 'SOURCE_SYSTEM' AND TABLE_NAME = 'ORDERS'
+    """)
+
+
+def test_partition_statement():
+    assert query_equalize(SnowflakeAdapter.partition_statement("SELECT * FROM ORDERS", 8, 3)) == query_equalize("""
+        SELECT * FROM (SELECT * FROM ORDERS) AS snowshu_partition WHERE MOD(ABS(HASH(*)), 8) = 3
+    """)
+
+
+def test_change_fingerprint_statement():
+    sf = SnowflakeAdapter()
+    relation = Relation("SNOWSHU_DEVELOPMENT", "SOURCE_SYSTEM", "ORDERS", TABLE, [])
+
+    assert query_equalize(sf.change_fingerprint_statement(relation)) == query_equalize("""
+        SELECT TO_VARCHAR(LAST_ALTERED) || ':' || COALESCE(TO_VARCHAR(ROW_COUNT), '') || ':' || COALESCE(TO_VARCHAR(BYTES), '')
+        FROM SNOWSHU_DEVELOPMENT.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA = 'SOURCE_SYSTEM' AND TABLE_NAME = 'ORDERS'
+    """)
+
+
+def test_get_change_fingerprints():
+    sf = SnowflakeAdapter()
+    orders = Relation("SNOWSHU_DEVELOPMENT", "SOURCE_SYSTEM", "ORDERS", TABLE, [])
+    users = Relation("SNOWSHU_DEVELOPMENT", "SOURCE_SYSTEM", "USERS", TABLE, [])
+    events = Relation("SNOWSHU_EVENTS", "RAW", "EVENTS", TABLE, [])
+    results = {
+        "SNOWSHU_DEVELOPMENT": DataFrame([("SOURCE_SYSTEM", "ORDERS", "2023-01-01:10:2048")]),
+        "SNOWSHU_EVENTS": DataFrame(columns=("TABLE_SCHEMA", "TABLE_NAME", "FINGERPRINT")),
+    }
+    with mock.patch.object(sf, '_safe_query', side_effect=lambda sql: results[sql.split('.INFORMATION_SCHEMA')[0].split()[-1]]) as query:
+        fingerprints = sf.get_change_fingerprints([orders, users, events])
+
+    # one metadata query per database, relations missing in the source are left out
+    assert query.call_count == 2
+    assert "(TABLE_SCHEMA, TABLE_NAME) IN" in query.call_args_list[0].args[0]
+    assert "('SOURCE_SYSTEM', 'USERS')" in query.call_args_list[0].args[0]
+    assert fingerprints == {orders.dot_notation: "2023-01-01:10:2048"}
+
+
+def test_stratified_sample_statement():
+    sf = SnowflakeAdapter()
+    relation = Relation("SNOWSHU_DEVELOPMENT", "SOURCE_SYSTEM", "ORDERS", TABLE, [])
+    sample_type = StratifiedSampleMethod(['COUNTRY', 'DEVICE'], 0.05, 10)
+
+    assert query_equalize(sf.stratum_count_statement(relation, sample_type.strata)) == query_equalize("""
+        SELECT COUNT(*) AS stratum_size FROM SNOWSHU_DEVELOPMENT.SOURCE_SYSTEM.ORDERS GROUP BY COUNTRY, DEVICE
+    """)
+    assert query_equalize(sf.stratum_count_statement(relation, ['COUNTRY'], limit=101)) == query_equalize("""
+        SELECT COUNT(*) AS stratum_size FROM SNOWSHU_DEVELOPMENT.SOURCE_SYSTEM.ORDERS GROUP BY COUNTRY LIMIT 101
+    """)
+    assert query_equalize(sf.sample_statement_from_relation(relation, sample_type)) == query_equalize("""
+        SELECT * FROM SNOWSHU_DEVELOPMENT.SOURCE_SYSTEM.ORDERS
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY COUNTRY, DEVICE ORDER BY RANDOM())
+        <= GREATEST(10, CEIL(COUNT(*) OVER (PARTITION BY COUNTRY, DEVICE) * 0.05))
+    """)
+
+
+@mock.patch('snowshu.adapters.source_adapters.snowflake_adapter.SnowflakeAdapter._safe_query')
+def test_predicate_constraint_statement_from_key_table(mock_safe_query):
+    """ with a key table the keys are read from it and its row count replaces the exists probe """
+    sf = SnowflakeAdapter()
+    relation = Relation('db', 'schema', 'UPSTREAM', TABLE, [])
+    relation.temp_schema = 'temp_schema'
+    relation.key_table_sizes = {'ID': 3}
+    with mock.patch.object(sf, 'format_remote_key', return_value='ID'):
+        result = sf.predicate_constraint_statement(relation, False, 'upstream_id', 'ID')
+    mock_safe_query.assert_not_called()
+    assert query_equalize(result) == query_equalize(
+        "upstream_id IN ( SELECT ID FROM SNOWSHU.temp_schema.UPSTREAM__ID__KEYS )")
+
+    relation.key_table_sizes = {'ID': 0}
+    with mock.patch.object(sf, 'format_remote_key', return_value='ID'), \
+            pytest.raises(IndexError, match="Failed to build predicates, the constraint set is empty."):
+        sf.predicate_constraint_statement(relation, False, 'upstream_id', 'ID')
+
+
+def test_create_key_table():
+    sf = SnowflakeAdapter()
+    relation = Relation('db', 'schema', 'UPSTREAM', TABLE, [])
+    relation.temp_schema = 'temp_schema'
+    with mock.patch.object(sf, 'create_table') as create_table, \
+            mock.patch.object(sf, 'scalar_query', return_value=42) as scalar_query:
+        assert sf.create_key_table(relation, 'ID') == 42
+    create_table.assert_called_once_with(query='SELECT DISTINCT ID FROM SNOWSHU.temp_schema.UPSTREAM',
+                                         name='UPSTREAM__ID__KEYS',
+                                         schema='temp_schema',
+                                         database='SNOWSHU')
+    scalar_query.assert_called_once_with('SELECT COUNT(*) FROM SNOWSHU.temp_schema.UPSTREAM__ID__KEYS')
+
+
+def test_submit_and_wait_for_queries():
+    sf = SnowflakeAdapter()
+    engine = mock.MagicMock()
+    connection = engine.raw_connection.return_value
+    connection.cursor.return_value.sfqid = 'query-1'
+    snowflake_connection = connection.dbapi_connection
+    # the first query completes on the second poll
+    snowflake_connection.get_query_status_throw_if_error.side_effect = ['RUNNING', 'SUCCESS', 'SUCCESS']
+    snowflake_connection.is_still_running.side_effect = lambda status: status == 'RUNNING'
+    with mock.patch.object(sf, 'get_connection', return_value=engine), \
+            mock.patch('snowshu.adapters.source_adapters.snowflake_adapter.time.sleep') as sleep:
+        query_id = sf.submit_create_table('SELECT 1', 'orders', 'temp_schema', 'snowshu_development')
+        completed = sf.wait_for_queries(['query-1', 'query-2'])
+
+    assert query_id == 'query-1'
+    assert query_equalize(connection.cursor.return_value.execute_async.call_args.args[0]) == query_equalize("""
+        CREATE TRANSIENT TABLE IF NOT EXISTS SNOWSHU_DEVELOPMENT.TEMP_SCHEMA.ORDERS AS SELECT 1
+    """)
+    assert set(completed) == {'query-1', 'query-2'}
+    assert [call.args[0] for call in snowflake_connection.get_query_status_throw_if_error.call_args_list] == \
+        ['query-1', 'query-2', 'query-1']
+    sleep.assert_called_once()
+    assert connection.close.call_count == 2
+
+
+def test_wait_for_failed_query():
+    sf = SnowflakeAdapter()
+    engine = mock.MagicMock()
+    engine.raw_connection.return_value.dbapi_connection.get_query_status_throw_if_error.side_effect = \
+        RuntimeError('SQL compilation error')
+    with mock.patch.object(sf, 'get_connection', return_value=engine):
+        with pytest.raises(RuntimeError):
+            sf.wait_for_queries(['query-1'])
+    engine.raw_connection.return_value.close.assert_called_once()
+
+
+def test_query_many_reads_every_result_set():
+    sf = SnowflakeAdapter()
+    engine = mock.MagicMock()
+    engine.dialect.normalize_name.side_effect = str.lower
+    cursor = engine.raw_connection.return_value.cursor.return_value
+    results = iter([([('ID',)], [(1,), (2,)]), ([('NAME',)], [('a',)])])
+
+    def next_result():
+        cursor.description, rows = next(results, (None, None))
+        cursor.fetchall.return_value = rows
+        return cursor.description is not None
+    next_result()
+    cursor.nextset.side_effect = next_result
+
+    with mock.patch.object(sf, 'get_connection', return_value=engine):
+        first, second = sf.query_many(['SELECT id FROM a;', 'SELECT name FROM b'])
+
+    assert cursor.execute.call_args.args[0] == 'SELECT id FROM a;\nSELECT name FROM b'
+    assert cursor.execute.call_args.kwargs['num_statements'] == 2
+    assert first['id'].tolist() == [1, 2]
+    assert second['name'].tolist() == ['a']
+
+
+def test_population_counts_statement():
+    relations = [Relation('db', 'schema', name, TABLE, []) for name in ('a', 'b')]
+    assert query_equalize(SnowflakeAdapter.population_counts_statement(relations)) == query_equalize("""
+        SELECT 0 AS RELATION_INDEX, (SELECT COUNT(*) FROM DB.SCHEMA.A) AS POPULATION_SIZE
+        UNION ALL
+        SELECT 1 AS RELATION_INDEX, (SELECT COUNT(*) FROM DB.SCHEMA.B) AS POPULATION_SIZE
+    """)
+
+
+def test_view_definitions_read_per_schema():
+    sf = SnowflakeAdapter()
+    schema_obj = SnowflakeAdapter._DatabaseObject('Analytics', Relation('DB', 'ANALYTICS', '', None, None))
+    relations = [Relation('DB', 'ANALYTICS', name, materialization, [])
+                 for name, materialization in (('ORDERS', TABLE), ('RECENT', VIEW), ('SECURE', VIEW))]
+    definitions = DataFrame([('RECENT', ' SELECT * FROM ORDERS'), ('SECURE', None)])
+    with mock.patch.object(sf, '_safe_query', return_value=definitions) as safe_query:
+        sf._add_view_definitions(schema_obj, relations)
+
+    assert "TABLE_SCHEMA = 'Analytics'" in safe_query.call_args.args[0]
+    assert [relation.view_definition for relation in relations] == [None, ' SELECT * FROM ORDERS', None]
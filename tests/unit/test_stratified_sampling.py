@@ -0,0 +1,66 @@
+from unittest import mock
+import pandas as pd
+import pytest
+
+from snowshu.exceptions import TooManyRecords
+from snowshu.samplings.samplings import StratifiedSampling
+
+
+@pytest.fixture()
+def mock_args():
+    mock_rel=mock.MagicMock()
+    mock_rel.max_allowed_bytes=None
+    mock_source_adapter=mock.MagicMock()
+    yield mock_rel,mock_source_adapter
+
+
+def stub_histogram(mock_args, stratum_sizes):
+    mock_args[0].population_size=sum(stratum_sizes)
+    mock_args[1]._safe_query.return_value=pd.DataFrame({'stratum_size': stratum_sizes})
+
+
+def test_stratified_sampling_covers_rare_strata(mock_args):
+    # GIVEN: one huge stratum and two rare ones
+    #        expectation - the rare strata are kept whole, the huge one fills the rest of the sample
+    stub_histogram(mock_args, [1000000, 5, 3])
+    stratified=StratifiedSampling('COUNTRY', min_sample_size=10000, min_per_stratum=10)
+    stratified.prepare(*mock_args)
+
+    mock_args[1].stratum_count_statement.assert_called_once_with(mock_args[0], ['COUNTRY'], limit=10001)
+    assert mock_args[1]._safe_query.call_count == 1
+    assert stratified.sample_method.name == 'STRATIFIED'
+    assert stratified.sample_method.strata == ['COUNTRY']
+    assert stratified.size == 10000
+    assert stratified.sample_method.fraction == pytest.approx(0.00999, rel=1e-3)
+
+def test_stratified_sampling_min_per_stratum_exceeds_target(mock_args):
+    stub_histogram(mock_args, [100] * 50)
+    stratified=StratifiedSampling(['COUNTRY', 'DEVICE'], min_sample_size=100, min_per_stratum=60)
+    stratified.prepare(*mock_args)
+
+    assert stratified.sample_method.strata == ['COUNTRY', 'DEVICE']
+    assert stratified.sample_method.fraction == 0
+    assert stratified.size == 3000
+
+def test_stratified_sampling_small_population(mock_args):
+    stub_histogram(mock_args, [20, 30])
+    stratified=StratifiedSampling('COUNTRY')
+    stratified.prepare(*mock_args)
+
+    assert stratified.sample_method.fraction == 1
+    assert stratified.size == 50
+
+def test_stratified_sampling_caps_strata(mock_args):
+    stub_histogram(mock_args, [20, 30])
+    stratified=StratifiedSampling('COUNTRY', max_strata=500)
+    stratified.prepare(*mock_args)
+    assert mock_args[1].stratum_count_statement.call_args.kwargs == dict(limit=501)
+
+    stub_histogram(mock_args, [1] * 500)
+    stratified.prepare(*mock_args)
+    assert stratified.size == 500
+
+    mock_args[0].dot_notation='db.schema.orders'
+    stub_histogram(mock_args, [1] * 501)
+    with pytest.raises(TooManyRecords, match=r'db.schema.orders has more than max_strata \(500\) strata of COUNTRY'):
+        stratified.prepare(*mock_args)
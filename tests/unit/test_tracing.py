@@ -0,0 +1,105 @@
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pandas as pd
+
+from snowshu.core import tracing
+from snowshu.core.graph_set_runner import GraphSetRunner
+from snowshu.core.tracing import Tracer
+from snowshu.samplings.samplings import DefaultSampling
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span('run', 'run'):
+        pass
+    assert tracer.to_chrome_trace()['traceEvents'] == []
+
+
+def test_nested_spans_across_threads(tmpdir):
+    tracer = Tracer()
+    tracer.start()
+
+    def work(index):
+        with tracer.span(f"relation {index}", 'relation'):
+            with tracer.span('query', 'query', sql='SELECT 1'):
+                pass
+
+    with mock.patch('snowshu.core.tracing.tracer', tracer):
+        with tracer.span('run', 'run'):
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix='worker') as executor:
+                list(executor.map(tracing.propagate(work), range(2)))
+        tracer.stop()
+        with tracer.span('ignored', 'run'):
+            pass
+
+    tracer.write(tmpdir / 'trace.json')
+    trace = json.loads((tmpdir / 'trace.json').read_text('utf-8'))
+    spans = {event['name']: event for event in trace['traceEvents'] if event['ph'] == 'X'}
+    assert set(spans) == {'run', 'relation 0', 'relation 1', 'query'}
+    run = spans['run']
+    for index in range(2):
+        relation = spans[f"relation {index}"]
+        assert relation['args']['parent_id'] == run['args']['span_id']
+        assert run['ts'] <= relation['ts'] and relation['ts'] + relation['dur'] <= run['ts'] + run['dur']
+    queries = [event for event in trace['traceEvents'] if event['name'] == 'query']
+    assert {query['args']['parent_id'] for query in queries} == \
+        {spans['relation 0']['args']['span_id'], spans['relation 1']['args']['span_id']}
+    assert queries[0]['args']['sql'] == 'SELECT 1'
+
+    thread_names = {event['tid']: event['args']['name'] for event in trace['traceEvents'] if event['ph'] == 'M'}
+    assert thread_names[run['tid']] == 'MainThread'
+    assert all(thread_names[query['tid']].startswith('worker') for query in queries)
+
+
+def test_traced_records_errors():
+    tracer = Tracer()
+    tracer.start()
+
+    @tracing.traced('docker')
+    def startup():
+        raise ValueError('no docker')
+
+    with mock.patch('snowshu.core.tracing.tracer', tracer):
+        try:
+            startup()
+        except ValueError:
+            pass
+    event, = tracer.to_chrome_trace()['traceEvents'][1:]
+    assert (event['name'], event['cat']) == ('test_traced_records_errors.<locals>.startup', 'docker')
+    assert event['args']['error'] == 'ValueError: no docker'
+
+
+def test_runner_spans(stub_graph_set):
+    source_adapter, target_adapter = [mock.MagicMock() for _ in range(2)]
+    source_adapter.scalar_query.return_value = 1000
+    source_adapter.check_count_and_query.return_value = pd.DataFrame([dict(population_size=1000, sample_size=100)])
+    source_adapter.predicate_constraint_statement.return_value = str()
+    source_adapter.upstream_constraint_statement.return_value = str()
+    source_adapter.sample_statement_from_relation.return_value = str()
+    graph_set, _ = stub_graph_set
+    graph_set = copy.deepcopy(graph_set)
+    for graph in graph_set:
+        graph.contains_views = False
+        for relation in graph.nodes:
+            relation.unsampled = False
+            relation.include_outliers = False
+            relation.sampling = DefaultSampling()
+
+    tracer = Tracer()
+    tracer.start()
+    with mock.patch('snowshu.core.tracing.tracer', tracer):
+        GraphSetRunner().execute_graph_set(graph_set, source_adapter, target_adapter, 2, 0, analyze=True)
+
+    spans = [event for event in tracer.to_chrome_trace()['traceEvents'] if event['ph'] == 'X']
+    by_id = {span['args']['span_id']: span for span in spans}
+    run, = [span for span in spans if span['cat'] == 'runner']
+    components = [span for span in spans if span['cat'] == 'component']
+    relations = [span for span in spans if span['cat'] == 'relation']
+    assert len(components) == len(graph_set)
+    assert all(by_id[component['args']['parent_id']] is run for component in components)
+    assert sorted(span['name'] for span in relations) == \
+        sorted(relation.dot_notation for graph in graph_set for relation in graph.nodes)
+    assert all(by_id[span['args']['parent_id']]['cat'] == 'component' for span in relations)
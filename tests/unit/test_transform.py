@@ -0,0 +1,45 @@
+import pandas as pd
+import pyarrow as pa
+
+from snowshu.adapters.target_adapters.postgres_adapter.postgres_adapter import CopyRenderer
+from snowshu.core import transform
+from snowshu.core.transform import FrameTransformer, from_ipc, to_ipc
+
+
+def test_string_frames_travel_as_arrow_ipc():
+    frame = pd.DataFrame(dict(id=[1, 2, 3], name=['a', None, 'c\x00'], empty=[None, None, None]))
+    payload = to_ipc(frame)
+    assert isinstance(payload, pa.Buffer)
+    pd.testing.assert_frame_equal(from_ipc(payload), frame)
+
+
+def test_frames_arrow_would_not_round_trip_are_passed_as_is():
+    for frame in (pd.DataFrame(dict(raw=[b'\x00\x01', None])),
+                  pd.DataFrame(dict(mixed=['a', 1])),
+                  pd.DataFrame(dict(parsed=[dict(a=1), [1, 2]]))):
+        assert to_ipc(frame) is frame
+        assert from_ipc(frame) is frame
+
+
+def test_offloads_large_frames_only():
+    transformer = FrameTransformer(2, min_rows=3)
+    assert not transformer.offloads(pd.DataFrame(dict(id=[1, 2])))
+    assert transformer.offloads(pd.DataFrame(dict(id=[1, 2, 3])))
+
+
+def test_bind():
+    transformer = FrameTransformer(1)
+    assert transform.current() is None
+    with transform.bind(transformer):
+        assert transform.current() is transformer
+    assert transform.current() is None
+
+
+def test_apply_in_worker_process():
+    frame = pd.DataFrame(dict(id=[1, 2], name=['a\tb', 'nul\x00']))
+    render = CopyRenderer(dict(id='bigint', name='varchar'), '?')
+    transformer = FrameTransformer(1, min_rows=0)
+    try:
+        assert transformer.apply(render, frame) == render(frame.copy()) == '1\ta\\tb\n2\tnul?\n'
+    finally:
+        transformer.shutdown()